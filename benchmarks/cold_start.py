@@ -0,0 +1,99 @@
+"""Import-time and cold-start benchmark for the Lambda handlers.
+
+Every sample runs in a fresh interpreter, as a Lambda cold start would. No AWS
+calls are made: client construction is local, and only /health and /me are
+invoked. Pass --handler to measure another revision of a handler, e.g.
+
+    git show HEAD~1:services/api/handler.py > /tmp/api_old.py
+    python benchmarks/cold_start.py --handler /tmp/api_old.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import importlib.util, json, sys, time
+
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("handler_under_test", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+t1 = time.perf_counter()
+
+result = {"import_ms": (t1 - t0) * 1000}
+if sys.argv[2] == "api":
+    event = {"rawPath": "/health", "requestContext": {"http": {"method": "GET"}}}
+    module.handler(event, None)
+    t2 = time.perf_counter()
+    event = {"rawPath": "/me", "requestContext": {"http": {"method": "GET"},
+             "authorizer": {"jwt": {"claims": {"sub": "bench"}}}}}
+    module.handler(event, None)
+    t3 = time.perf_counter()
+    module.aws_clients.table
+    module.aws_clients.s3
+    t4 = time.perf_counter()
+    result.update({
+        "first_health_ms": (t2 - t1) * 1000,
+        "first_me_ms": (t3 - t2) * 1000,
+        "task_route_clients_ms": (t4 - t3) * 1000,
+        "cold_health_total_ms": (t2 - t0) * 1000,
+    })
+else:
+    module.aws_clients.table
+    module.aws_clients.s3
+    t2 = time.perf_counter()
+    result.update({
+        "clients_ms": (t2 - t1) * 1000,
+        "cold_total_ms": (t2 - t0) * 1000,
+    })
+print(json.dumps(result))
+"""
+
+
+def run_samples(handler_path: Path, service: str, samples: int) -> dict:
+    env = dict(os.environ)
+    env.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    env.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    env.setdefault("BUCKET_NAME", "bench-bucket")
+
+    runs = []
+    for _ in range(samples):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE, str(handler_path), service],
+            check=True, capture_output=True, text=True, env=env, cwd=handler_path.parent,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    return {
+        metric: {
+            "median": statistics.median(run[metric] for run in runs),
+            "p90": sorted(run[metric] for run in runs)[int(0.9 * (len(runs) - 1))],
+        }
+        for metric in runs[0]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=["api", "worker"], default="api")
+    parser.add_argument("--handler", type=Path, help="handler.py to measure (defaults to the service's)")
+    parser.add_argument("--samples", type=int, default=15)
+    args = parser.parse_args()
+
+    handler_path = args.handler or ROOT / "services" / args.service / "handler.py"
+    results = run_samples(handler_path.resolve(), args.service, args.samples)
+
+    print(f"{args.service}: {handler_path} ({args.samples} cold starts)")
+    for metric, value in results.items():
+        print(f"  {metric:<24} median {value['median']:8.1f} ms   p90 {value['p90']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""End-to-end benchmark of the API and worker against in-memory backends.
+
+Both handlers are loaded with STORAGE_BACKEND=memory and share one task table,
+so the numbers cover request parsing, validation, serialization and stats
+computation without any network I/O. Results are printed as JSON; pass
+--baseline to fail when a metric regresses by more than --tolerance.
+
+    python benchmarks/e2e.py --quick --output /tmp/e2e.json
+    python benchmarks/e2e.py --quick --baseline /tmp/e2e.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+MB = 1024 * 1024
+
+# Metrics where a smaller value is better; everything else is a throughput.
+LOWER_IS_BETTER = ("_ms",)
+
+
+def load_handler(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def api_event(method: str, path: str, sub: str, body: Any = None, query: str = "") -> Dict[str, Any]:
+    return {
+        "rawPath": path,
+        "rawQueryString": query,
+        "requestContext": {
+            "http": {"method": method},
+            "authorizer": {"jwt": {"claims": {"sub": sub}}},
+        },
+        "body": json.dumps(body) if body is not None else None,
+    }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def call(api, event: Dict[str, Any], expected: int = 200) -> Dict[str, Any]:
+    resp = api.handler(event, None)
+    if resp["statusCode"] != expected:
+        raise RuntimeError(f"{event['rawPath']} returned {resp['statusCode']}: {resp.get('body')}")
+    return json.loads(resp["body"])
+
+
+def bench_creates(api, count: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    for i in range(count):
+        call(api, api_event("POST", "/tasks", "bench-create", {"file_key": f"uploads/bench-create/{i}.txt"}), 201)
+    single = count / (time.perf_counter() - started)
+
+    batch_size = 100
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        tasks = [{"file_key": f"uploads/bench-batch/{i}.txt"} for i in range(start, min(start + batch_size, count))]
+        call(api, api_event("POST", "/tasks/batch", "bench-batch", {"tasks": tasks}))
+    batch = count / (time.perf_counter() - started)
+
+    return {"creates_per_sec": single, "batch_creates_per_sec": batch}
+
+
+def bench_list(api, pages: int) -> Dict[str, float]:
+    samples = []
+    cursor = None
+    for _ in range(pages):
+        query = "limit=50" + (f"&cursor={cursor}" if cursor else "")
+        started = time.perf_counter()
+        body = call(api, api_event("GET", "/tasks", "bench-create", query=query))
+        samples.append((time.perf_counter() - started) * 1000)
+        cursor = body.get("next_cursor")
+
+    return {
+        "list_p50_ms": percentile(samples, 50),
+        "list_p95_ms": percentile(samples, 95),
+        "list_p99_ms": percentile(samples, 99),
+    }
+
+
+def bench_worker(api, worker, sizes_mb: List[int], repeats: int, extension: str = "txt") -> Dict[str, float]:
+    """Plain files measure the base stats; .csv files also run the CSV analyzer."""
+    results = {}
+    line = b"2024-01-01T00:00:00Z,benchmark,row,with,a,few,columns\n"
+    for size_mb in sizes_mb:
+        size = size_mb * MB
+        data = (line * (size // len(line) + 1))[:size]
+        file_key = f"uploads/bench-worker/{size_mb}mb.{extension}"
+        worker.backends.objects.put(file_key, data, "text/csv" if extension == "csv" else "text/plain")
+
+        durations = []
+        for _ in range(repeats):
+            task = call(api, api_event("POST", "/tasks", "bench-worker", {"file_key": file_key}), 201)["task"]
+            record = {
+                "messageId": task["task_id"],
+                "body": json.dumps({
+                    "task_id": task["task_id"],
+                    "user_pk": "tenant_default#bench-worker",
+                    "file_key": file_key,
+                }),
+            }
+            started = time.perf_counter()
+            failures = worker.handler({"Records": [record]}, None)["batchItemFailures"]
+            durations.append(time.perf_counter() - started)
+            if failures:
+                raise RuntimeError(f"Worker failed on {file_key}")
+
+        prefix = "worker" if extension == "txt" else f"worker_{extension}"
+        results[f"{prefix}_{size_mb}mb_mb_per_sec"] = size_mb / statistics.median(durations)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for metric, expected in baseline.items():
+        actual = results.get(metric)
+        if actual is None or not expected:
+            continue
+        if metric.endswith(LOWER_IS_BETTER):
+            change = actual / expected - 1
+        else:
+            change = expected / actual - 1
+        if change > tolerance:
+            regressions.append(f"{metric}: {actual:.2f} vs baseline {expected:.2f} ({change:+.0%} worse)")
+    return regressions
+
+
+def timed(name: str, fn: Callable[[], Dict[str, float]]) -> Dict[str, float]:
+    started = time.perf_counter()
+    result = fn()
+    print(f"{name} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller workload for CI")
+    parser.add_argument("--creates", type=int, default=5000)
+    parser.add_argument("--list-pages", type=int, default=200)
+    parser.add_argument("--sizes-mb", default="1,16,96", help="worker file sizes; >= 64 MB takes the ranged path")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.creates, args.list_pages, args.sizes_mb, args.repeats = 1000, 50, "1,16,64", 1
+
+    os.environ.update({
+        "STORAGE_BACKEND": "memory",
+        "BUCKET_NAME": "bench-bucket",
+        "STATS_CACHE_ENABLED": "false",
+        "METRICS_SINK": "memory",
+        "ADMISSION_ENABLED": "false",
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "eu-central-1"),
+    })
+    api = load_handler("api_handler", ROOT / "services" / "api" / "handler.py")
+    worker = load_handler("worker_handler", ROOT / "services" / "worker" / "handler.py")
+    worker.backends.tasks.items = api.backends.tasks.items
+
+    results: Dict[str, float] = {}
+    results.update(timed("creates", lambda: bench_creates(api, args.creates)))
+    results.update(timed("list", lambda: bench_list(api, args.list_pages)))
+    sizes = [int(size) for size in args.sizes_mb.split(",") if size]
+    results.update(timed("worker", lambda: bench_worker(api, worker, sizes, args.repeats)))
+    results.update(timed("worker csv", lambda: bench_worker(api, worker, sizes[:1], args.repeats, "csv")))
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Discrete-event simulation of per-tenant queue latency under a noisy tenant.
+
+One heavy tenant dumps --heavy-tasks tasks at t=0 while --light-tenants tenants
+create tasks as Poisson arrivals. Worker invocations (--workers in total)
+drain the queues. Three setups are compared:
+
+    single     one FIFO queue, as before fair scheduling
+    bulk       the dispatcher's QueueRouter sends each tenant's tasks beyond
+               its fair share to the bulk queue, drained by at most
+               --bulk-concurrency workers
+    admission  bulk, plus the API's per-tenant token bucket; clients post
+               batches and resend throttled tasks after Retry-After
+
+Queue latency is measured from admission to the start of processing; "total"
+also counts the time a task waited at the client for admission. Time is
+simulated, so a run takes seconds.
+
+    python benchmarks/fair_scheduling.py
+    python benchmarks/fair_scheduling.py --heavy-tasks 50000 --workers 50
+"""
+import argparse
+import heapq
+import importlib.util
+import os
+import random
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+BATCH_SIZE = 500
+
+
+def load_handler(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Simulation:
+    def __init__(self, args: argparse.Namespace, router: Any, bucket: Any, admission: Any):
+        self.args = args
+        self.router = router
+        self.bucket = bucket
+        self.admission = admission
+        self.rng = random.Random(args.seed)
+        self.events: List[Tuple[float, int, str, Any]] = []
+        self.sequence = 0
+        self.queues: Dict[str, Deque[Dict[str, Any]]] = {"main": deque(), "bulk": deque()}
+        self.busy = {"main": 0, "bulk": 0}
+        self.clients: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.attempt_scheduled: Dict[str, bool] = {}
+        self.buckets: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self.finished: List[Dict[str, Any]] = []
+
+    def schedule(self, at: float, kind: str, payload: Any) -> None:
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, kind, payload))
+
+    def run(self) -> List[Dict[str, Any]]:
+        self.schedule(0.0, "submit", ("heavy", self.args.heavy_tasks))
+        for i in range(self.args.light_tenants):
+            tenant = f"light-{i}"
+            at = self.rng.expovariate(self.args.light_rate)
+            while at < self.args.duration:
+                self.schedule(at, "submit", (tenant, 1))
+                at += self.rng.expovariate(self.args.light_rate)
+
+        while self.events:
+            now, _, kind, payload = heapq.heappop(self.events)
+            if kind == "submit":
+                tenant, count = payload
+                tasks = ({"tenant": tenant, "submitted": now} for _ in range(count))
+                self.clients.setdefault(tenant, deque()).extend(tasks)
+                if not self.attempt_scheduled.get(tenant):
+                    self._attempt(tenant, now)
+            elif kind == "attempt":
+                self.attempt_scheduled[payload] = False
+                self._attempt(payload, now)
+            elif kind == "done":
+                self.busy[payload] -= 1
+            self._start_work(now)
+        return self.finished
+
+    def _attempt(self, tenant: str, now: float) -> None:
+        pending = self.clients[tenant]
+        wanted = min(len(pending), BATCH_SIZE)
+        granted = wanted
+        if self.bucket is not None:
+            tokens, updated_at = self.buckets.get(tenant, (None, None))
+            available = self.bucket.available(tokens, updated_at, now)
+            granted = min(wanted, int(available))
+            self.buckets[tenant] = (available - granted, now)
+
+        for _ in range(granted):
+            task = pending.popleft()
+            task["admitted"] = now
+            queue = self.router.route(tenant, now) if self.router else "main"
+            self.queues[queue].append(task)
+
+        if pending:
+            self.attempt_scheduled[tenant] = True
+            retry_after = self.admission.retry_after(wanted - granted) if granted < wanted else 0
+            self.schedule(now + max(retry_after, 0.05), "attempt", tenant)
+
+    def _start_work(self, now: float) -> None:
+        while self.busy["main"] + self.busy["bulk"] < self.args.workers:
+            if self.queues["main"]:
+                lane = "main"
+            elif self.queues["bulk"] and self.busy["bulk"] < self.args.bulk_concurrency:
+                lane = "bulk"
+            else:
+                return
+            task = self.queues[lane].popleft()
+            task["started"] = now
+            self.busy[lane] += 1
+            self.finished.append(task)
+            self.schedule(now + self.rng.expovariate(1000 / self.args.service_ms), "done", lane)
+
+
+def report(name: str, tasks: List[Dict[str, Any]]) -> None:
+    by_tenant: Dict[str, List[Dict[str, Any]]] = {}
+    for task in tasks:
+        by_tenant.setdefault(task["tenant"], []).append(task)
+
+    for tenant in sorted(by_tenant, key=lambda t: (t != "heavy", t)):
+        queued = [task["started"] - task["admitted"] for task in by_tenant[tenant]]
+        total = [task["started"] - task["submitted"] for task in by_tenant[tenant]]
+        print(
+            f"{name:<10} {tenant:<9} {len(queued):>7} {percentile(queued, 50):>9.2f} s "
+            f"{percentile(queued, 99):>9.2f} s {percentile(total, 99):>9.2f} s"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heavy-tasks", type=int, default=20000)
+    parser.add_argument("--light-tenants", type=int, default=5)
+    parser.add_argument("--light-rate", type=float, default=0.5, help="tasks per second per light tenant")
+    parser.add_argument("--duration", type=float, default=300, help="seconds of light-tenant arrivals")
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--bulk-concurrency", type=int, default=10)
+    parser.add_argument("--service-ms", type=float, default=500, help="mean task processing time")
+    parser.add_argument("--fair-share", type=int, default=50)
+    parser.add_argument("--window-seconds", type=float, default=60)
+    parser.add_argument("--admission-rate", type=float, default=10)
+    parser.add_argument("--admission-burst", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    os.environ.setdefault("STORAGE_BACKEND", "memory")
+    os.environ.setdefault("METRICS_SINK", "memory")
+    api = load_handler("api_handler", ROOT / "services" / "api" / "handler.py")
+    dispatcher = load_handler("dispatcher_handler", ROOT / "services" / "dispatcher" / "handler.py")
+
+    def router():
+        return dispatcher.QueueRouter("main", "bulk", args.fair_share, args.window_seconds)
+
+    bucket = api.TokenBucket(args.admission_rate, args.admission_burst)
+    admission = api.AdmissionController(args.admission_rate, args.admission_burst, 1, 0, 1)
+
+    print(f"{'setup':<10} {'tenant':<9} {'tasks':>7} {'p50 queue':>11} {'p99 queue':>11} {'p99 total':>11}")
+    report("single", Simulation(args, None, None, admission).run())
+    report("bulk", Simulation(args, router(), None, admission).run())
+    report("admission", Simulation(args, router(), bucket, admission).run())
+
+
+if __name__ == "__main__":
+    main()
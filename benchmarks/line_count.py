@@ -0,0 +1,95 @@
+"""Line counting microbenchmark: worker LineCounter vs decode + splitlines.
+
+The reference is the counting the worker used originally,
+len(data.decode("utf-8", errors="ignore").splitlines()). Every profile is
+also checked for equal results, both on the whole payload and when fed to
+StatsAccumulator in 1 MiB chunks.
+
+    python benchmarks/line_count.py
+    python benchmarks/line_count.py --sizes-kb 64,16384 --repeats 3
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROFILES: Dict[str, bytes] = {
+    "ascii_lf": b"2024-01-01T00:00:00Z,benchmark,row,with,a,few,columns\n",
+    "ascii_crlf": b"2024-01-01T00:00:00Z,benchmark,row,with,a,few,columns\r\n",
+    "utf8_cyrillic": "Строка с кириллицей и числами 12345, ещё немного текста\n".encode("utf-8"),
+    "utf8_punctuation": "Quotes “like this” — dashes and separators\n".encode("utf-8"),
+    "mixed_boundaries": b"a\rb\r\nc\x0bd\x0ce\x1cf\x1dg\x1e" + "h\u0085i j ".encode("utf-8"),
+    "long_lines": b"x" * 4095 + b"\n",
+}
+
+
+def load_worker():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    os.environ.setdefault("STORAGE_BACKEND", "memory")
+    spec = importlib.util.spec_from_file_location("worker_handler", ROOT / "services" / "worker" / "handler.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reference(data: bytes) -> int:
+    return len(data.decode("utf-8", errors="ignore").splitlines())
+
+
+def best_of(fn: Callable[[], int], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", default="1,1024,16384")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    worker = load_worker()
+    chunk_size = 1024 * 1024
+
+    def chunked(data: bytes) -> int:
+        accumulator = worker.StatsAccumulator()
+        for start in range(0, len(data), chunk_size):
+            accumulator.update(data[start:start + chunk_size])
+        return accumulator.result()["line_count"]
+
+    def whole(data: bytes) -> int:
+        return worker.LineCounter.count(data) + (0 if worker.LineCounter.ends_with_boundary(data[-3:]) else 1)
+
+    print(f"{'profile':<18} {'size':>9} {'splitlines':>12} {'LineCounter':>12} {'speedup':>8}")
+    mismatches = 0
+    for size_kb in (int(size) for size in args.sizes_kb.split(",") if size):
+        for name, line in PROFILES.items():
+            size = size_kb * 1024
+            data = (line * (size // len(line) + 1))[:size]
+
+            expected = reference(data)
+            if whole(data) != expected or chunked(data) != expected:
+                mismatches += 1
+                print(f"MISMATCH {name} {size_kb} KiB: {expected} vs {whole(data)} / {chunked(data)}", file=sys.stderr)
+
+            old = best_of(lambda: reference(data), args.repeats)
+            new = best_of(lambda: worker.LineCounter.count(data), args.repeats)
+            print(
+                f"{name:<18} {size_kb:>6} KiB {size / old / 1e6:>8.0f} MB/s {size / new / 1e6:>8.0f} MB/s "
+                f"{old / new:>7.1f}x"
+            )
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
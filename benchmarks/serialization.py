@@ -0,0 +1,139 @@
+"""Response serialization microbenchmark: ResponseBuilder vs the original path.
+
+The reference is the serializer ResponseBuilder used originally: json.dumps with
+a per-call closure that converts each Decimal through Decimal arithmetic. The
+payloads are list_tasks pages shaped like DynamoDB items, where every number
+is a Decimal. Each payload is also checked to decode to the same JSON.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --repeats 10
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_api():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    os.environ.setdefault("STORAGE_BACKEND", "memory")
+    spec = importlib.util.spec_from_file_location("api_handler", ROOT / "services" / "api" / "handler.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reference(body: Any) -> str:
+    def json_serializer(obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)
+        raise TypeError(f"Not JSON serializable: {type(obj)}")
+
+    return json.dumps(body, default=json_serializer)
+
+
+def task_item(i: int, with_stats: bool = True) -> Dict[str, Any]:
+    item = {
+        "pk": "tenant_default#bench",
+        "sk": f"00000000-0000-0000-0000-{i:012d}",
+        "task_id": f"00000000-0000-0000-0000-{i:012d}",
+        "status": "DONE",
+        "file_key": f"uploads/bench/{i}-report.csv",
+        "created_at": "2026-01-01T00:00:00.000000+00:00",
+        "processed_at": "2026-01-01T00:00:01.500000+00:00",
+        "result_key": f"results/bench/{i}.json",
+        "ttl": Decimal(1790000000 + i),
+    }
+    if with_stats:
+        columns = [
+            {
+                "name": f"column_{j}",
+                "count": Decimal(9999),
+                "empty": Decimal(0),
+                "min": Decimal("0.5"),
+                "max": Decimal("1024.75"),
+                "mean": Decimal("511.3125"),
+            }
+            for j in range(6)
+        ]
+        item["stats"] = {
+            "bytes": Decimal(1048576 + i),
+            "line_count": Decimal(10000),
+            "word_count": Decimal(70000),
+            "char_count": Decimal(1048000),
+            "analyzers": {"csv": {"rows": Decimal(9999), "columns": columns}},
+            "analyzer_timings_ms": {"csv": Decimal("12.375")},
+        }
+    return item
+
+
+PAYLOADS: Dict[str, Any] = {
+    "list_10_stats": {"items": [task_item(i) for i in range(10)], "next_cursor": "eyJzayI6ICIxIn0="},
+    "list_50_stats": {"items": [task_item(i) for i in range(50)], "next_cursor": "eyJzayI6ICIxIn0="},
+    "list_500_projected": {"items": [task_item(i, False) for i in range(500)], "next_cursor": None},
+}
+
+
+def best_of(fn: Callable[[], Any], repeats: int, number: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--number", type=int, default=100)
+    args = parser.parse_args()
+
+    api = load_api()
+    installed_orjson = api.orjson
+
+    def stdlib(body: Any) -> str:
+        api.orjson = None
+        try:
+            return api.ResponseBuilder.dumps(body)
+        finally:
+            api.orjson = installed_orjson
+
+    event = {"headers": {"accept-encoding": "gzip, deflate, br"}}
+    variants = {"reference": reference, "stdlib": stdlib}
+    if installed_orjson is not None:
+        variants["orjson"] = api.ResponseBuilder.dumps
+
+    print(f"{'payload':<20} {'variant':<10} {'bytes':>8} {'time':>10} {'speedup':>8}")
+    mismatches = 0
+    for name, body in PAYLOADS.items():
+        expected = json.loads(reference(body))
+        baseline = None
+        for variant, fn in variants.items():
+            text = fn(body)
+            if json.loads(text) != expected:
+                mismatches += 1
+                print(f"MISMATCH {name} {variant}", file=sys.stderr)
+            elapsed = best_of(lambda: fn(body), args.repeats, args.number)
+            baseline = baseline or elapsed
+            print(f"{name:<20} {variant:<10} {len(text):>8} {elapsed * 1e6:>7.0f} us {baseline / elapsed:>7.1f}x")
+
+        response = {"statusCode": 200, "headers": {}, "body": api.ResponseBuilder.dumps(body)}
+        compressed = api.ResponseBuilder.compress(response, event)
+        elapsed = best_of(lambda: api.ResponseBuilder.compress(response, event), args.repeats, args.number)
+        print(f"{name:<20} {'+gzip':<10} {len(compressed['body']):>8} {elapsed * 1e6:>7.0f} us   (base64)")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,14 +13,17 @@ resource "aws_lambda_function" "api" {
   source_code_hash = data.archive_file.api_zip.output_base64sha256
 
   memory_size = var.lambda_memory_size
-  timeout     = var.lambda_timeout
+  timeout     = max(var.lambda_timeout, var.api_long_poll_max_wait_seconds + 5)
 
   environment {
     variables = {
-      STAGE         = var.stage
-      TABLE_NAME    = "${var.project_name}-${var.stage}-tasks"
-      BUCKET_NAME   = aws_s3_bucket.files.bucket
-      SQS_QUEUE_URL = aws_sqs_queue.tasks.id
+      STAGE                      = var.stage
+      TABLE_NAME                 = "${var.project_name}-${var.stage}-tasks"
+      BUCKET_NAME                = aws_s3_bucket.files.bucket
+      LONG_POLL_MAX_WAIT_SECONDS = var.api_long_poll_max_wait_seconds
+      ADMISSION_RATE_PER_SECOND  = var.api_admission_rate_per_second
+      ADMISSION_BURST            = var.api_admission_burst
+      METRICS_NAMESPACE          = local.metrics_namespace
     }
   }
 
@@ -42,7 +45,7 @@ resource "aws_apigatewayv2_api" "http" {
   cors_configuration {
     allow_origins  = var.cors_allowed_origins
     allow_methods  = ["GET", "POST", "OPTIONS"]
-    allow_headers  = ["authorization", "content-type"]
+    allow_headers  = ["authorization", "content-type", "if-none-match"]
     expose_headers = ["*"]
     max_age        = 86400
   }
@@ -117,6 +120,14 @@ resource "aws_apigatewayv2_route" "me" {
   authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
 }
 
+resource "aws_apigatewayv2_route" "me_usage" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "GET /me/usage"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
 resource "aws_apigatewayv2_route" "tasks_create" {
   api_id             = aws_apigatewayv2_api.http.id
   route_key          = "POST /tasks"
@@ -133,6 +144,30 @@ resource "aws_apigatewayv2_route" "tasks_get" {
   authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
 }
 
+resource "aws_apigatewayv2_route" "tasks_batch" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /tasks/batch"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
+resource "aws_apigatewayv2_route" "tasks_status" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /tasks/status"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
+resource "aws_apigatewayv2_route" "tasks_export" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /tasks/export"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
 resource "aws_apigatewayv2_route" "files_presign" {
   api_id             = aws_apigatewayv2_api.http.id
   route_key          = "POST /files/presign"
@@ -149,6 +184,46 @@ resource "aws_apigatewayv2_route" "files_download" {
   authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
 }
 
+resource "aws_apigatewayv2_route" "files_multipart_start" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /files/multipart/start"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
+resource "aws_apigatewayv2_route" "files_multipart_parts" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /files/multipart/parts"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
+resource "aws_apigatewayv2_route" "files_multipart_list" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /files/multipart/list"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
+resource "aws_apigatewayv2_route" "files_multipart_complete" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /files/multipart/complete"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
+resource "aws_apigatewayv2_route" "files_multipart_abort" {
+  api_id             = aws_apigatewayv2_api.http.id
+  route_key          = "POST /files/multipart/abort"
+  target             = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.jwt.id
+}
+
 resource "aws_apigatewayv2_route" "tasks_list" {
   api_id             = aws_apigatewayv2_api.http.id
   route_key          = "GET /tasks"
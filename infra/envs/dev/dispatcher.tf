@@ -0,0 +1,102 @@
+data "archive_file" "dispatcher_zip" {
+  type        = "zip"
+  source_dir  = "${path.module}/../../../services/dispatcher"
+  output_path = "${path.module}/../../../services/dispatcher/dist_dispatcher.zip"
+}
+
+resource "aws_iam_role" "dispatcher_role" {
+  name               = "${var.project_name}-${var.stage}-dispatcher-role"
+  assume_role_policy = data.aws_iam_policy_document.lambda_assume.json
+  tags               = var.tags
+}
+
+data "aws_iam_policy_document" "dispatcher_policy_doc" {
+  statement {
+    actions = [
+      "dynamodb:DescribeStream",
+      "dynamodb:GetRecords",
+      "dynamodb:GetShardIterator",
+      "dynamodb:ListStreams",
+    ]
+    resources = [aws_dynamodb_table.tasks.stream_arn]
+  }
+
+  statement {
+    actions   = ["sqs:SendMessage"]
+    resources = [aws_sqs_queue.tasks.arn, aws_sqs_queue.tasks_bulk.arn, aws_sqs_queue.dispatcher_failures.arn]
+  }
+
+  statement {
+    actions   = ["logs:CreateLogGroup", "logs:CreateLogStream", "logs:PutLogEvents"]
+    resources = ["arn:aws:logs:*:*:*"]
+  }
+}
+
+resource "aws_iam_policy" "dispatcher_policy" {
+  name   = "${var.project_name}-${var.stage}-dispatcher-policy"
+  policy = data.aws_iam_policy_document.dispatcher_policy_doc.json
+  tags   = var.tags
+}
+
+resource "aws_iam_role_policy_attachment" "dispatcher_attach" {
+  role       = aws_iam_role.dispatcher_role.name
+  policy_arn = aws_iam_policy.dispatcher_policy.arn
+}
+
+resource "aws_lambda_function" "dispatcher" {
+  function_name    = "${var.project_name}-${var.stage}-dispatcher"
+  role             = aws_iam_role.dispatcher_role.arn
+  runtime          = var.lambda_runtime
+  handler          = "handler.handler"
+  filename         = data.archive_file.dispatcher_zip.output_path
+  source_code_hash = data.archive_file.dispatcher_zip.output_base64sha256
+  timeout          = 30
+  memory_size      = var.lambda_memory_size
+
+  environment {
+    variables = {
+      STAGE            = var.stage
+      SQS_QUEUE_URL    = aws_sqs_queue.tasks.id
+      BULK_QUEUE_URL   = aws_sqs_queue.tasks_bulk.id
+      FAIR_SHARE_TASKS = var.dispatcher_fair_share_tasks
+    }
+  }
+
+  tracing_config {
+    mode = "Active"
+  }
+  tags = var.tags
+}
+
+resource "aws_lambda_event_source_mapping" "dispatcher_stream" {
+  event_source_arn  = aws_dynamodb_table.tasks.stream_arn
+  function_name     = aws_lambda_function.dispatcher.arn
+  starting_position = "TRIM_HORIZON"
+  batch_size        = 100
+  enabled           = true
+
+  maximum_batching_window_in_seconds = 1
+  maximum_retry_attempts             = var.dispatcher_max_retry_attempts
+  maximum_record_age_in_seconds      = -1
+  bisect_batch_on_function_error     = true
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  destination_config {
+    on_failure {
+      destination_arn = aws_sqs_queue.dispatcher_failures.arn
+    }
+  }
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["INSERT"]
+        dynamodb = {
+          NewImage = {
+            status = { S = ["PENDING"] }
+          }
+        }
+      })
+    }
+  }
+}
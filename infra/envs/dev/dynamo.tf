@@ -25,6 +25,11 @@ resource "aws_dynamodb_table" "tasks" {
     type = "S"
   }
 
+  attribute {
+    name = "user_status"
+    type = "S"
+  }
+
   global_secondary_index {
     name            = "by_task"
     hash_key        = "task_id"
@@ -39,6 +44,19 @@ resource "aws_dynamodb_table" "tasks" {
     projection_type = "ALL"
   }
 
+  # Sparse: user_status ("<pk>#<status>") is only set while a task is PENDING, PROCESSING
+  # or FAILED. The worker removes it on DONE, so the index stays small.
+  global_secondary_index {
+    name            = "by_user_status"
+    hash_key        = "user_status"
+    range_key       = "created_at"
+    projection_type = "ALL"
+  }
+
+  # Feeds the dispatcher, which enqueues newly inserted PENDING tasks.
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
   ttl {
     attribute_name = "ttl"
     enabled        = true
@@ -58,6 +76,7 @@ data "aws_iam_policy_document" "lambda_tasks_access" {
       "dynamodb:GetItem",
       "dynamodb:UpdateItem",
       "dynamodb:Query",
+      "dynamodb:BatchGetItem",
     ]
     resources = [
       aws_dynamodb_table.tasks.arn,
@@ -20,6 +20,23 @@ resource "aws_cloudwatch_metric_alarm" "dlq_messages" {
   }
 }
 
+resource "aws_cloudwatch_metric_alarm" "dispatcher_failures" {
+  alarm_name          = "${var.project_name}-${var.stage}-dispatcher-failures"
+  comparison_operator = "GreaterThanThreshold"
+  evaluation_periods  = "1"
+  metric_name         = "ApproximateNumberOfVisibleMessages"
+  namespace           = "AWS/SQS"
+  period              = "300"
+  statistic           = "Average"
+  threshold           = "0"
+  alarm_description   = "Stream batches the dispatcher gave up on - their PENDING tasks were never enqueued"
+  alarm_actions       = [aws_sns_topic.alerts.arn]
+
+  dimensions = {
+    QueueName = aws_sqs_queue.dispatcher_failures.name
+  }
+}
+
 resource "aws_cloudwatch_metric_alarm" "api_5xx_errors" {
   alarm_name          = "${var.project_name}-${var.stage}-api-5xx-errors"
   comparison_operator = "GreaterThanThreshold"
@@ -109,3 +126,134 @@ resource "aws_cloudwatch_metric_alarm" "dynamodb_throttles" {
   }
 }
 
+
+# Метрики из логов Lambda (CloudWatch Embedded Metric Format), см. Metrics в handler.py
+locals {
+  metrics_namespace = "${var.project_name}/${var.stage}"
+  worker_stages     = ["claim_ms", "head_ms", "stats_cache_get_ms", "calculate_stats_ms", "save_result_ms", "mark_completed_ms"]
+  worker_outcomes   = ["tasks_processed", "tasks_failed", "tasks_retried", "tasks_deferred", "tasks_forwarded", "stats_cache_hits"]
+}
+
+resource "aws_cloudwatch_dashboard" "hot_path" {
+  dashboard_name = "${var.project_name}-${var.stage}-hot-path"
+
+  dashboard_body = jsonencode({
+    widgets = [
+      {
+        type   = "metric"
+        x      = 0
+        y      = 0
+        width  = 12
+        height = 6
+        properties = {
+          title   = "Worker: time per stage (avg per task)"
+          view    = "timeSeries"
+          stacked = true
+          region  = var.aws_region
+          stat    = "Average"
+          period  = 300
+          metrics = [for name in local.worker_stages : [local.metrics_namespace, name, "Service", "worker"]]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 12
+        y      = 0
+        width  = 12
+        height = 6
+        properties = {
+          title  = "Worker: task duration"
+          view   = "timeSeries"
+          region = var.aws_region
+          period = 300
+          metrics = [
+            [local.metrics_namespace, "task_ms", "Service", "worker", { stat = "p50", label = "p50" }],
+            [local.metrics_namespace, "task_ms", "Service", "worker", { stat = "p95", label = "p95" }],
+            [local.metrics_namespace, "task_ms", "Service", "worker", { stat = "p99", label = "p99" }],
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 0
+        y      = 6
+        width  = 12
+        height = 6
+        properties = {
+          title  = "Worker: stats throughput (MiB/s)"
+          view   = "timeSeries"
+          region = var.aws_region
+          period = 300
+          metrics = [
+            [{ expression = "bytes / (calc / 1000) / 1048576", label = "MiB/s", id = "throughput" }],
+            [local.metrics_namespace, "bytes_processed", "Service", "worker", { stat = "Sum", id = "bytes", visible = false }],
+            [local.metrics_namespace, "calculate_stats_ms", "Service", "worker", { stat = "Sum", id = "calc", visible = false }],
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 12
+        y      = 6
+        width  = 12
+        height = 6
+        properties = {
+          title   = "Worker: task outcomes"
+          view    = "timeSeries"
+          region  = var.aws_region
+          stat    = "Sum"
+          period  = 300
+          metrics = [for name in local.worker_outcomes : [local.metrics_namespace, name, "Service", "worker"]]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 0
+        y      = 12
+        width  = 12
+        height = 6
+        properties = {
+          title  = "API: p95 latency by route (ms)"
+          view   = "timeSeries"
+          region = var.aws_region
+          period = 300
+          metrics = [
+            [{ expression = "SEARCH('{${local.metrics_namespace},Service,Route} MetricName=\"request_ms\"', 'p95', 300)", id = "latency" }],
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 12
+        y      = 12
+        width  = 12
+        height = 6
+        properties = {
+          title  = "API: time in DynamoDB / serialization (avg per request, ms)"
+          view   = "timeSeries"
+          region = var.aws_region
+          period = 300
+          metrics = [
+            [{ expression = "SEARCH('{${local.metrics_namespace},Service,Route} MetricName=(\"dynamo_get_ms\" OR \"dynamo_query_ms\" OR \"dynamo_put_ms\" OR \"dynamo_batch_get_ms\" OR \"dynamo_batch_put_ms\" OR \"serialize_ms\" OR \"compress_ms\")', 'Average', 300)", id = "stages" }],
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 0
+        y      = 18
+        width  = 24
+        height = 6
+        properties = {
+          title  = "API: 4xx / 5xx responses by route"
+          view   = "timeSeries"
+          region = var.aws_region
+          period = 300
+          metrics = [
+            [{ expression = "SEARCH('{${local.metrics_namespace},Service,Route} MetricName=(\"responses_4xx\" OR \"responses_5xx\")', 'Sum', 300)", id = "errors" }],
+          ]
+        }
+      },
+    ]
+  })
+}
@@ -56,6 +56,14 @@ resource "aws_s3_bucket_lifecycle_configuration" "files" {
     noncurrent_version_expiration { noncurrent_days = 30 }
   }
 
+  # Незавершённые multipart-загрузки (экспорт задач и загрузка файлов по частям)
+  rule {
+    id     = "abort-incomplete-multipart"
+    status = "Enabled"
+    filter {}
+    abort_incomplete_multipart_upload { days_after_initiation = 1 }
+  }
+
   # Переход в IA класс для экономии (через 30 дней)
   rule {
     id     = "transition-to-ia"
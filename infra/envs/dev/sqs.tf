@@ -4,6 +4,12 @@ resource "aws_sqs_queue" "tasks_dlq" {
   tags                      = var.tags
 }
 
+resource "aws_sqs_queue" "dispatcher_failures" {
+  name                      = "${var.project_name}-${var.stage}-dispatcher-failures"
+  message_retention_seconds = var.sqs_message_retention_seconds
+  tags                      = var.tags
+}
+
 resource "aws_sqs_queue" "tasks" {
   name                       = "${var.project_name}-${var.stage}-tasks-queue"
   visibility_timeout_seconds = var.sqs_visibility_timeout_seconds
@@ -14,21 +20,23 @@ resource "aws_sqs_queue" "tasks" {
   tags = var.tags
 }
 
-data "aws_iam_policy_document" "lambda_sqs_send" {
-  statement {
-    actions   = ["sqs:SendMessage"]
-    resources = [aws_sqs_queue.tasks.arn]
-  }
-}
-
-resource "aws_iam_policy" "lambda_sqs_policy" {
-  name   = "${var.project_name}-${var.stage}-lambda-sqs-send"
-  policy = data.aws_iam_policy_document.lambda_sqs_send.json
-  tags   = var.tags
+resource "aws_sqs_queue" "tasks_bulk" {
+  name                       = "${var.project_name}-${var.stage}-tasks-bulk-queue"
+  visibility_timeout_seconds = var.sqs_visibility_timeout_seconds
+  redrive_policy = jsonencode({
+    maxReceiveCount     = var.sqs_max_receive_count
+    deadLetterTargetArn = aws_sqs_queue.tasks_dlq.arn
+  })
+  tags = var.tags
 }
 
-resource "aws_iam_role_policy_attachment" "lambda_sqs_attach" {
-  role       = aws_iam_role.api_lambda_role.name
-  policy_arn = aws_iam_policy.lambda_sqs_policy.arn
+resource "aws_sqs_queue" "tasks_large" {
+  name                       = "${var.project_name}-${var.stage}-tasks-large-queue"
+  visibility_timeout_seconds = var.worker_large_timeout * 6
+  redrive_policy = jsonencode({
+    maxReceiveCount     = var.sqs_max_receive_count
+    deadLetterTargetArn = aws_sqs_queue.tasks_dlq.arn
+  })
+  tags = var.tags
 }
 
@@ -130,6 +130,78 @@ variable "sqs_max_receive_count" {
   default     = 3
 }
 
+variable "worker_batch_size" {
+  description = "Maximum number of SQS messages delivered to one worker invocation"
+  type        = number
+  default     = 20
+}
+
+variable "worker_batching_window_seconds" {
+  description = "Maximum time to gather a worker batch (required above 10 messages)"
+  type        = number
+  default     = 1
+}
+
+variable "worker_timeout" {
+  description = "Worker Lambda timeout in seconds"
+  type        = number
+  default     = 30
+}
+
+variable "worker_large_timeout" {
+  description = "Timeout in seconds of the worker that handles oversized files"
+  type        = number
+  default     = 900
+}
+
+variable "worker_large_memory_size" {
+  description = "Memory size in MB of the worker that handles oversized files"
+  type        = number
+  default     = 1024
+}
+
+variable "worker_concurrency" {
+  description = "Number of records processed concurrently inside one worker invocation"
+  type        = number
+  default     = 8
+}
+
+variable "api_long_poll_max_wait_seconds" {
+  description = "Upper bound for ?wait=N long polls on task status; the API timeout is raised to fit it"
+  type        = number
+  default     = 20
+}
+
+variable "api_admission_rate_per_second" {
+  description = "Sustained task creations per second allowed per tenant"
+  type        = number
+  default     = 10
+}
+
+variable "api_admission_burst" {
+  description = "Task creations a tenant may make at once before the sustained rate applies"
+  type        = number
+  default     = 1000
+}
+
+variable "dispatcher_fair_share_tasks" {
+  description = "Tasks per tenant per minute sent to the main queue; the rest go to the bulk queue"
+  type        = number
+  default     = 50
+}
+
+variable "worker_bulk_max_concurrency" {
+  description = "Maximum concurrent worker invocations draining the bulk queue (at least 2)"
+  type        = number
+  default     = 2
+}
+
+variable "dispatcher_max_retry_attempts" {
+  description = "Retries of a failed stream batch before it is sent to the DLQ"
+  type        = number
+  default     = 1000
+}
+
 variable "cognito_password_minimum_length" {
   description = "Cognito password minimum length"
   type        = number
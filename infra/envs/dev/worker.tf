@@ -23,11 +23,16 @@ resource "aws_iam_role" "worker_role" {
 data "aws_iam_policy_document" "worker_policy_doc" {
   statement {
     actions   = ["sqs:ReceiveMessage", "sqs:DeleteMessage", "sqs:GetQueueAttributes", "sqs:ChangeMessageVisibility"]
-    resources = [aws_sqs_queue.tasks.arn]
+    resources = [aws_sqs_queue.tasks.arn, aws_sqs_queue.tasks_bulk.arn, aws_sqs_queue.tasks_large.arn]
   }
 
   statement {
-    actions   = ["dynamodb:UpdateItem", "dynamodb:GetItem"]
+    actions   = ["sqs:SendMessage"]
+    resources = [aws_sqs_queue.tasks_large.arn]
+  }
+
+  statement {
+    actions   = ["dynamodb:UpdateItem", "dynamodb:GetItem", "dynamodb:PutItem"]
     resources = [aws_dynamodb_table.tasks.arn]
   }
 
@@ -65,14 +70,19 @@ resource "aws_lambda_function" "worker" {
   handler          = "handler.handler"
   filename         = data.archive_file.worker_zip.output_path
   source_code_hash = data.archive_file.worker_zip.output_base64sha256
-  timeout          = 30
+  timeout          = var.worker_timeout
   memory_size      = var.lambda_memory_size
 
   environment {
     variables = {
-      STAGE       = var.stage
-      TABLE_NAME  = aws_dynamodb_table.tasks.name
-      BUCKET_NAME = aws_s3_bucket.files.bucket
+      STAGE                  = var.stage
+      TABLE_NAME             = aws_dynamodb_table.tasks.name
+      BUCKET_NAME            = aws_s3_bucket.files.bucket
+      MAX_RECEIVE_COUNT      = var.sqs_max_receive_count
+      WORKER_CONCURRENCY     = var.worker_concurrency
+      LARGE_TASK_QUEUE_URL   = aws_sqs_queue.tasks_large.id
+      OVERSIZED_TASK_COST_MS = (var.worker_timeout - 5) * 1000
+      METRICS_NAMESPACE      = local.metrics_namespace
     }
   }
 
@@ -85,6 +95,59 @@ resource "aws_lambda_function" "worker" {
 resource "aws_lambda_event_source_mapping" "worker_sqs" {
   event_source_arn = aws_sqs_queue.tasks.arn
   function_name    = aws_lambda_function.worker.arn
-  batch_size       = 5
+  batch_size       = var.worker_batch_size
+  enabled          = true
+
+  maximum_batching_window_in_seconds = var.worker_batching_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+resource "aws_lambda_event_source_mapping" "worker_bulk_sqs" {
+  event_source_arn = aws_sqs_queue.tasks_bulk.arn
+  function_name    = aws_lambda_function.worker.arn
+  batch_size       = var.worker_batch_size
+  enabled          = true
+
+  maximum_batching_window_in_seconds = var.worker_batching_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.worker_bulk_max_concurrency
+  }
+}
+
+resource "aws_lambda_function" "worker_large" {
+  function_name    = "${var.project_name}-${var.stage}-worker-large"
+  role             = aws_iam_role.worker_role.arn
+  runtime          = var.lambda_runtime
+  handler          = "handler.handler"
+  filename         = data.archive_file.worker_zip.output_path
+  source_code_hash = data.archive_file.worker_zip.output_base64sha256
+  timeout          = var.worker_large_timeout
+  memory_size      = var.worker_large_memory_size
+
+  environment {
+    variables = {
+      STAGE              = var.stage
+      TABLE_NAME         = aws_dynamodb_table.tasks.name
+      BUCKET_NAME        = aws_s3_bucket.files.bucket
+      MAX_RECEIVE_COUNT  = var.sqs_max_receive_count
+      WORKER_CONCURRENCY = 1
+      METRICS_NAMESPACE  = local.metrics_namespace
+    }
+  }
+
+  tracing_config {
+    mode = "Active"
+  }
+  tags = var.tags
+}
+
+resource "aws_lambda_event_source_mapping" "worker_large_sqs" {
+  event_source_arn = aws_sqs_queue.tasks_large.arn
+  function_name    = aws_lambda_function.worker_large.arn
+  batch_size       = 1
   enabled          = true
+
+  function_response_types = ["ReportBatchItemFailures"]
 }
@@ -1,113 +1,1128 @@
 import json
+import math
 import os
 import uuid
 import base64
+import copy
+import gzip
+import hashlib
+import random
+import threading
+import time
+import zlib
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Dict, Any, Optional
-from urllib.parse import parse_qs
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Set, Tuple, Callable, Iterator, Union
+from urllib.parse import parse_qs, unquote
 
-import boto3
-from botocore.config import Config as BotocoreConfig
-from boto3.dynamodb.conditions import Key
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class Config:
     TABLE_NAME = os.getenv("TABLE_NAME", "taskflow-dev-tasks")
     BUCKET_NAME = os.getenv("BUCKET_NAME")
     AWS_REGION = os.getenv("AWS_REGION", "eu-central-1")
-    SQS_QUEUE_URL = os.getenv("SQS_QUEUE_URL")
     STAGE = os.getenv("STAGE", "dev")
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "aws")
+    BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", "500"))
+    BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "5"))
+    BATCH_WRITE_CONCURRENCY = int(os.getenv("BATCH_WRITE_CONCURRENCY", os.getenv("AWS_MAX_POOL_CONNECTIONS", "10")))
+    AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "3"))
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "10"))
+    AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "2"))
+    AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "5"))
+    LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "50"))
+    LIST_MAX_PROJECTED_LIMIT = int(os.getenv("LIST_MAX_PROJECTED_LIMIT", "500"))
+    TASK_CACHE_MAX_ITEMS = int(os.getenv("TASK_CACHE_MAX_ITEMS", "1000"))
+    TASK_CACHE_TTL_SECONDS = float(os.getenv("TASK_CACHE_TTL_SECONDS", "300"))
+    TASK_CACHE_LOG_EVERY = int(os.getenv("TASK_CACHE_LOG_EVERY", "100"))
+    LONG_POLL_MAX_WAIT_SECONDS = float(os.getenv("LONG_POLL_MAX_WAIT_SECONDS", "20"))
+    LONG_POLL_INTERVAL_SECONDS = float(os.getenv("LONG_POLL_INTERVAL_SECONDS", "0.25"))
+    STATUS_MAX_TASK_IDS = int(os.getenv("STATUS_MAX_TASK_IDS", "100"))
+    EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+    EXPORT_PART_SIZE = int(os.getenv("EXPORT_PART_SIZE", str(8 * 1024 * 1024)))
+    EXPORT_MAX_SECONDS = float(os.getenv("EXPORT_MAX_SECONDS", "20"))
+    RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1024"))
+    RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    MULTIPART_MIN_PART_SIZE = int(os.getenv("MULTIPART_MIN_PART_SIZE", str(8 * 1024 * 1024)))
+    MULTIPART_MAX_PARTS = 10000
+    MULTIPART_MAX_OBJECT_SIZE = 5 * 1024 ** 4
+    MULTIPART_PRESIGN_BATCH = int(os.getenv("MULTIPART_PRESIGN_BATCH", "100"))
+    MULTIPART_URL_EXPIRES_SECONDS = int(os.getenv("MULTIPART_URL_EXPIRES_SECONDS", "3600"))
+    SLOW_ROUTE_LOG_MS = float(os.getenv("SLOW_ROUTE_LOG_MS", "1000"))
+    USAGE_MAX_DAYS = int(os.getenv("USAGE_MAX_DAYS", "90"))
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "10"))
+    ADMISSION_BURST = int(os.getenv("ADMISSION_BURST", "1000"))
+    ADMISSION_SHARDS = max(1, int(os.getenv("ADMISSION_SHARDS", "4")))
+    ADMISSION_LEASE_TOKENS = int(os.getenv("ADMISSION_LEASE_TOKENS", "10"))
+    ADMISSION_RECHECK_SECONDS = float(os.getenv("ADMISSION_RECHECK_SECONDS", "1"))
+    ADMISSION_CACHE_MAX_TENANTS = int(os.getenv("ADMISSION_CACHE_MAX_TENANTS", "10000"))
+    ADMISSION_MAX_ATTEMPTS = int(os.getenv("ADMISSION_MAX_ATTEMPTS", "3"))
+    METRICS_SINK = os.getenv("METRICS_SINK", "emf")
+    METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "Taskflow")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
 
 
 class AWSClients:
+    """AWS clients built on first use, so routes like /health and /me never pay
+    for importing boto3 or constructing clients they don't need."""
+
     def __init__(self):
-        self.dynamo = boto3.resource("dynamodb")
-        self.table = self.dynamo.Table(Config.TABLE_NAME)
-        self.s3 = boto3.client(
-            "s3",
+        self._dynamo = None
+        self._table = None
+        self._s3 = None
+
+    @staticmethod
+    def _client_config(**kwargs: Any):
+        from botocore.config import Config as BotocoreConfig
+
+        return BotocoreConfig(
             region_name=Config.AWS_REGION,
-            config=BotocoreConfig(s3={"addressing_style": "virtual"})
+            retries={"mode": "adaptive", "max_attempts": Config.AWS_MAX_ATTEMPTS},
+            max_pool_connections=Config.AWS_MAX_POOL_CONNECTIONS,
+            connect_timeout=Config.AWS_CONNECT_TIMEOUT,
+            read_timeout=Config.AWS_READ_TIMEOUT,
+            tcp_keepalive=True,
+            **kwargs,
         )
-        self.sqs = boto3.client("sqs", region_name=Config.AWS_REGION)
 
+    @property
+    def dynamo(self):
+        if self._dynamo is None:
+            import boto3
 
-aws_clients = AWSClients()
+            self._dynamo = boto3.resource("dynamodb", config=self._client_config())
+        return self._dynamo
 
-class RequestHandler:
-    def __init__(self, event: Dict[str, Any]):
-        self.event = event
-        self.http = event.get("requestContext", {}).get("http", {})
-        self.method = self.http.get("method", "").upper()
-        self.raw_path = event.get("rawPath", "").lower()
-        self.claims = self._extract_claims()
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = self.dynamo.Table(Config.TABLE_NAME)
+        return self._table
 
-    def _extract_claims(self) -> Dict[str, Any]:
-        return (
-            self.event.get("requestContext", {})
-            .get("authorizer", {})
-            .get("jwt", {})
-            .get("claims", {})
+    @property
+    def s3(self):
+        if self._s3 is None:
+            import boto3
+
+            self._s3 = boto3.client("s3", config=self._client_config(s3={"addressing_style": "virtual"}))
+        return self._s3
+
+
+class TaskQuery:
+    def __init__(
+        self,
+        pk: str,
+        limit: int,
+        start_key: Optional[Dict[str, Any]] = None,
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        attributes: Optional[List[str]] = None,
+    ):
+        self.pk = pk
+        self.limit = limit
+        self.start_key = start_key
+        self.status = status
+        self.created_from = created_from
+        self.created_to = created_to
+        self.attributes = attributes
+
+
+class TaskTable:
+    # Statuses with a by_user_status entry (user_status = "<pk>#<status>"). DONE tasks, the
+    # vast majority, are left out to keep the index small and are filtered from by_user_created.
+    INDEXED_STATUSES = ("PENDING", "PROCESSING", "FAILED")
+
+    def put_if_absent(self, item: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def get(self, pk: str, sk: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def query_user_tasks(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def batch_get(
+        self, keys: List[Dict[str, str]], attributes: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        """Up to 100 keys; returns (items, unprocessed keys)."""
+        raise NotImplementedError
+
+    def put_many_if_absent(self, items: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """put_if_absent for each item; returns (sort keys that already existed, items not written due to errors)."""
+        raise NotImplementedError
+
+    def add_counters(self, pk: str, sk: str, counters: Dict[str, int]) -> None:
+        """Atomically adds to numeric attributes, creating the item if needed."""
+        raise NotImplementedError
+
+
+class TokenBucket:
+    """Refill arithmetic for a bucket stored as (tokens, updated_at)."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+
+    def available(self, tokens: Optional[float], updated_at: Optional[float], now: float) -> float:
+        # A bucket that was never written (or expired) is full.
+        if tokens is None or updated_at is None:
+            return self.capacity
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+
+    def seconds_to_fill(self, tokens: float) -> float:
+        return (self.capacity - tokens) / self.rate if self.rate > 0 else 0.0
+
+
+class TokenBucketStore:
+    SORT_KEY = "bucket"
+
+    def take(self, key: str, bucket: TokenBucket, maximum: int, now: float) -> int:
+        """Takes up to ``maximum`` whole tokens from the bucket; returns how many were taken."""
+        raise NotImplementedError
+
+
+class ObjectStore:
+    def presign(self, operation: str, key: str, expires_in: int, **params: Any) -> str:
+        raise NotImplementedError
+
+    def put(self, key: str, body: bytes, **params: Any) -> None:
+        raise NotImplementedError
+
+    def create_multipart(self, key: str, **params: Any) -> str:
+        raise NotImplementedError
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        raise NotImplementedError
+
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def complete_multipart(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def abort_multipart(self, key: str, upload_id: str) -> None:
+        raise NotImplementedError
+
+
+class DynamoTaskTable(TaskTable):
+    _executor: Any = None
+
+    def __init__(self, clients: AWSClients):
+        self.clients = clients
+
+    def put_if_absent(self, item: Dict[str, Any]) -> bool:
+        try:
+            with metrics.span("dynamo_put"):
+                self.clients.table.put_item(
+                    Item=item,
+                    ConditionExpression="attribute_not_exists(pk) AND attribute_not_exists(sk)"
+                )
+        except self.clients.dynamo.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def get(self, pk: str, sk: str) -> Optional[Dict[str, Any]]:
+        with metrics.span("dynamo_get"):
+            return self.clients.table.get_item(Key={"pk": pk, "sk": sk}).get("Item")
+
+    def query_user_tasks(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        names: Dict[str, str] = {}
+        if query.status in self.INDEXED_STATUSES:
+            index, key_condition = "by_user_status", "user_status = :hk"
+            values: Dict[str, Any] = {":hk": f"{query.pk}#{query.status}"}
+        else:
+            index, key_condition = "by_user_created", "pk = :hk"
+            values = {":hk": query.pk}
+
+        if query.created_from and query.created_to:
+            key_condition += " AND created_at BETWEEN :from AND :to"
+        elif query.created_from:
+            key_condition += " AND created_at >= :from"
+        elif query.created_to:
+            key_condition += " AND created_at <= :to"
+        if query.created_from:
+            values[":from"] = query.created_from
+        if query.created_to:
+            values[":to"] = query.created_to
+
+        query_args = {
+            "IndexName": index,
+            "KeyConditionExpression": key_condition,
+            "ScanIndexForward": False,
+            "Limit": query.limit,
+        }
+        if query.status and index == "by_user_created":
+            query_args["FilterExpression"] = "#s = :status"
+            names["#s"] = "status"
+            values[":status"] = query.status
+        if query.attributes:
+            projected = {f"#p{i}": name for i, name in enumerate(query.attributes)}
+            query_args["ProjectionExpression"] = ", ".join(projected)
+            names.update(projected)
+        if names:
+            query_args["ExpressionAttributeNames"] = names
+        query_args["ExpressionAttributeValues"] = values
+        if query.start_key:
+            query_args["ExclusiveStartKey"] = query.start_key
+
+        with metrics.span("dynamo_query"):
+            resp = self.clients.table.query(**query_args)
+        return resp.get("Items", []), resp.get("LastEvaluatedKey")
+
+    def batch_get(
+        self, keys: List[Dict[str, str]], attributes: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        names = {f"#a{i}": name for i, name in enumerate(attributes)}
+        with metrics.span("dynamo_batch_get"):
+            resp = self.clients.dynamo.batch_get_item(RequestItems={
+                Config.TABLE_NAME: {
+                    "Keys": keys,
+                    "ProjectionExpression": ", ".join(names),
+                    "ExpressionAttributeNames": names,
+                }
+            })
+        items = resp.get("Responses", {}).get(Config.TABLE_NAME, [])
+        unprocessed = (resp.get("UnprocessedKeys") or {}).get(Config.TABLE_NAME, {}).get("Keys", [])
+        return items, unprocessed
+
+    def put_many_if_absent(self, items: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        # BatchWriteItem has no conditions, so each item gets its own conditional PutItem,
+        # issued in parallel through the (thread-safe) client behind the resource.
+        existing: List[str] = []
+        failed: List[Dict[str, Any]] = []
+        with metrics.span("dynamo_put_many"):
+            for item, outcome in zip(items, self._get_executor().map(self._put_conditional, items)):
+                if outcome is None:
+                    existing.append(item["sk"])
+                elif isinstance(outcome, Exception):
+                    Logger.error(f"Conditional put of {item['sk']} failed: {outcome}")
+                    failed.append(item)
+        return existing, failed
+
+    def _put_conditional(self, item: Dict[str, Any]) -> Any:
+        """Returns True when written, None when the item exists and the exception otherwise."""
+        client = self.clients.dynamo.meta.client
+        try:
+            client.put_item(
+                TableName=Config.TABLE_NAME,
+                Item=item,
+                ConditionExpression="attribute_not_exists(pk) AND attribute_not_exists(sk)",
+            )
+        except client.exceptions.ConditionalCheckFailedException:
+            return None
+        except Exception as e:
+            return e
+        return True
+
+    @classmethod
+    def _get_executor(cls) -> Any:
+        # Kept for the container lifetime; sized to the connection pool. Imported here so
+        # cold starts of routes that never batch-write don't pay for it.
+        if cls._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            cls._executor = ThreadPoolExecutor(max_workers=Config.BATCH_WRITE_CONCURRENCY, thread_name_prefix="put")
+        return cls._executor
+
+    def add_counters(self, pk: str, sk: str, counters: Dict[str, int]) -> None:
+        with metrics.span("dynamo_add_counters"):
+            self.clients.table.update_item(
+                Key={"pk": pk, "sk": sk},
+                UpdateExpression="ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(counters))),
+                ExpressionAttributeNames={f"#c{i}": name for i, name in enumerate(counters)},
+                ExpressionAttributeValues={f":c{i}": value for i, value in enumerate(counters.values())},
+            )
+
+
+class S3ObjectStore(ObjectStore):
+    def __init__(self, clients: AWSClients):
+        self.clients = clients
+
+    def presign(self, operation: str, key: str, expires_in: int, **params: Any) -> str:
+        http_method = {"put_object": "PUT", "upload_part": "PUT", "get_object": "GET"}[operation]
+        return self.clients.s3.generate_presigned_url(
+            ClientMethod=operation,
+            Params={"Bucket": Config.BUCKET_NAME, "Key": key, **params},
+            ExpiresIn=expires_in,
+            HttpMethod=http_method,
         )
 
-    def _get_user_sub(self) -> Optional[str]:
-        return self.claims.get("sub")
+    def put(self, key: str, body: bytes, **params: Any) -> None:
+        with metrics.span("s3_put"):
+            self.clients.s3.put_object(Bucket=Config.BUCKET_NAME, Key=key, Body=body, **params)
+        metrics.add_bytes("s3_bytes_written", len(body))
 
-    def _require_auth(self) -> str:
-        sub = self._get_user_sub()
-        if not sub:
-            raise UnauthorizedError("Missing user sub")
-        return sub
+    def create_multipart(self, key: str, **params: Any) -> str:
+        resp = self.clients.s3.create_multipart_upload(Bucket=Config.BUCKET_NAME, Key=key, **params)
+        return resp["UploadId"]
 
-    def _get_task_id_from_path(self) -> Optional[str]:
-        task_id = (self.event.get("pathParameters") or {}).get("id")
-        if not task_id and "/tasks/" in self.raw_path:
-            task_id = self.raw_path.rsplit("/", 1)[-1]
-        return task_id
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        with metrics.span("s3_upload_part"):
+            resp = self.clients.s3.upload_part(
+                Bucket=Config.BUCKET_NAME, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+            )
+        metrics.add_bytes("s3_bytes_written", len(body))
+        return resp["ETag"]
 
-    def route(self) -> Dict[str, Any]:
-        if self.raw_path.endswith("/health"):
-            return HealthService().get_health()
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        parts: List[Dict[str, Any]] = []
+        marker = 0
+        try:
+            while True:
+                resp = self.clients.s3.list_parts(
+                    Bucket=Config.BUCKET_NAME, Key=key, UploadId=upload_id, PartNumberMarker=marker
+                )
+                parts.extend(
+                    {"PartNumber": p["PartNumber"], "ETag": p["ETag"], "Size": p["Size"]} for p in resp.get("Parts", [])
+                )
+                if not resp.get("IsTruncated"):
+                    return parts
+                marker = resp["NextPartNumberMarker"]
+        except Exception as e:
+            self._raise_for_upload(e)
 
-        if self.raw_path.endswith("/me"):
-            return UserService().get_user_info(self.claims)
+    def complete_multipart(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        try:
+            self.clients.s3.complete_multipart_upload(
+                Bucket=Config.BUCKET_NAME, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception as e:
+            self._raise_for_upload(e)
+
+    def abort_multipart(self, key: str, upload_id: str) -> None:
+        try:
+            self.clients.s3.abort_multipart_upload(Bucket=Config.BUCKET_NAME, Key=key, UploadId=upload_id)
+        except Exception as e:
+            self._raise_for_upload(e)
+
+    @staticmethod
+    def _raise_for_upload(e: Exception) -> None:
+        code = (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+        if code == "NoSuchUpload":
+            raise NotFoundError("Upload not found, already completed or aborted") from e
+        if code in ("InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+            raise ValidationError(f"Cannot complete upload: {code}") from e
+        raise e
+
+
+class DynamoTokenBucketStore(TokenBucketStore):
+    """Buckets as items of the tasks table, updated with optimistic conditional puts.
+
+    Items expire through ``ttl`` once the bucket would be full again, which is
+    the same state as a missing item.
+    """
 
-        if self.raw_path.endswith("/tasks") and self.method == "POST":
-            return TaskService().create_task(self.event)
+    def __init__(self, clients: AWSClients):
+        self.clients = clients
 
-        if self.raw_path.endswith("/files/presign") and self.method == "POST":
-            return FileService().presign_upload(self.event)
+    def take(self, key: str, bucket: TokenBucket, maximum: int, now: float) -> int:
+        for _ in range(Config.ADMISSION_MAX_ATTEMPTS):
+            with metrics.span("dynamo_quota_get"):
+                item = self.clients.table.get_item(
+                    Key={"pk": key, "sk": self.SORT_KEY}, ConsistentRead=True
+                ).get("Item")
+            if item:
+                available = bucket.available(float(item["tokens"]), float(item["updated_at"]), now)
+            else:
+                available = bucket.available(None, None, now)
+            granted = min(maximum, int(available))
+            if granted <= 0:
+                return 0
 
-        if self.raw_path.endswith("/files/download") and self.method == "POST":
-            return FileService().presign_download(self.event)
+            remaining = available - granted
+            condition: Dict[str, Any] = {"ConditionExpression": "attribute_not_exists(pk)"}
+            if item:
+                condition = {
+                    "ConditionExpression": "tokens = :tokens AND updated_at = :updated_at",
+                    "ExpressionAttributeValues": {":tokens": item["tokens"], ":updated_at": item["updated_at"]},
+                }
+            try:
+                with metrics.span("dynamo_quota_put"):
+                    self.clients.table.put_item(
+                        Item={
+                            "pk": key,
+                            "sk": self.SORT_KEY,
+                            "tokens": Decimal(str(round(remaining, 6))),
+                            "updated_at": Decimal(str(round(now, 6))),
+                            "ttl": int(now + bucket.seconds_to_fill(remaining)) + 60,
+                        },
+                        **condition,
+                    )
+            except self.clients.dynamo.meta.client.exceptions.ConditionalCheckFailedException:
+                # Another container took tokens in between; re-read and try again.
+                continue
+            return granted
+        return 0
 
-        if self.raw_path.endswith("/tasks") and self.method == "GET":
-            return TaskService().list_tasks(self.event)
 
-        if self.method == "GET":
-            task_id = self._get_task_id_from_path()
-            if task_id:
-                return TaskService().get_task(self.event, task_id)
+class InMemoryTaskTable(TaskTable):
+    """Process-local table with the same semantics the API relies on from DynamoDB.
 
-        return ResponseBuilder.not_found()
+    Numbers come back as Decimal, as they would from boto3. Pass the same
+    ``items`` dict to several tables to share state between them.
+    """
+
+    def __init__(self, items: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None):
+        self.items = items if items is not None else {}
+        self._lock = threading.Lock()
+
+    def put_if_absent(self, item: Dict[str, Any]) -> bool:
+        with self._lock:
+            key = (item["pk"], item["sk"])
+            if key in self.items:
+                return False
+            self.items[key] = InMemoryTaskTable._to_dynamo(item)
+            return True
+
+    def get(self, pk: str, sk: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self.items.get((pk, sk))
+            return copy.deepcopy(item) if item is not None else None
+
+    def query_user_tasks(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        sparse = query.status in self.INDEXED_STATUSES
+        hash_key = f"{query.pk}#{query.status}" if sparse else query.pk
+        with self._lock:
+            matches = sorted(
+                (
+                    item for item in self.items.values()
+                    if "created_at" in item
+                    and (item.get("user_status") == hash_key if sparse else item["pk"] == hash_key)
+                    and (not query.created_from or item["created_at"] >= query.created_from)
+                    and (not query.created_to or item["created_at"] <= query.created_to)
+                ),
+                key=lambda item: (item["created_at"], item["sk"]),
+                reverse=True,
+            )
+        if query.start_key:
+            position = (query.start_key["created_at"], query.start_key["sk"])
+            matches = [item for item in matches if (item["created_at"], item["sk"]) < position]
+
+        # Like DynamoDB, Limit counts evaluated items and the status filter applies afterwards.
+        evaluated = matches[:query.limit]
+        last_key = None
+        if len(matches) > query.limit:
+            last = evaluated[-1]
+            last_key = {"pk": last["pk"], "sk": last["sk"], "created_at": last["created_at"]}
+            if sparse:
+                last_key["user_status"] = hash_key
+
+        page = []
+        for item in evaluated:
+            if query.status and item.get("status") != query.status:
+                continue
+            if query.attributes:
+                item = {name: item[name] for name in query.attributes if name in item}
+            page.append(copy.deepcopy(item))
+        return page, last_key
+
+    def batch_get(
+        self, keys: List[Dict[str, str]], attributes: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        items = []
+        for key in keys:
+            item = self.get(key["pk"], key["sk"])
+            if item is not None:
+                items.append({name: item[name] for name in attributes if name in item})
+        return items, []
+
+    def put_many_if_absent(self, items: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        return [item["sk"] for item in items if not self.put_if_absent(item)], []
+
+    def add_counters(self, pk: str, sk: str, counters: Dict[str, int]) -> None:
+        with self._lock:
+            item = self.items.setdefault((pk, sk), {"pk": pk, "sk": sk})
+            for name, value in counters.items():
+                item[name] = item.get(name, Decimal(0)) + Decimal(value)
+
+    @staticmethod
+    def _to_dynamo(value: Any) -> Any:
+        if isinstance(value, bool) or value is None or isinstance(value, (str, Decimal)):
+            return value
+        if isinstance(value, int):
+            return Decimal(value)
+        if isinstance(value, float):
+            raise TypeError("Float types are not supported. Use Decimal types instead.")
+        if isinstance(value, dict):
+            return {k: InMemoryTaskTable._to_dynamo(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [InMemoryTaskTable._to_dynamo(v) for v in value]
+        return copy.deepcopy(value)
+
+
+class InMemoryObjectStore(ObjectStore):
+    def __init__(self, bucket: str = "memory"):
+        self.bucket = bucket
+        self.objects: Dict[str, bytes] = {}
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+
+    def presign(self, operation: str, key: str, expires_in: int, **params: Any) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        return f"memory://{self.bucket}/{key}?op={operation}&expires={expires_in}" + (f"&{query}" if query else "")
+
+    def put(self, key: str, body: bytes, **params: Any) -> None:
+        self.objects[key] = bytes(body)
+        self.metadata[key] = params
+
+    def create_multipart(self, key: str, **params: Any) -> str:
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {"key": key, "params": params, "parts": {}}
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        data = bytes(body)
+        self.uploads[upload_id]["parts"][part_number] = data
+        return '"' + hashlib.md5(data).hexdigest() + '"'
+
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        parts = self._upload(key, upload_id)["parts"]
+        return [
+            {"PartNumber": number, "ETag": '"' + hashlib.md5(data).hexdigest() + '"', "Size": len(data)}
+            for number, data in sorted(parts.items())
+        ]
+
+    def complete_multipart(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        upload = self._upload(key, upload_id)
+        uploaded = {part["PartNumber"]: part["ETag"] for part in self.list_parts(key, upload_id)}
+        if any(uploaded.get(part["PartNumber"]) != part["ETag"] for part in parts):
+            raise ValidationError("Cannot complete upload: InvalidPart")
+        del self.uploads[upload_id]
+        self.put(key, b"".join(upload["parts"][part["PartNumber"]] for part in parts), **upload["params"])
+
+    def abort_multipart(self, key: str, upload_id: str) -> None:
+        self._upload(key, upload_id)
+        del self.uploads[upload_id]
+
+    def _upload(self, key: str, upload_id: str) -> Dict[str, Any]:
+        upload = self.uploads.get(upload_id)
+        if upload is None or upload["key"] != key:
+            raise NotFoundError("Upload not found, already completed or aborted")
+        return upload
+
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, bucket: TokenBucket, maximum: int, now: float) -> int:
+        with self._lock:
+            tokens, updated_at = self.buckets.get(key, (None, None))
+            available = bucket.available(tokens, updated_at, now)
+            granted = max(0, min(maximum, int(available)))
+            if granted:
+                self.buckets[key] = (available - granted, now)
+            return granted
+
+
+class ExportWriter:
+    """Writes a stream of bytes to one object, holding at most one part in memory.
+    Exports that fit in a single part are stored with a plain put."""
+
+    def __init__(self, objects: ObjectStore, key: str, part_size: int, **params: Any):
+        self.objects = objects
+        self.key = key
+        self.part_size = max(part_size, 5 * 1024 * 1024)  # S3 minimum for all but the last part
+        self.params = params
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict[str, Any]] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        self.size += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._flush_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def close(self) -> None:
+        if self.upload_id is None:
+            self.objects.put(self.key, bytes(self.buffer), **self.params)
+        else:
+            if self.buffer or not self.parts:
+                self._flush_part(bytes(self.buffer))
+            self.objects.complete_multipart(self.key, self.upload_id, self.parts)
+        self.buffer = bytearray()
+
+    def abort(self) -> None:
+        if self.upload_id is not None:
+            self.objects.abort_multipart(self.key, self.upload_id)
+            self.upload_id = None
+
+    def _flush_part(self, body: bytes) -> None:
+        if self.upload_id is None:
+            self.upload_id = self.objects.create_multipart(self.key, **self.params)
+        part_number = len(self.parts) + 1
+        etag = self.objects.upload_part(self.key, self.upload_id, part_number, body)
+        self.parts.append({"PartNumber": part_number, "ETag": etag})
+
+
+class Backends:
+    def __init__(self, tasks: TaskTable, objects: ObjectStore, quotas: TokenBucketStore):
+        self.tasks = tasks
+        self.objects = objects
+        self.quotas = quotas
+
+
+def create_backends() -> Backends:
+    if Config.STORAGE_BACKEND == "memory":
+        return Backends(
+            InMemoryTaskTable(), InMemoryObjectStore(Config.BUCKET_NAME or "memory"), InMemoryTokenBucketStore()
+        )
+    return Backends(DynamoTaskTable(aws_clients), S3ObjectStore(aws_clients), DynamoTokenBucketStore(aws_clients))
+
+
+aws_clients = AWSClients()
+backends = create_backends()
+
+class Route:
+    def __init__(self, method: str, template: str, target: Callable[[Dict[str, Any], Dict[str, str]], Dict[str, Any]]):
+        self.method = method
+        self.template = template
+        self.target = target
+        self.name = f"{method} {template}"
+        self.segments = [segment for segment in template.split("/") if segment]
+        self.param_names = [segment[1:-1] for segment in self.segments if Router.is_param(segment)]
+
+
+class RouteMatch:
+    def __init__(
+        self, name: str, route: Optional[Route] = None, params: Optional[Dict[str, str]] = None,
+        allowed: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.route = route
+        self.params = params or {}
+        self.allowed = allowed
+
+
+class Router:
+    """Route table compiled once at import.
+
+    API Gateway's routeKey resolves with one dict lookup. Otherwise static paths
+    are a dict lookup and templated ones (``/tasks/{id}``) walk a segment trie;
+    the stage prefix is stripped and path values keep their case. As in API
+    Gateway, the most specific route with the request's method wins. A path that
+    exists only under other methods is a 405 with an Allow header, anything else 404.
+    """
+
+    PARAM = "{}"
+    METHODS = ""
+
+    def __init__(self, routes: List[Route]):
+        self.by_key: Dict[str, Route] = {}
+        self.static: Dict[str, Dict[str, Route]] = {}
+        self.trie: Dict[str, Any] = {}
+        self.timing_hooks: List[Callable[[Route, float], None]] = []
+        for route in routes:
+            if route.name in self.by_key:
+                raise ValueError(f"Duplicate route {route.name}")
+            self.by_key[route.name] = route
+            if not route.param_names:
+                self.static.setdefault("/" + "/".join(route.segments), {})[route.method] = route
+                continue
+            node = self.trie
+            for segment in route.segments:
+                node = node.setdefault(self.PARAM if self.is_param(segment) else segment, {})
+            node.setdefault(self.METHODS, {})[route.method] = route
+
+    @staticmethod
+    def is_param(segment: str) -> bool:
+        return segment.startswith("{") and segment.endswith("}")
+
+    def add_timing_hook(self, hook: Callable[[Route, float], None]) -> None:
+        self.timing_hooks.append(hook)
+
+    def match(self, event: Dict[str, Any]) -> RouteMatch:
+        route = self.by_key.get(event.get("routeKey", ""))
+        if route:
+            return RouteMatch(route.name, route, event.get("pathParameters") or {})
+
+        context = event.get("requestContext", {})
+        method = context.get("http", {}).get("method", "").upper()
+        path = self._strip_stage(event.get("rawPath", ""), context.get("stage"))
+
+        allowed: Set[str] = set()
+        candidates = [(self.static.get(path, {}), [])]
+        candidates.extend(self._walk(self.trie, [segment for segment in path.split("/") if segment], []))
+        for methods, values in candidates:
+            route = methods.get(method)
+            if route:
+                return RouteMatch(route.name, route, dict(zip(route.param_names, values)))
+            allowed.update(methods)
+        if allowed:
+            return RouteMatch("method_not_allowed", allowed=tuple(sorted(allowed)))
+        return RouteMatch("unmatched")
+
+    def invoke(self, event: Dict[str, Any], match: RouteMatch) -> Dict[str, Any]:
+        if match.route is None:
+            if match.allowed:
+                return ResponseBuilder.method_not_allowed(match.allowed)
+            return ResponseBuilder.not_found()
+
+        started = time.perf_counter()
+        try:
+            return match.route.target(event, match.params)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            for hook in self.timing_hooks:
+                hook(match.route, elapsed_ms)
+
+    @staticmethod
+    def _strip_stage(raw_path: str, stage: Optional[str]) -> str:
+        path = "/" + raw_path.strip("/")
+        if stage and stage != "$default" and (path == f"/{stage}" or path.startswith(f"/{stage}/")):
+            path = path[len(stage) + 1:] or "/"
+        return path
+
+    def _walk(
+        self, node: Dict[str, Any], segments: List[str], values: List[str]
+    ) -> Iterator[Tuple[Dict[str, Route], List[str]]]:
+        # Yields matching leaves, static segments before parameters.
+        if not segments:
+            if self.METHODS in node:
+                yield node[self.METHODS], values
+            return
+        head, rest = segments[0], segments[1:]
+        if head in node:
+            yield from self._walk(node[head], rest, values)
+        if self.PARAM in node:
+            yield from self._walk(node[self.PARAM], rest, values + [unquote(head)])
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    match = router.match(event)
+    metrics.start({"Service": "api", "Route": match.name})
     try:
-        return RequestHandler(event).route()
+        with metrics.span("request"):
+            response = profiler.run(match.name, lambda: dispatch(event, match))
+        metrics.count(f"responses_{response['statusCode'] // 100}xx")
+        metrics.add_bytes("response_bytes", len(response.get("body") or ""))
+        return response
+    finally:
+        metrics.flush()
+
+
+def dispatch(event: Dict[str, Any], match: RouteMatch) -> Dict[str, Any]:
+    try:
+        response = router.invoke(event, match)
     except UnauthorizedError as e:
-        return ResponseBuilder.unauthorized(str(e))
+        response = ResponseBuilder.unauthorized(str(e))
     except ValidationError as e:
-        return ResponseBuilder.bad_request(str(e))
+        response = ResponseBuilder.bad_request(str(e))
     except NotFoundError as e:
-        return ResponseBuilder.not_found(str(e))
+        response = ResponseBuilder.not_found(str(e))
+    except ServiceUnavailableError as e:
+        response = ResponseBuilder.service_unavailable(str(e))
+    except TooManyRequestsError as e:
+        response = ResponseBuilder.too_many_requests(str(e), e.retry_after)
     except Exception as e:
-        return ResponseBuilder.internal_error(str(e))
+        Logger.error(f"Unhandled error: {e}")
+        response = ResponseBuilder.internal_error(str(e))
+    return ResponseBuilder.compress(response, event)
+
+
+class Logger:
+    @staticmethod
+    def info(message: str) -> None:
+        print(f"[api] {message}", flush=True)
+
+    @staticmethod
+    def error(message: str) -> None:
+        print(f"[api] ERROR: {message}", flush=True)
+
+
+class MetricsSink:
+    def emit(self, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class EmfMetricsSink(MetricsSink):
+    """One CloudWatch Embedded Metric Format line per record; CloudWatch Logs extracts the metrics."""
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        print(json.dumps(record, separators=(",", ":")), flush=True)
+
+
+class MemoryMetricsSink(MetricsSink):
+    def __init__(self, max_records: int = 10000):
+        self.records: deque = deque(maxlen=max_records)
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+
+
+class NullMetricsSink(MetricsSink):
+    def emit(self, record: Dict[str, Any]) -> None:
+        pass
+
+
+def create_metrics_sink() -> MetricsSink:
+    if Config.METRICS_SINK == "memory":
+        return MemoryMetricsSink()
+    if Config.METRICS_SINK == "off":
+        return NullMetricsSink()
+    return EmfMetricsSink()
+
+
+class Metrics:
+    """Spans, counters and byte totals for the current request, flushed as a single EMF record.
+
+    Repeated spans with the same name add up, so ``<name>_ms`` is the total time
+    the request spent in that stage.
+    """
+
+    def __init__(self, sink: MetricsSink):
+        self.sink = sink
+        self.dimensions: Dict[str, str] = {}
+        self.values: Dict[str, float] = {}
+        self.units: Dict[str, str] = {}
+
+    def start(self, dimensions: Dict[str, str]) -> None:
+        self.dimensions = dimensions
+        self.values, self.units = {}, {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put(f"{name}_ms", (time.perf_counter() - started) * 1000, "Milliseconds")
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.put(name, value, "Count")
+
+    def add_bytes(self, name: str, value: int) -> None:
+        self.put(name, value, "Bytes")
+
+    def put(self, name: str, value: float, unit: str) -> None:
+        self.values[name] = self.values.get(name, 0) + value
+        self.units[name] = unit
+
+    def flush(self) -> None:
+        if not self.values:
+            return
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": Config.METRICS_NAMESPACE,
+                    "Dimensions": [list(self.dimensions)],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in self.units.items()],
+                }],
+            },
+            **self.dimensions,
+            **{name: round(value, 3) for name, value in self.values.items()},
+        }
+        self.values, self.units = {}, {}
+        self.sink.emit(record)
+
+
+class Profiler:
+    """Optional cProfile hook. With PROFILE_SAMPLE_RATE > 0 about that share of containers
+    profile every request and log the top PROFILE_TOP_N functions by cumulative time."""
+
+    def __init__(self, sample_rate: float, top_n: int):
+        self.enabled = sample_rate > 0 and random.random() < sample_rate
+        self.top_n = top_n
+
+    def run(self, label: str, fn: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return fn()
+
+        import cProfile
+        import io
+        import pstats
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn)
+        finally:
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top_n)
+            Logger.info(f"Profile for {label}:\n{out.getvalue()}")
+
+
+metrics = Metrics(create_metrics_sink())
+profiler = Profiler(Config.PROFILE_SAMPLE_RATE, Config.PROFILE_TOP_N)
+
+class TaskCache:
+    """Per-container LRU of tasks in a terminal state, which never change again.
+
+    Only DONE/FAILED items are stored, so a cached read can't hide a transition.
+    The TTL bounds staleness if an item is ever rewritten out of band.
+    """
+
+    TERMINAL_STATUSES = {"DONE", "FAILED"}
+
+    def __init__(self, max_items: int, ttl_seconds: float):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pk: str, sk: str) -> Optional[Dict[str, Any]]:
+        key = (pk, sk)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                metrics.count("task_cache_hits")
+                item = entry[1]
+            else:
+                if entry:
+                    del self._items[key]
+                self.misses += 1
+                metrics.count("task_cache_misses")
+                item = None
+            lookups = self.hits + self.misses
+        if Config.TASK_CACHE_LOG_EVERY and lookups % Config.TASK_CACHE_LOG_EVERY == 0:
+            Logger.info(f"Task cache: hits={self.hits} misses={self.misses} size={len(self._items)}")
+        return copy.deepcopy(item) if item is not None else None
+
+    def put(self, item: Dict[str, Any]) -> None:
+        if self.max_items <= 0 or item.get("status") not in self.TERMINAL_STATUSES:
+            return
+        with self._lock:
+            self._items[(item["pk"], item["sk"])] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(item))
+            self._items.move_to_end((item["pk"], item["sk"]))
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+task_cache = TaskCache(Config.TASK_CACHE_MAX_ITEMS, Config.TASK_CACHE_TTL_SECONDS)
+
+
+class AdmissionController:
+    """Per-tenant token-bucket quota on task creation.
+
+    A tenant's bucket is split into ``shards`` items (``quota#<pk>#<n>``), each
+    with an equal share of the rate and burst, so a hot tenant's quota writes
+    land on several partitions instead of one. Containers take tokens from the
+    shards in leases and spend them locally, and remember an exhausted bucket
+    until it can have refilled: most admissions, and the rejections of a
+    throttled tenant, cost no DynamoDB call.
+    """
+
+    def __init__(self, rate: float, burst: int, shards: int, lease_tokens: int, max_tenants: int):
+        # A bucket that never refills (or holds nothing) can't be a quota; treat it as switched off.
+        self.enabled = rate > 0 and burst > 0
+        if Config.ADMISSION_ENABLED and not self.enabled:
+            Logger.error(f"Admission control disabled: rate {rate}/s and burst {burst} must both be positive")
+        self.rate = rate
+        self.shards = shards
+        self.lease_tokens = lease_tokens
+        self.max_tenants = max_tenants
+        self.shard_bucket = TokenBucket(rate / shards, burst / shards)
+        self._tokens: "OrderedDict[str, int]" = OrderedDict()
+        self._exhausted_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> TokenBucketStore:
+        return backends.quotas
+
+    def admit(self, user_pk: str, count: int, partial: bool = False) -> int:
+        """Admits ``count`` tasks, or with ``partial`` as many as the quota allows.
+
+        Raises TooManyRequestsError when nothing can be admitted.
+        """
+        if not Config.ADMISSION_ENABLED or not self.enabled or count <= 0:
+            return count
+
+        if self._local_tokens(user_pk) < count:
+            now = time.time()
+            with self._lock:
+                exhausted = self._exhausted_until.get(user_pk, 0) > now
+            if not exhausted:
+                self._refill(user_pk, count - self._local_tokens(user_pk) + self.lease_tokens, now)
+
+        with self._lock:
+            available = self._tokens.get(user_pk, 0)
+            granted = count if available >= count else (available if partial else 0)
+            if granted:
+                self._tokens[user_pk] = available - granted
+                self._tokens.move_to_end(user_pk)
+        if not granted:
+            metrics.count("admission_throttled")
+            raise TooManyRequestsError("Task creation rate limit exceeded", self.retry_after(count - available))
+        return granted
+
+    def refund(self, user_pk: str, count: int) -> None:
+        """Returns admitted tokens that didn't create a task (it already existed, or the write failed)."""
+        if not Config.ADMISSION_ENABLED or not self.enabled or count <= 0:
+            return
+        with self._lock:
+            self._tokens[user_pk] = self._tokens.get(user_pk, 0) + count
+            self._tokens.move_to_end(user_pk)
+            self._exhausted_until.pop(user_pk, None)
+
+    def retry_after(self, count: int) -> int:
+        return max(1, math.ceil(count / self.rate)) if self.rate > 0 else 60
+
+    def _local_tokens(self, user_pk: str) -> int:
+        with self._lock:
+            return self._tokens.get(user_pk, 0)
+
+    def _refill(self, user_pk: str, wanted: int, now: float) -> None:
+        taken = 0
+        for shard in random.sample(range(self.shards), self.shards):
+            try:
+                taken += self.store.take(f"quota#{user_pk}#{shard}", self.shard_bucket, wanted - taken, now)
+            except Exception as e:
+                # Fail open: an unavailable quota store must not take task creation down with it.
+                Logger.error(f"Quota lookup failed for {user_pk}: {e}")
+                taken = wanted
+            if taken >= wanted:
+                break
+
+        with self._lock:
+            self._tokens[user_pk] = self._tokens.get(user_pk, 0) + taken
+            self._tokens.move_to_end(user_pk)
+            if taken:
+                self._exhausted_until.pop(user_pk, None)
+            else:
+                self._exhausted_until[user_pk] = now + max(1 / self.rate, Config.ADMISSION_RECHECK_SECONDS)
+            while len(self._tokens) > self.max_tenants:
+                self._tokens.popitem(last=False)
+            if len(self._exhausted_until) > self.max_tenants:
+                self._exhausted_until = {k: v for k, v in self._exhausted_until.items() if v > now}
+
+
+admission = AdmissionController(
+    Config.ADMISSION_RATE_PER_SECOND,
+    Config.ADMISSION_BURST,
+    Config.ADMISSION_SHARDS,
+    Config.ADMISSION_LEASE_TOKENS,
+    Config.ADMISSION_CACHE_MAX_TENANTS,
+)
+
 
 class TaskService:
+    STATUS_ATTRIBUTES = ["sk", "task_id", "status", "file_key", "created_at", "processed_at", "result_key", "error"]
+    LIST_STATUSES = ("PENDING", "PROCESSING", "DONE", "FAILED")
+    LIST_FIELDS = STATUS_ATTRIBUTES + ["started_at", "stats"]
+    # Maintained in usage#<pk> items by create_task and the worker; see UsageCounters there.
+    USAGE_COUNTERS = ["tasks_created", "tasks_done", "tasks_failed", "bytes_processed", "lines_processed"]
+
     def __init__(self):
-        self.table = aws_clients.table
-        self.sqs = aws_clients.sqs
+        self.tasks = backends.tasks
+        self.objects = backends.objects
 
     def create_task(self, event: Dict[str, Any]) -> Dict[str, Any]:
         claims = RequestUtils.extract_claims(event)
@@ -117,13 +1132,19 @@ class TaskService:
         body = RequestUtils.parse_json_body(event)
         
         task_data = self._build_task_data(body, user_pk)
-        
         try:
-            self._create_task_item(task_data)
-        except aws_clients.dynamo.meta.client.exceptions.ConditionalCheckFailedException:
-            return self._handle_existing_task(user_pk, task_data["task_id"])
+            admission.admit(user_pk, 1)
+        except TooManyRequestsError:
+            # A retry of a task that was already created is answered, not throttled. Only
+            # client-chosen ids can exist already; random ones skip the lookup.
+            if (body.get("client_token") or body.get("task_id")) and self.tasks.get(user_pk, task_data["task_id"]):
+                return self._handle_existing_task(user_pk, task_data["task_id"])
+            raise
         
-        self._enqueue_task(task_data)
+        if not self.tasks.put_if_absent(task_data):
+            admission.refund(user_pk, 1)
+            return self._handle_existing_task(user_pk, task_data["task_id"])
+        self._add_usage(user_pk, task_data["created_at"], {"tasks_created": 1})
         
         return ResponseBuilder.created({
             "task": {
@@ -136,79 +1157,252 @@ class TaskService:
 
     def _build_task_data(self, body: Dict[str, Any], user_pk: str) -> Dict[str, Any]:
         now = datetime.now(timezone.utc)
+        client_token = (body.get("client_token") or str(uuid.uuid4()))[:64]
+        # A retried request with the same client_token maps onto the same task.
+        task_id = body.get("task_id") or str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_pk}#{client_token}"))
         return {
             "pk": user_pk,
-            "sk": body.get("task_id") or str(uuid.uuid4()),
-            "task_id": body.get("task_id") or str(uuid.uuid4()),
+            "sk": task_id,
+            "task_id": task_id,
             "created_at": now.isoformat(),
             "status": "PENDING",
             "file_key": body.get("file_key", ""),
-            "client_token": (body.get("client_token") or str(uuid.uuid4()))[:64],
+            "user_status": f"{user_pk}#PENDING",
+            "client_token": client_token,
             "ttl": int((now + timedelta(days=7)).timestamp()),
         }
 
-    def _create_task_item(self, task_data: Dict[str, Any]) -> None:
-        self.table.put_item(
-            Item=task_data,
-            ConditionExpression="attribute_not_exists(pk) AND attribute_not_exists(sk)"
-        )
-
     def _handle_existing_task(self, user_pk: str, task_id: str) -> Dict[str, Any]:
-        existing = self.table.get_item(Key={"pk": user_pk, "sk": task_id}).get("Item")
+        existing = self.tasks.get(user_pk, task_id)
         if existing:
             return ResponseBuilder.ok({"task": existing, "idem": True})
         return ResponseBuilder.conflict("Task conflict")
 
-    def _enqueue_task(self, task_data: Dict[str, Any]) -> None:
-        if not Config.SQS_QUEUE_URL:
-            return
-        
+    def create_tasks_batch(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        claims = RequestUtils.extract_claims(event)
+        sub = RequestUtils.require_user_sub(claims)
+
+        user_pk = f"tenant_default#{sub}"
+        specs = RequestUtils.parse_json_body(event).get("tasks")
+        if not isinstance(specs, list) or not specs:
+            raise ValidationError("tasks must be a non-empty list")
+        if len(specs) > Config.BATCH_MAX_TASKS:
+            raise ValidationError(f"At most {Config.BATCH_MAX_TASKS} tasks per batch")
+
+        results: List[Dict[str, Any]] = []
+        candidates: Dict[str, Dict[str, Any]] = {}
+        for spec in specs:
+            if not isinstance(spec, dict) or not spec.get("file_key"):
+                results.append({"status": "failed", "error": "file_key required"})
+                continue
+            task_data = self._build_task_data(spec, user_pk)
+            result = {"task_id": task_data["task_id"], "file_key": task_data["file_key"]}
+            if task_data["task_id"] in candidates:
+                result["status"] = "duplicate"
+            else:
+                candidates[task_data["task_id"]] = task_data
+            results.append(result)
+
+        existing = self._batch_get_existing(user_pk, list(candidates))
+        new_items = [t for task_id, t in candidates.items() if task_id not in existing]
         try:
-            self.sqs.send_message(
-                QueueUrl=Config.SQS_QUEUE_URL,
-                MessageBody=json.dumps({
-                    "task_id": task_data["task_id"],
-                    "user_pk": task_data["pk"],
-                    "file_key": task_data["file_key"]
-                })
-            )
-        except Exception as e:
-            print(f"Failed to enqueue task {task_data['task_id']}: {e}")
+            admitted = admission.admit(user_pk, len(new_items), partial=True)
+        except TooManyRequestsError:
+            # Items that already exist are still answered, as create_task answers a retry.
+            if not existing:
+                raise
+            admitted = 0
+        throttled = {t["task_id"] for t in new_items[admitted:]}
+        raced, unwritten = self._batch_write(new_items[:admitted])
+        admission.refund(user_pk, len(raced) + len(unwritten))
+        if raced:
+            # Created by a concurrent request since the read above; the conditional write kept them.
+            existing.update(dict.fromkeys(raced))
+            existing.update(self._batch_get_existing(user_pk, raced))
+        created_by_day: Dict[str, int] = {}
+        for item in new_items[:admitted]:
+            if item["task_id"] not in unwritten and item["task_id"] not in existing:
+                day = item["created_at"][:10]
+                created_by_day[day] = created_by_day.get(day, 0) + 1
+        for day, created in created_by_day.items():
+            self._add_usage(user_pk, day, {"tasks_created": created})
+
+        for result in results:
+            task_id = result.get("task_id")
+            if "status" in result:
+                continue
+            if task_id in existing:
+                result["status"] = "existing"
+                result["task_status"] = existing[task_id]
+            elif task_id in throttled:
+                result["status"] = "throttled"
+            elif task_id in unwritten:
+                result["status"] = "failed"
+                result["error"] = "write failed"
+            else:
+                result["status"] = "created"
+
+        response = {
+            "items": results,
+            "created": sum(1 for r in results if r["status"] == "created"),
+            "existing": sum(1 for r in results if r["status"] == "existing"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "throttled": len(throttled),
+        }
+        if throttled:
+            response["retry_after"] = admission.retry_after(len(throttled))
+        return ResponseBuilder.ok(response)
+
+    def _batch_get_existing(self, user_pk: str, task_ids: List[str]) -> Dict[str, str]:
+        items = self._batch_get(user_pk, task_ids, ["sk", "status"])
+        return {task_id: item.get("status") for task_id, item in items.items()}
+
+    def _batch_get(self, user_pk: str, task_ids: List[str], attributes: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(task_ids), 100):
+            keys = [{"pk": user_pk, "sk": task_id} for task_id in task_ids[start:start + 100]]
+            for attempt in range(Config.BATCH_MAX_ATTEMPTS):
+                items, keys = self.tasks.batch_get(keys, attributes)
+                for item in items:
+                    found[item["sk"]] = item
+                if not keys:
+                    break
+                self._backoff(attempt)
+            if keys:
+                raise ServiceUnavailableError("Could not read tasks, retry later")
+        return found
+
+    def _batch_write(self, items: List[Dict[str, Any]]) -> Tuple[List[str], Set[str]]:
+        """Writes items that don't exist yet; returns (task ids that already existed, task ids not written)."""
+        existing: List[str] = []
+        pending = items
+        for attempt in range(Config.BATCH_MAX_ATTEMPTS):
+            try:
+                raced, pending = self.tasks.put_many_if_absent(pending)
+                existing.extend(raced)
+            except Exception as e:
+                Logger.error(f"Batch write failed (attempt {attempt + 1}): {e}")
+            if not pending:
+                break
+            self._backoff(attempt)
+        return existing, {item["task_id"] for item in pending}
+
+    @staticmethod
+    def _backoff(attempt: int) -> None:
+        time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+
+    def _add_usage(self, user_pk: str, timestamp: str, counters: Dict[str, int]) -> None:
+        # Counted only after the task write succeeded; drift is repaired by tools/rebuild_usage.py.
+        for sk in ("total", f"day#{timestamp[:10]}"):
+            try:
+                self.tasks.add_counters(f"usage#{user_pk}", sk, counters)
+            except Exception as e:
+                Logger.error(f"Failed to update usage for {user_pk}: {e}")
+
+    def get_usage(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        claims = RequestUtils.extract_claims(event)
+        sub = RequestUtils.require_user_sub(claims)
+
+        usage_pk = f"usage#tenant_default#{sub}"
+        days = self._parse_days(RequestUtils.parse_query_string(event).get("days"))
+        usage = self._usage_counters(self.tasks.get(usage_pk, "total"))
+        usage["tasks_in_progress"] = max(0, usage["tasks_created"] - usage["tasks_done"] - usage["tasks_failed"])
+        body: Dict[str, Any] = {"usage": usage}
+
+        if days:
+            today = datetime.now(timezone.utc).date()
+            dates = [(today - timedelta(days=i)).isoformat() for i in range(days)]
+            items = self._batch_get(usage_pk, [f"day#{date}" for date in dates], ["sk"] + self.USAGE_COUNTERS)
+            body["days"] = [{"date": date, **self._usage_counters(items.get(f"day#{date}"))} for date in dates]
+        return ResponseBuilder.ok(body)
+
+    def _parse_days(self, days: Optional[str]) -> int:
+        if not days:
+            return 0
+        try:
+            value = int(days)
+        except ValueError:
+            raise ValidationError("days must be an integer")
+        if not 0 <= value <= Config.USAGE_MAX_DAYS:
+            raise ValidationError(f"days must be between 0 and {Config.USAGE_MAX_DAYS}")
+        return value
+
+    @classmethod
+    def _usage_counters(cls, item: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        item = item or {}
+        return {name: int(item.get(name, 0)) for name in cls.USAGE_COUNTERS}
 
     def list_tasks(self, event: Dict[str, Any]) -> Dict[str, Any]:
         claims = RequestUtils.extract_claims(event)
         sub = RequestUtils.require_user_sub(claims)
         
         params = RequestUtils.parse_query_string(event)
-        limit = self._parse_limit(params.get("limit", "10"))
-        cursor = self._parse_cursor(params.get("cursor"))
+        attributes = self._parse_fields(params.get("fields"))
+        max_limit = Config.LIST_MAX_PROJECTED_LIMIT if attributes else Config.LIST_MAX_LIMIT
         
         user_pk = f"tenant_default#{sub}"
+        query = TaskQuery(
+            user_pk,
+            self._parse_limit(params.get("limit", "10"), max_limit),
+            start_key=self._parse_cursor(params.get("cursor")),
+            status=self._parse_status(params.get("status")),
+            created_from=self._parse_created(params.get("created_after"), "created_after"),
+            created_to=self._parse_created(params.get("created_before"), "created_before"),
+            attributes=attributes,
+        )
         
-        query_args = {
-            "IndexName": "by_user_created",
-            "KeyConditionExpression": Key("pk").eq(user_pk),
-            "ScanIndexForward": False,
-            "Limit": limit,
-        }
-        
-        if cursor:
-            query_args["ExclusiveStartKey"] = cursor
-        
-        resp = self.table.query(**query_args)
+        items, last_key = self.tasks.query_user_tasks(query)
         
         return ResponseBuilder.ok({
-            "items": resp.get("Items", []),
-            "next_cursor": self._encode_cursor(resp.get("LastEvaluatedKey"))
+            "items": items,
+            "next_cursor": self._encode_cursor(last_key)
         })
 
-    def _parse_limit(self, limit_str: str) -> int:
+    def _parse_limit(self, limit_str: str, max_limit: int) -> int:
         try:
             limit = int(limit_str)
-            return max(1, min(limit, 50))
+            return max(1, min(limit, max_limit))
         except ValueError:
             return 10
 
+    def _parse_status(self, status: Optional[str]) -> Optional[str]:
+        if not status:
+            return None
+        if not isinstance(status, str):
+            raise ValidationError("status must be a string")
+        status = status.upper()
+        if status not in self.LIST_STATUSES:
+            raise ValidationError(f"status must be one of {', '.join(self.LIST_STATUSES)}")
+        return status
+
+    def _parse_created(self, value: Optional[str], name: str) -> Optional[str]:
+        if not value:
+            return None
+        if not isinstance(value, str):
+            raise ValidationError(f"{name} must be an ISO 8601 timestamp")
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValidationError(f"{name} must be an ISO 8601 timestamp")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc).isoformat()
+
+    def _parse_fields(self, fields: Union[str, List[str], None]) -> Optional[List[str]]:
+        """Accepts a comma-separated string (query string) or a list of names (JSON body)."""
+        if not fields:
+            return None
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        elif not isinstance(fields, list) or not all(isinstance(name, str) for name in fields):
+            raise ValidationError("fields must be a comma-separated string or a list of strings")
+        requested = [name.strip() for name in fields if name.strip()]
+        unknown = [name for name in requested if name not in self.LIST_FIELDS]
+        if unknown:
+            raise ValidationError(f"Unknown fields: {', '.join(unknown)}")
+        # Keys needed to identify the item and continue pagination are always returned.
+        return list(dict.fromkeys(["sk", "task_id", "created_at", *requested]))
+
     def _parse_cursor(self, cursor_raw: Optional[str]) -> Optional[Dict[str, Any]]:
         if not cursor_raw:
             return None
@@ -222,21 +1416,157 @@ class TaskService:
             return None
         return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode()
 
+    def export_tasks(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Streams the user's task history as NDJSON (gzip by default) into results/{sub}/exports/.
+        Stops at EXPORT_MAX_SECONDS and returns next_cursor so the client can continue."""
+        claims = RequestUtils.extract_claims(event)
+        sub = RequestUtils.require_user_sub(claims)
+        body = RequestUtils.parse_json_body(event)
+
+        compression = body.get("compression", "gzip")
+        if compression not in ("gzip", "none"):
+            raise ValidationError("compression must be gzip or none")
+
+        query = TaskQuery(
+            f"tenant_default#{sub}",
+            Config.EXPORT_PAGE_SIZE,
+            start_key=self._parse_cursor(body.get("cursor")),
+            status=self._parse_status(body.get("status")),
+            created_from=self._parse_created(body.get("created_after"), "created_after"),
+            created_to=self._parse_created(body.get("created_before"), "created_before"),
+            attributes=self._parse_fields(body.get("fields")),
+        )
+
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        key = f"results/{sub}/exports/{stamp}-{uuid.uuid4()}.ndjson"
+        if compression == "gzip":
+            key += ".gz"
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            writer = ExportWriter(self.objects, key, Config.EXPORT_PART_SIZE, ContentType="application/gzip")
+        else:
+            compressor = None
+            writer = ExportWriter(self.objects, key, Config.EXPORT_PART_SIZE, ContentType="application/x-ndjson")
+
+        deadline = time.monotonic() + Config.EXPORT_MAX_SECONDS
+        count = 0
+        try:
+            while True:
+                items, last_key = self.tasks.query_user_tasks(query)
+                if items:
+                    chunk = "".join(
+                        ResponseBuilder.dumps(item) + "\n"
+                        for item in items
+                    ).encode("utf-8")
+                    writer.write(compressor.compress(chunk) if compressor else chunk)
+                    count += len(items)
+                query.start_key = last_key
+                if not last_key or time.monotonic() >= deadline:
+                    break
+            if compressor:
+                writer.write(compressor.flush())
+            writer.close()
+        except Exception:
+            writer.abort()
+            raise
+
+        return ResponseBuilder.created({
+            "export_key": key,
+            "download_url": self.objects.presign("get_object", key, 900),
+            "count": count,
+            "size": writer.size,
+            "complete": last_key is None,
+            "next_cursor": self._encode_cursor(last_key),
+        })
+
     def get_task(self, event: Dict[str, Any], task_id: str) -> Dict[str, Any]:
         claims = RequestUtils.extract_claims(event)
         sub = RequestUtils.require_user_sub(claims)
         
         user_pk = f"tenant_default#{sub}"
-        item = self.table.get_item(Key={"pk": user_pk, "sk": task_id}).get("Item")
+        wait = self._parse_wait(RequestUtils.parse_query_string(event).get("wait"))
+        item = self._wait_until(
+            lambda: self._get_item(user_pk, task_id),
+            lambda item: not item or item.get("status") in TaskCache.TERMINAL_STATUSES,
+            wait,
+        )
         
         if not item:
             raise NotFoundError("Task not found")
         
-        return ResponseBuilder.ok({"task": item})
+        return ResponseBuilder.ok_conditional({"task": item}, event)
+
+    def _get_item(self, user_pk: str, task_id: str) -> Optional[Dict[str, Any]]:
+        item = task_cache.get(user_pk, task_id)
+        if item is None:
+            item = self.tasks.get(user_pk, task_id)
+            if item:
+                task_cache.put(item)
+        return item
+
+    def get_tasks_status(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        claims = RequestUtils.extract_claims(event)
+        sub = RequestUtils.require_user_sub(claims)
+
+        user_pk = f"tenant_default#{sub}"
+        body = RequestUtils.parse_json_body(event)
+        task_ids = body.get("task_ids")
+        if not isinstance(task_ids, list) or not task_ids or not all(isinstance(t, str) and t for t in task_ids):
+            raise ValidationError("task_ids must be a non-empty list of task ids")
+        task_ids = list(dict.fromkeys(task_ids))
+        if len(task_ids) > Config.STATUS_MAX_TASK_IDS:
+            raise ValidationError(f"At most {Config.STATUS_MAX_TASK_IDS} task ids per request")
+
+        wait = self._parse_wait(body.get("wait"))
+        items = self._wait_until(
+            lambda: self._get_statuses(user_pk, task_ids),
+            lambda items: not items or any(i.get("status") in TaskCache.TERMINAL_STATUSES for i in items.values()),
+            wait,
+        )
+
+        return ResponseBuilder.ok({
+            "tasks": [items[task_id] for task_id in task_ids if task_id in items],
+            "missing": [task_id for task_id in task_ids if task_id not in items],
+        })
+
+    def _get_statuses(self, user_pk: str, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        items: Dict[str, Dict[str, Any]] = {}
+        for task_id in task_ids:
+            cached = task_cache.get(user_pk, task_id)
+            if cached is not None:
+                items[task_id] = {k: cached[k] for k in self.STATUS_ATTRIBUTES if k in cached}
+
+        remaining = [task_id for task_id in task_ids if task_id not in items]
+        if remaining:
+            items.update(self._batch_get(user_pk, remaining, self.STATUS_ATTRIBUTES))
+        return items
+
+    @staticmethod
+    def _parse_wait(raw: Any) -> float:
+        try:
+            wait = float(raw or 0)
+        except (TypeError, ValueError):
+            raise ValidationError("wait must be a number of seconds")
+        return max(0.0, min(wait, Config.LONG_POLL_MAX_WAIT_SECONDS))
+
+    @staticmethod
+    def _wait_until(fetch: Callable[[], Any], done: Callable[[Any], bool], wait_seconds: float) -> Any:
+        # Re-reads with a growing interval (capped at 1s) until done or the wait runs out.
+        deadline = time.monotonic() + wait_seconds
+        interval = Config.LONG_POLL_INTERVAL_SECONDS
+        result = fetch()
+        while not done(result):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with metrics.span("long_poll_sleep"):
+                time.sleep(min(interval, remaining))
+            interval = min(interval * 2, 1.0)
+            result = fetch()
+        return result
 
 class FileService:
     def __init__(self):
-        self.s3 = aws_clients.s3
+        self.objects = backends.objects
 
     def presign_upload(self, event: Dict[str, Any]) -> Dict[str, Any]:
         claims = RequestUtils.extract_claims(event)
@@ -248,12 +1578,7 @@ class FileService:
         
         key = f"uploads/{sub}/{uuid.uuid4()}-{filename}"
         
-        url = self.s3.generate_presigned_url(
-            ClientMethod="put_object",
-            Params={"Bucket": Config.BUCKET_NAME, "Key": key, "ContentType": content_type},
-            ExpiresIn=900,
-            HttpMethod="PUT",
-        )
+        url = self.objects.presign("put_object", key, 900, ContentType=content_type)
         
         return ResponseBuilder.ok({
             "upload_url": url,
@@ -273,15 +1598,112 @@ class FileService:
         
         self._validate_file_access(sub, file_key)
         
-        url = self.s3.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": Config.BUCKET_NAME, "Key": file_key},
-            ExpiresIn=900,
-            HttpMethod="GET",
-        )
+        url = self.objects.presign("get_object", file_key, 900)
         
         return ResponseBuilder.ok({"download_url": url})
 
+    def start_multipart(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        claims = RequestUtils.extract_claims(event)
+        sub = RequestUtils.require_user_sub(claims)
+
+        body = RequestUtils.parse_json_body(event)
+        filename = body.get("filename", "file.bin")
+        content_type = body.get("content_type", "application/octet-stream")
+        size = body.get("size")
+        if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= Config.MULTIPART_MAX_OBJECT_SIZE:
+            raise ValidationError("size must be the file size in bytes, at most 5 TiB")
+
+        part_size = self.choose_part_size(size)
+        key = f"uploads/{sub}/{uuid.uuid4()}-{filename}"
+        upload_id = self.objects.create_multipart(key, ContentType=content_type)
+
+        return ResponseBuilder.created({
+            "upload_id": upload_id,
+            "object_key": key,
+            "content_type": content_type,
+            "part_size": part_size,
+            "part_count": -(-size // part_size),
+        })
+
+    @staticmethod
+    def choose_part_size(size: int) -> int:
+        """Smallest whole-MiB part size of at least MULTIPART_MIN_PART_SIZE that keeps the
+        upload within S3's 10,000-part limit."""
+        mib = 1024 * 1024
+        needed = -(-size // Config.MULTIPART_MAX_PARTS)
+        return max(Config.MULTIPART_MIN_PART_SIZE, -(-needed // mib) * mib)
+
+    def presign_parts(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        sub, key, upload_id, body = self._parse_upload_request(event)
+        part_numbers = body.get("part_numbers")
+        if (
+            not isinstance(part_numbers, list)
+            or not part_numbers
+            or len(part_numbers) > Config.MULTIPART_PRESIGN_BATCH
+            or not all(isinstance(n, int) and 1 <= n <= Config.MULTIPART_MAX_PARTS for n in part_numbers)
+        ):
+            raise ValidationError(
+                f"part_numbers must list 1-{Config.MULTIPART_PRESIGN_BATCH} part numbers "
+                f"between 1 and {Config.MULTIPART_MAX_PARTS}"
+            )
+
+        expires = Config.MULTIPART_URL_EXPIRES_SECONDS
+        return ResponseBuilder.ok({
+            "parts": [
+                {
+                    "part_number": number,
+                    "url": self.objects.presign("upload_part", key, expires, UploadId=upload_id, PartNumber=number),
+                }
+                for number in sorted(set(part_numbers))
+            ],
+            "expires_in": expires,
+        })
+
+    def list_parts(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        sub, key, upload_id, _ = self._parse_upload_request(event)
+        parts = self.objects.list_parts(key, upload_id)
+        return ResponseBuilder.ok({
+            "parts": [{"part_number": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]} for p in parts]
+        })
+
+    def complete_multipart(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        sub, key, upload_id, body = self._parse_upload_request(event)
+        parts = body.get("parts")
+        if parts is None:
+            # Resumed uploads may not have every ETag client-side; S3 has the authoritative list.
+            parts = [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in self.objects.list_parts(key, upload_id)]
+        else:
+            try:
+                parts = sorted(
+                    ({"PartNumber": int(p["part_number"]), "ETag": str(p["etag"])} for p in parts),
+                    key=lambda p: p["PartNumber"],
+                )
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError("parts must be a list of {part_number, etag}")
+        if not parts:
+            raise ValidationError("No parts uploaded")
+
+        self.objects.complete_multipart(key, upload_id, parts)
+        return ResponseBuilder.ok({"object_key": key, "part_count": len(parts)})
+
+    def abort_multipart(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        sub, key, upload_id, _ = self._parse_upload_request(event)
+        self.objects.abort_multipart(key, upload_id)
+        return ResponseBuilder.ok({"object_key": key, "aborted": True})
+
+    def _parse_upload_request(self, event: Dict[str, Any]) -> Tuple[str, str, str, Dict[str, Any]]:
+        claims = RequestUtils.extract_claims(event)
+        sub = RequestUtils.require_user_sub(claims)
+
+        body = RequestUtils.parse_json_body(event)
+        key = str(body.get("object_key", "")).strip()
+        upload_id = str(body.get("upload_id", "")).strip()
+        if not key or not upload_id:
+            raise ValidationError("object_key and upload_id required")
+        if not key.startswith(f"uploads/{sub}/"):
+            raise ValidationError("Access denied to file")
+        return sub, key, upload_id, body
+
     def _validate_file_access(self, sub: str, file_key: str) -> None:
         allowed_prefixes = [f"uploads/{sub}/", f"results/{sub}/"]
         if not any(file_key.startswith(p) for p in allowed_prefixes):
@@ -303,6 +1725,16 @@ class NotFoundError(CustomError):
     pass
 
 
+class ServiceUnavailableError(CustomError):
+    pass
+
+
+class TooManyRequestsError(CustomError):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class RequestUtils:
     @staticmethod
     def parse_query_string(event: Dict[str, Any]) -> Dict[str, str]:
@@ -327,6 +1759,31 @@ class RequestUtils:
             raise UnauthorizedError("Missing user sub")
         return sub
 
+    @staticmethod
+    def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+        # HTTP API v2 lowercases header names, but direct invocations may not.
+        headers = event.get("headers") or {}
+        value = headers.get(name.lower())
+        if value is None:
+            value = next((v for k, v in headers.items() if k.lower() == name.lower()), None)
+        return value
+
+    @staticmethod
+    def accepts_encoding(event: Dict[str, Any], encoding: str) -> bool:
+        header = RequestUtils.get_header(event, "Accept-Encoding") or ""
+        for part in header.split(","):
+            name, _, params = part.partition(";")
+            if name.strip().lower() not in (encoding, "*"):
+                continue
+            param = params.strip().replace(" ", "")
+            if not param.startswith("q="):
+                return True
+            try:
+                return float(param[2:]) > 0
+            except ValueError:
+                return False
+        return False
+
     @staticmethod
     def parse_json_body(event: Dict[str, Any]) -> Dict[str, Any]:
         try:
@@ -336,23 +1793,81 @@ class RequestUtils:
 
 
 class ResponseBuilder:
+    @staticmethod
+    def json_default(obj: Any) -> Any:
+        # DynamoDB returns every number as a Decimal. Parsing str(obj) is about twice as fast as
+        # Decimal arithmetic; only values like 1.0 or 1E+3 need the integrality check.
+        if isinstance(obj, Decimal):
+            text = str(obj)
+            if "." not in text and "E" not in text and text[-1].isdigit():
+                return int(text)
+            value = float(text)
+            return int(obj) if value.is_integer() else value
+        raise TypeError(f"Not JSON serializable: {type(obj)}")
+
+    @staticmethod
+    def dumps(body: Any) -> str:
+        if orjson is not None:
+            try:
+                return orjson.dumps(body, default=ResponseBuilder.json_default).decode("utf-8")
+            except TypeError:
+                pass  # integers beyond 64 bits or non-string keys; the stdlib encoder handles both
+        # Response bodies are built from fresh dicts, so the circular-reference bookkeeping is pure overhead.
+        return json.dumps(
+            body, default=ResponseBuilder.json_default, separators=(",", ":"), ensure_ascii=False, check_circular=False
+        )
+
     @staticmethod
     def _build_response(body: Any, status: int = 200) -> Dict[str, Any]:
-        def json_serializer(obj):
-            if isinstance(obj, Decimal):
-                return int(obj) if obj % 1 == 0 else float(obj)
-            raise TypeError(f"Not JSON serializable: {type(obj)}")
-        
+        with metrics.span("serialize"):
+            text = ResponseBuilder.dumps(body)
         return {
             "statusCode": status,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps(body, default=json_serializer),
+            "body": text,
+        }
+
+    @staticmethod
+    def compress(response: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+        """Gzips bodies of at least RESPONSE_GZIP_MIN_BYTES for clients that accept it."""
+        body = response.get("body")
+        if not body or response.get("isBase64Encoded") or len(body) < Config.RESPONSE_GZIP_MIN_BYTES:
+            return response
+
+        headers = {**response.get("headers", {}), "Vary": "Accept-Encoding"}
+        if not RequestUtils.accepts_encoding(event, "gzip"):
+            return {**response, "headers": headers}
+
+        with metrics.span("compress"):
+            data = gzip.compress(body.encode("utf-8"), compresslevel=Config.RESPONSE_GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+        # The encoded bytes differ from the identity representation, so only a weak match holds.
+        if headers.get("ETag") and not headers["ETag"].startswith("W/"):
+            headers["ETag"] = "W/" + headers["ETag"]
+        return {
+            **response,
+            "headers": headers,
+            "body": base64.b64encode(data).decode("ascii"),
+            "isBase64Encoded": True,
         }
 
     @staticmethod
     def ok(body: Any) -> Dict[str, Any]:
         return ResponseBuilder._build_response(body, 200)
 
+    @staticmethod
+    def ok_conditional(body: Any, event: Dict[str, Any]) -> Dict[str, Any]:
+        """200 with an ETag, or a bodiless 304 when If-None-Match already has it."""
+        response = ResponseBuilder._build_response(body, 200)
+        etag = '"' + hashlib.sha256(response["body"].encode("utf-8")).hexdigest()[:32] + '"'
+        response["headers"]["ETag"] = etag
+
+        if_none_match = RequestUtils.get_header(event, "If-None-Match") or ""
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return {"statusCode": 304, "headers": {"ETag": etag}, "body": ""}
+        return response
+
     @staticmethod
     def created(body: Any) -> Dict[str, Any]:
         return ResponseBuilder._build_response(body, 201)
@@ -369,14 +1884,30 @@ class ResponseBuilder:
     def not_found(message: str = "Not found") -> Dict[str, Any]:
         return ResponseBuilder._build_response({"error": message}, 404)
 
+    @staticmethod
+    def method_not_allowed(allowed: Tuple[str, ...]) -> Dict[str, Any]:
+        response = ResponseBuilder._build_response({"error": "Method not allowed"}, 405)
+        response["headers"]["Allow"] = ", ".join(allowed)
+        return response
+
     @staticmethod
     def conflict(message: str) -> Dict[str, Any]:
         return ResponseBuilder._build_response({"error": message}, 409)
 
+    @staticmethod
+    def too_many_requests(message: str, retry_after: int) -> Dict[str, Any]:
+        response = ResponseBuilder._build_response({"error": message, "retry_after": retry_after}, 429)
+        response["headers"]["Retry-After"] = str(retry_after)
+        return response
+
     @staticmethod
     def internal_error(message: str) -> Dict[str, Any]:
         return ResponseBuilder._build_response({"error": message}, 500)
 
+    @staticmethod
+    def service_unavailable(message: str) -> Dict[str, Any]:
+        return ResponseBuilder._build_response({"error": message}, 503)
+
 
 class HealthService:
     @staticmethod
@@ -396,3 +1927,30 @@ class UserService:
             "email": claims.get("email") or claims.get("cognito:username"),
             "stage": Config.STAGE
         })
+
+
+def _log_slow_route(route: Route, elapsed_ms: float) -> None:
+    if elapsed_ms >= Config.SLOW_ROUTE_LOG_MS:
+        Logger.info(f"Slow route {route.name}: {elapsed_ms:.0f} ms")
+
+
+router = Router([
+    Route("GET", "/health", lambda event, params: HealthService().get_health()),
+    Route("GET", "/me", lambda event, params: UserService().get_user_info(RequestUtils.extract_claims(event))),
+    Route("GET", "/me/usage", lambda event, params: TaskService().get_usage(event)),
+    Route("GET", "/tasks", lambda event, params: TaskService().list_tasks(event)),
+    Route("POST", "/tasks", lambda event, params: TaskService().create_task(event)),
+    Route("GET", "/tasks/{id}", lambda event, params: TaskService().get_task(event, params["id"])),
+    Route("POST", "/tasks/batch", lambda event, params: TaskService().create_tasks_batch(event)),
+    Route("POST", "/tasks/status", lambda event, params: TaskService().get_tasks_status(event)),
+    Route("POST", "/tasks/export", lambda event, params: TaskService().export_tasks(event)),
+    Route("POST", "/files/presign", lambda event, params: FileService().presign_upload(event)),
+    Route("POST", "/files/download", lambda event, params: FileService().presign_download(event)),
+    Route("POST", "/files/multipart/start", lambda event, params: FileService().start_multipart(event)),
+    Route("POST", "/files/multipart/parts", lambda event, params: FileService().presign_parts(event)),
+    Route("POST", "/files/multipart/list", lambda event, params: FileService().list_parts(event)),
+    Route("POST", "/files/multipart/complete", lambda event, params: FileService().complete_multipart(event)),
+    Route("POST", "/files/multipart/abort", lambda event, params: FileService().abort_multipart(event)),
+])
+router.add_timing_hook(lambda route, elapsed_ms: metrics.put("route_ms", elapsed_ms, "Milliseconds"))
+router.add_timing_hook(_log_slow_route)
@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+
+
+class DispatcherConfig:
+    AWS_REGION = os.getenv("AWS_REGION", "eu-central-1")
+    SQS_QUEUE_URL = os.getenv("SQS_QUEUE_URL")
+    BULK_QUEUE_URL = os.getenv("BULK_QUEUE_URL")
+    FAIR_SHARE_TASKS = int(os.getenv("FAIR_SHARE_TASKS", "50"))
+    FAIR_SHARE_WINDOW_SECONDS = float(os.getenv("FAIR_SHARE_WINDOW_SECONDS", "60"))
+    MAX_TRACKED_TENANTS = int(os.getenv("MAX_TRACKED_TENANTS", "10000"))
+    MAX_SEND_ATTEMPTS = int(os.getenv("MAX_SEND_ATTEMPTS", "3"))
+
+
+class AWSClients:
+    def __init__(self):
+        self.sqs = boto3.client("sqs", region_name=DispatcherConfig.AWS_REGION)
+
+
+aws_clients = AWSClients()
+
+class Logger:
+    @staticmethod
+    def info(message: str) -> None:
+        print(f"[dispatcher] {message}", flush=True)
+
+    @staticmethod
+    def error(message: str) -> None:
+        print(f"[dispatcher] ERROR: {message}", flush=True)
+
+
+class PendingTask:
+    _deserializer = TypeDeserializer()
+
+    def __init__(self, record: Dict[str, Any]):
+        dynamodb = record.get("dynamodb", {})
+        image = {
+            k: self._deserializer.deserialize(v)
+            for k, v in dynamodb.get("NewImage", {}).items()
+        }
+        self.sequence_number = dynamodb.get("SequenceNumber", "")
+        self.task_id = image.get("task_id") or ""
+        self.user_pk = image.get("pk") or ""
+        self.file_key = image.get("file_key") or ""
+        self.status = image.get("status")
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> Optional["PendingTask"]:
+        if record.get("eventName") != "INSERT":
+            return None
+        task = cls(record)
+        if task.status != "PENDING" or not task.task_id:
+            return None
+        return task
+
+    def message_body(self) -> str:
+        return json.dumps({
+            "task_id": self.task_id,
+            "user_pk": self.user_pk,
+            "file_key": self.file_key,
+        })
+
+
+class QueueRouter:
+    """Splits tasks between the main queue and the bulk queue by tenant.
+
+    Each tenant's first ``fair_share`` tasks in a window go to the main queue;
+    the rest go to the bulk queue, whose consumers run at capped concurrency.
+    A tenant creating thousands of tasks then queues behind itself and other
+    heavy tenants instead of in front of everyone. Counts are kept per
+    container, which sees a whole stream shard.
+    """
+
+    def __init__(
+        self, main_queue_url: Optional[str], bulk_queue_url: Optional[str], fair_share: int, window_seconds: float
+    ):
+        self.main_queue_url = main_queue_url
+        self.bulk_queue_url = bulk_queue_url
+        self.fair_share = fair_share
+        self.window_seconds = window_seconds
+        self._windows: Dict[str, Tuple[float, int]] = {}
+
+    def route(self, user_pk: str, now: float) -> Optional[str]:
+        if not self.bulk_queue_url:
+            return self.main_queue_url
+
+        started, count = self._windows.get(user_pk, (now, 0))
+        if now - started >= self.window_seconds:
+            started, count = now, 0
+        self._windows[user_pk] = (started, count + 1)
+        if len(self._windows) > DispatcherConfig.MAX_TRACKED_TENANTS:
+            self._expire(now)
+        return self.main_queue_url if count < self.fair_share else self.bulk_queue_url
+
+    def _expire(self, now: float) -> None:
+        self._windows = {
+            user_pk: window for user_pk, window in self._windows.items()
+            if now - window[0] < self.window_seconds
+        }
+
+
+queue_router = QueueRouter(
+    DispatcherConfig.SQS_QUEUE_URL,
+    DispatcherConfig.BULK_QUEUE_URL,
+    DispatcherConfig.FAIR_SHARE_TASKS,
+    DispatcherConfig.FAIR_SHARE_WINDOW_SECONDS,
+)
+
+
+class TaskDispatcher:
+    def __init__(self):
+        self.sqs = aws_clients.sqs
+
+    def dispatch(self, tasks: List[PendingTask]) -> List[PendingTask]:
+        now = time.time()
+        by_queue: Dict[str, List[PendingTask]] = {}
+        for task in tasks:
+            by_queue.setdefault(queue_router.route(task.user_pk, now), []).append(task)
+
+        unsent: List[PendingTask] = []
+        for queue_url, queue_tasks in by_queue.items():
+            for start in range(0, len(queue_tasks), 10):
+                unsent.extend(self._send_batch(queue_url, queue_tasks[start:start + 10]))
+        return unsent
+
+    def _send_batch(self, queue_url: str, tasks: List[PendingTask]) -> List[PendingTask]:
+        pending = {str(i): task for i, task in enumerate(tasks)}
+        for attempt in range(DispatcherConfig.MAX_SEND_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+            try:
+                resp = self.sqs.send_message_batch(
+                    QueueUrl=queue_url,
+                    Entries=[
+                        {"Id": entry_id, "MessageBody": task.message_body()}
+                        for entry_id, task in pending.items()
+                    ],
+                )
+            except Exception as e:
+                Logger.error(f"send_message_batch failed (attempt {attempt + 1}): {e}")
+                continue
+
+            failed_ids = {failure["Id"] for failure in resp.get("Failed", [])}
+            for failure in resp.get("Failed", []):
+                Logger.error(f"Failed to enqueue task {pending[failure['Id']].task_id}: {failure.get('Message')}")
+            pending = {entry_id: task for entry_id, task in pending.items() if entry_id in failed_ids}
+            if not pending:
+                break
+        return list(pending.values())
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    tasks = []
+    for record in event.get("Records", []):
+        task = PendingTask.from_record(record)
+        if task:
+            tasks.append(task)
+
+    unsent = TaskDispatcher().dispatch(tasks) if tasks else []
+    Logger.info(f"Dispatched {len(tasks) - len(unsent)}/{len(tasks)} task(s)")
+
+    # Lambda retries the stream from the lowest reported sequence number; duplicates
+    # are harmless because the worker claims tasks with a conditional write.
+    return {
+        "batchItemFailures": [{"itemIdentifier": task.sequence_number} for task in unsent]
+    }
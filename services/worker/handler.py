@@ -1,31 +1,577 @@
 ﻿import json
 import os
+import base64
+import copy
+import csv
 import hashlib
+import math
+import random
+import time
+import uuid
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from decimal import Decimal
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple, Callable
 
 import boto3
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import ClientError, HTTPClientError, IncompleteReadError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 class WorkerConfig:
     TABLE_NAME = os.getenv("TABLE_NAME", "taskflow-dev-tasks")
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "aws")
     BUCKET_NAME = os.getenv("BUCKET_NAME")
     AWS_REGION = os.getenv("AWS_REGION", "eu-central-1")
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(1024 * 1024)))
+    MAX_RECEIVE_COUNT = int(os.getenv("MAX_RECEIVE_COUNT", "3"))
+    MAX_CONCURRENCY = max(1, int(os.getenv("WORKER_CONCURRENCY", "4")))
+    LARGE_TASK_QUEUE_URL = os.getenv("LARGE_TASK_QUEUE_URL")
+    TIME_SAFETY_MARGIN_MS = int(os.getenv("TIME_SAFETY_MARGIN_MS", "2000"))
+    TASK_BASE_COST_MS = int(os.getenv("TASK_BASE_COST_MS", "300"))
+    THROUGHPUT_BYTES_PER_MS = int(os.getenv("THROUGHPUT_BYTES_PER_MS", str(20 * 1024)))
+    # Per analyzer, in decoded bytes; the CSV and JSONL analyzers run at ~10-12 MB/s.
+    ANALYZER_THROUGHPUT_BYTES_PER_MS = int(os.getenv("ANALYZER_THROUGHPUT_BYTES_PER_MS", str(8 * 1024)))
+    # Assumed decoded/encoded size ratio of gzip or zstd input; typical text compresses 4-6x.
+    COMPRESSED_EXPANSION_RATIO = float(os.getenv("COMPRESSED_EXPANSION_RATIO", "6"))
+    OVERSIZED_TASK_COST_MS = int(os.getenv("OVERSIZED_TASK_COST_MS", "25000"))
+    RANGED_GET_THRESHOLD_BYTES = int(os.getenv("RANGED_GET_THRESHOLD_BYTES", str(64 * 1024 * 1024)))
+    RANGED_GET_PART_SIZE = int(os.getenv("RANGED_GET_PART_SIZE", str(8 * 1024 * 1024)))
+    RANGED_GET_CONCURRENCY = max(1, int(os.getenv("RANGED_GET_CONCURRENCY", "4")))
+    STATS_CACHE_ENABLED = os.getenv("STATS_CACHE_ENABLED", "true").lower() == "true"
+    STATS_CACHE_TTL_DAYS = int(os.getenv("STATS_CACHE_TTL_DAYS", "30"))
+    TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "900"))
+    TASK_LEASE_GRACE_SECONDS = int(os.getenv("TASK_LEASE_GRACE_SECONDS", "5"))
+    AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+    AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "2"))
+    AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "20"))
+    ANALYZERS_ENABLED = os.getenv("ANALYZERS_ENABLED", "true").lower() == "true"
+    ANALYZER_MAX_COLUMNS = int(os.getenv("ANALYZER_MAX_COLUMNS", "256"))
+    ANALYZER_MAX_KEYS = int(os.getenv("ANALYZER_MAX_KEYS", "1000"))
+    ANALYZER_MAX_RECORD_BYTES = int(os.getenv("ANALYZER_MAX_RECORD_BYTES", str(8 * 1024 * 1024)))
+    ANALYZER_MAX_NAME_CHARS = int(os.getenv("ANALYZER_MAX_NAME_CHARS", "256"))
+    # Analyzer output is stored in the task item and the stats cache; DynamoDB items are capped at 400 KB.
+    ANALYZER_MAX_SUMMARY_BYTES = int(os.getenv("ANALYZER_MAX_SUMMARY_BYTES", str(64 * 1024)))
+    METRICS_SINK = os.getenv("METRICS_SINK", "emf")
+    METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "Taskflow")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
 
 
 class AWSClients:
     def __init__(self):
-        self.dynamo = boto3.resource("dynamodb", region_name=WorkerConfig.AWS_REGION)
-        self.table = self.dynamo.Table(WorkerConfig.TABLE_NAME)
-        self.s3 = boto3.client(
-            "s3",
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._s3 = None
+        self._sqs = None
+
+    @staticmethod
+    def _client_config(**kwargs: Any) -> BotocoreConfig:
+        return BotocoreConfig(
             region_name=WorkerConfig.AWS_REGION,
-            config=BotocoreConfig(s3={"addressing_style": "virtual"})
+            retries={"mode": "adaptive", "max_attempts": WorkerConfig.AWS_MAX_ATTEMPTS},
+            connect_timeout=WorkerConfig.AWS_CONNECT_TIMEOUT,
+            read_timeout=WorkerConfig.AWS_READ_TIMEOUT,
+            tcp_keepalive=True,
+            **kwargs,
+        )
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            with self._lock:
+                if self._s3 is None:
+                    self._s3 = boto3.client("s3", config=self._client_config(
+                        s3={"addressing_style": "virtual"},
+                        max_pool_connections=max(10, WorkerConfig.MAX_CONCURRENCY + WorkerConfig.RANGED_GET_CONCURRENCY),
+                    ))
+        return self._s3
+
+    @property
+    def sqs(self):
+        if self._sqs is None:
+            with self._lock:
+                if self._sqs is None:
+                    # Long polls hold the connection open for up to 20s before SQS answers.
+                    config = self._client_config().merge(
+                        BotocoreConfig(read_timeout=max(WorkerConfig.AWS_READ_TIMEOUT, 25))
+                    )
+                    self._sqs = boto3.client("sqs", config=config)
+        return self._sqs
+
+    @property
+    def table(self):
+        # boto3 resources are not thread-safe, so each worker thread gets its own.
+        table = getattr(self._local, "table", None)
+        if table is None:
+            dynamo = boto3.session.Session().resource("dynamodb", config=self._client_config(
+                max_pool_connections=max(10, WorkerConfig.MAX_CONCURRENCY),
+            ))
+            table = dynamo.Table(WorkerConfig.TABLE_NAME)
+            self._local.table = table
+        return table
+
+
+class ConditionFailedError(Exception):
+    def __init__(self, item: Optional[Dict[str, Any]] = None):
+        super().__init__("Conditional check failed")
+        self.item = item or {}
+
+
+class TaskTable:
+    """Storage operations behind task state transitions.
+
+    Conditional writes raise ConditionFailedError; ``claim`` attaches the item
+    as it was before the write (empty if it does not exist).
+    """
+
+    def claim(self, key: Dict[str, str], lease_owner: str, lease_expires_at: int, now: int, values: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def update_owned(
+        self, key: Dict[str, str], lease_owner: str, values: Dict[str, Any], remove: Iterable[str] = ()
+    ) -> None:
+        raise NotImplementedError
+
+    def fail(self, key: Dict[str, str], lease_owner: str, now: int, values: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def renew_lease(self, key: Dict[str, str], lease_owner: str, lease_expires_at: int) -> None:
+        raise NotImplementedError
+
+    def get_item(self, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put_item(self, item: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def add_counters(self, key: Dict[str, str], counters: Dict[str, int]) -> None:
+        """Atomically adds to numeric attributes, creating the item if needed."""
+        raise NotImplementedError
+
+
+class ObjectStore:
+    def head(self, key: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def iter_chunks(self, key: str, chunk_size: int) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def get_range(self, key: str, start: int, end: int, etag: Optional[str] = None) -> bytes:
+        raise NotImplementedError
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+
+class MessageQueue:
+    def send(self, queue_url: str, body: str) -> None:
+        raise NotImplementedError
+
+    def change_visibility_batch(self, queue_url: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the failed entries."""
+        raise NotImplementedError
+
+    def receive(
+        self, queue_url: str, max_messages: int, wait_seconds: int, visibility_timeout: int
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete_batch(self, queue_url: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the failed entries."""
+        raise NotImplementedError
+
+
+class DynamoTaskTable(TaskTable):
+    _deserializer = TypeDeserializer()
+
+    def __init__(self, clients: AWSClients):
+        self.clients = clients
+
+    def claim(self, key: Dict[str, str], lease_owner: str, lease_expires_at: int, now: int, values: Dict[str, Any]) -> None:
+        assignments, names, attribute_values = self._set_clause(values)
+        try:
+            self.clients.table.update_item(
+                Key=key,
+                UpdateExpression=f"SET {assignments}, lease_owner=:owner, lease_expires_at=:exp",
+                ConditionExpression=(
+                    "attribute_exists(pk) AND "
+                    "(#s = :pending OR (#s = :processing AND lease_expires_at < :now))"
+                ),
+                ExpressionAttributeNames={"#s": "status", **names},
+                ExpressionAttributeValues={
+                    ":pending": "PENDING",
+                    ":processing": "PROCESSING",
+                    ":owner": lease_owner,
+                    ":exp": lease_expires_at,
+                    ":now": now,
+                    **attribute_values,
+                },
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+        except ClientError as e:
+            if not self._is_condition_failure(e):
+                raise
+            # The old item comes back in low-level attribute-value form, even via the resource API.
+            old_item = {k: self._deserializer.deserialize(v) for k, v in e.response.get("Item", {}).items()}
+            raise ConditionFailedError(old_item) from e
+
+    def update_owned(
+        self, key: Dict[str, str], lease_owner: str, values: Dict[str, Any], remove: Iterable[str] = ()
+    ) -> None:
+        assignments, names, attribute_values = self._set_clause(values)
+        removed = ", ".join(["lease_owner", "lease_expires_at", *remove])
+        try:
+            self.clients.table.update_item(
+                Key=key,
+                UpdateExpression=f"SET {assignments} REMOVE {removed}",
+                ConditionExpression="#s = :processing AND lease_owner = :owner",
+                ExpressionAttributeNames={"#s": "status", **names},
+                ExpressionAttributeValues={":processing": "PROCESSING", ":owner": lease_owner, **attribute_values},
+            )
+        except ClientError as e:
+            if not self._is_condition_failure(e):
+                raise
+            raise ConditionFailedError() from e
+
+    def fail(self, key: Dict[str, str], lease_owner: str, now: int, values: Dict[str, Any]) -> None:
+        assignments, names, attribute_values = self._set_clause(values)
+        try:
+            self.clients.table.update_item(
+                Key=key,
+                UpdateExpression=f"SET {assignments} REMOVE lease_owner, lease_expires_at",
+                ConditionExpression=(
+                    "attribute_exists(pk) AND #s <> :done AND #s <> :failed AND "
+                    "(attribute_not_exists(lease_owner) OR lease_owner = :owner OR lease_expires_at < :now)"
+                ),
+                ExpressionAttributeNames={"#s": "status", **names},
+                ExpressionAttributeValues={
+                    ":done": "DONE",
+                    ":failed": "FAILED",
+                    ":owner": lease_owner,
+                    ":now": now,
+                    **attribute_values,
+                },
+            )
+        except ClientError as e:
+            if not self._is_condition_failure(e):
+                raise
+            raise ConditionFailedError() from e
+
+    def renew_lease(self, key: Dict[str, str], lease_owner: str, lease_expires_at: int) -> None:
+        try:
+            self.clients.table.update_item(
+                Key=key,
+                UpdateExpression="SET lease_expires_at = :exp",
+                ConditionExpression="#s = :processing AND lease_owner = :owner",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":processing": "PROCESSING", ":owner": lease_owner, ":exp": lease_expires_at},
+            )
+        except ClientError as e:
+            if not self._is_condition_failure(e):
+                raise
+            raise ConditionFailedError() from e
+
+    def get_item(self, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        return self.clients.table.get_item(Key=key).get("Item")
+
+    def put_item(self, item: Dict[str, Any]) -> None:
+        self.clients.table.put_item(Item=item)
+
+    def add_counters(self, key: Dict[str, str], counters: Dict[str, int]) -> None:
+        self.clients.table.update_item(
+            Key=key,
+            UpdateExpression="ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(counters))),
+            ExpressionAttributeNames={f"#c{i}": name for i, name in enumerate(counters)},
+            ExpressionAttributeValues={f":c{i}": value for i, value in enumerate(counters.values())},
         )
 
+    @staticmethod
+    def _set_clause(values: Dict[str, Any]) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        names = {f"#f{i}": name for i, name in enumerate(values)}
+        attribute_values = {f":v{i}": value for i, value in enumerate(values.values())}
+        assignments = ", ".join(f"#f{i}=:v{i}" for i in range(len(values)))
+        return assignments, names, attribute_values
+
+    @staticmethod
+    def _is_condition_failure(error: ClientError) -> bool:
+        return error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+class S3ObjectStore(ObjectStore):
+    def __init__(self, clients: AWSClients):
+        self.clients = clients
+
+    def head(self, key: str) -> Dict[str, Any]:
+        return self.clients.s3.head_object(
+            Bucket=WorkerConfig.BUCKET_NAME,
+            Key=key,
+            ChecksumMode="ENABLED",
+        )
+
+    def iter_chunks(self, key: str, chunk_size: int) -> Iterator[bytes]:
+        obj = self.clients.s3.get_object(Bucket=WorkerConfig.BUCKET_NAME, Key=key)
+        body = obj["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size=chunk_size)
+        finally:
+            body.close()
+
+    def get_range(self, key: str, start: int, end: int, etag: Optional[str] = None) -> bytes:
+        params = {"Bucket": WorkerConfig.BUCKET_NAME, "Key": key, "Range": f"bytes={start}-{end}"}
+        if etag:
+            params["IfMatch"] = etag
+        return self.clients.s3.get_object(**params)["Body"].read()
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        self.clients.s3.put_object(
+            Bucket=WorkerConfig.BUCKET_NAME,
+            Key=key,
+            Body=body,
+            ContentType=content_type,
+        )
+
+
+class SQSMessageQueue(MessageQueue):
+    def __init__(self, clients: AWSClients):
+        self.clients = clients
+
+    def send(self, queue_url: str, body: str) -> None:
+        self.clients.sqs.send_message(QueueUrl=queue_url, MessageBody=body)
+
+    def change_visibility_batch(self, queue_url: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        resp = self.clients.sqs.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)
+        return resp.get("Failed", [])
+
+    def receive(
+        self, queue_url: str, max_messages: int, wait_seconds: int, visibility_timeout: int
+    ) -> List[Dict[str, Any]]:
+        resp = self.clients.sqs.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=max_messages,
+            WaitTimeSeconds=wait_seconds,
+            VisibilityTimeout=visibility_timeout,
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        return resp.get("Messages", [])
+
+    def delete_batch(self, queue_url: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        resp = self.clients.sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
+        return resp.get("Failed", [])
+
+
+class InMemoryTaskTable(TaskTable):
+    """Process-local table with the conditional-write semantics of DynamoTaskTable.
+
+    Pass the same ``items`` dict as the API's in-memory table to share tasks.
+    """
+
+    def __init__(self, items: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None):
+        self.items = items if items is not None else {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: Dict[str, str], lease_owner: str, lease_expires_at: int, now: int, values: Dict[str, Any]) -> None:
+        with self._lock:
+            item = self.items.get(self._key(key))
+            claimable = item is not None and (
+                item.get("status") == "PENDING"
+                or (item.get("status") == "PROCESSING" and item.get("lease_expires_at", 0) < now)
+            )
+            if not claimable:
+                raise ConditionFailedError(copy.deepcopy(item))
+            item.update(self._to_dynamo({**values, "lease_owner": lease_owner, "lease_expires_at": lease_expires_at}))
+
+    def update_owned(
+        self, key: Dict[str, str], lease_owner: str, values: Dict[str, Any], remove: Iterable[str] = ()
+    ) -> None:
+        with self._lock:
+            item = self.items.get(self._key(key))
+            if not item or item.get("status") != "PROCESSING" or item.get("lease_owner") != lease_owner:
+                raise ConditionFailedError()
+            self._apply(item, values)
+            for name in remove:
+                item.pop(name, None)
+
+    def fail(self, key: Dict[str, str], lease_owner: str, now: int, values: Dict[str, Any]) -> None:
+        with self._lock:
+            item = self.items.get(self._key(key))
+            if (
+                not item
+                or item.get("status") in ("DONE", "FAILED")
+                or ("lease_owner" in item and item["lease_owner"] != lease_owner and item.get("lease_expires_at", 0) >= now)
+            ):
+                raise ConditionFailedError()
+            self._apply(item, values)
+
+    def renew_lease(self, key: Dict[str, str], lease_owner: str, lease_expires_at: int) -> None:
+        with self._lock:
+            item = self.items.get(self._key(key))
+            if not item or item.get("status") != "PROCESSING" or item.get("lease_owner") != lease_owner:
+                raise ConditionFailedError()
+            item["lease_expires_at"] = lease_expires_at
+
+    def get_item(self, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self.items.get(self._key(key))
+            return copy.deepcopy(item) if item is not None else None
+
+    def put_item(self, item: Dict[str, Any]) -> None:
+        with self._lock:
+            self.items[self._key(item)] = self._to_dynamo(item)
+
+    def add_counters(self, key: Dict[str, str], counters: Dict[str, int]) -> None:
+        with self._lock:
+            item = self.items.setdefault(self._key(key), dict(key))
+            for name, value in counters.items():
+                item[name] = item.get(name, Decimal(0)) + Decimal(value)
+
+    def _apply(self, item: Dict[str, Any], values: Dict[str, Any]) -> None:
+        item.update(self._to_dynamo(values))
+        item.pop("lease_owner", None)
+        item.pop("lease_expires_at", None)
+
+    @staticmethod
+    def _key(key: Dict[str, Any]) -> Tuple[str, str]:
+        return key["pk"], key["sk"]
+
+    @staticmethod
+    def _to_dynamo(value: Any) -> Any:
+        if isinstance(value, bool) or value is None or isinstance(value, (str, Decimal)):
+            return value
+        if isinstance(value, int):
+            return Decimal(value)
+        if isinstance(value, float):
+            raise TypeError("Float types are not supported. Use Decimal types instead.")
+        if isinstance(value, dict):
+            return {k: InMemoryTaskTable._to_dynamo(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [InMemoryTaskTable._to_dynamo(v) for v in value]
+        return copy.deepcopy(value)
+
+
+class InMemoryObjectStore(ObjectStore):
+    def __init__(self, objects: Optional[Dict[str, bytes]] = None):
+        self.objects = objects if objects is not None else {}
+        self.content_types: Dict[str, str] = {}
+        self._etags: Dict[str, Tuple[bytes, str]] = {}
+
+    def head(self, key: str) -> Dict[str, Any]:
+        data = self._get(key, "HeadObject")
+        return {
+            "ContentLength": len(data),
+            "ContentType": self.content_types.get(key, "binary/octet-stream"),
+            "ETag": self._etag(key, data),
+        }
+
+    def iter_chunks(self, key: str, chunk_size: int) -> Iterator[bytes]:
+        data = self._get(key, "GetObject")
+        view = memoryview(data)
+        for start in range(0, len(data), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+
+    def get_range(self, key: str, start: int, end: int, etag: Optional[str] = None) -> bytes:
+        data = self._get(key, "GetObject")
+        if etag and etag != self._etag(key, data):
+            raise ClientError(
+                {"Error": {"Code": "PreconditionFailed"}, "ResponseMetadata": {"HTTPStatusCode": 412}},
+                "GetObject",
+            )
+        return data[start:end + 1]
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        self.objects[key] = bytes(body)
+        self.content_types[key] = content_type
+
+    def _get(self, key: str, operation: str) -> bytes:
+        data = self.objects.get(key)
+        if data is None:
+            raise ClientError(
+                {"Error": {"Code": "NoSuchKey"}, "ResponseMetadata": {"HTTPStatusCode": 404}},
+                operation,
+            )
+        return data
+
+    def _etag(self, key: str, data: bytes) -> str:
+        cached = self._etags.get(key)
+        if cached is None or cached[0] is not data:
+            cached = (data, f'"{hashlib.md5(data).hexdigest()}"')
+            self._etags[key] = cached
+        return cached[1]
+
+
+class InMemoryMessageQueue(MessageQueue):
+    """Messages received and not yet deleted are kept in ``in_flight`` by receipt handle."""
+
+    def __init__(self):
+        self.messages: Dict[str, List[str]] = {}
+        self.in_flight: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Condition()
+
+    def send(self, queue_url: str, body: str) -> None:
+        with self._lock:
+            self.messages.setdefault(queue_url, []).append(body)
+            self._lock.notify_all()
+
+    def change_visibility_batch(self, queue_url: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            for entry in entries:
+                if entry["VisibilityTimeout"] == 0 and entry["ReceiptHandle"] in self.in_flight:
+                    self.messages.setdefault(queue_url, []).append(self.in_flight.pop(entry["ReceiptHandle"])[1])
+            self._lock.notify_all()
+        return []
+
+    def receive(
+        self, queue_url: str, max_messages: int, wait_seconds: int, visibility_timeout: int
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._lock.wait_for(lambda: self.messages.get(queue_url), timeout=wait_seconds)
+            pending = self.messages.get(queue_url, [])
+            bodies, pending[:max_messages] = pending[:max_messages], []
+            received = []
+            for body in bodies:
+                handle = str(uuid.uuid4())
+                self.in_flight[handle] = (queue_url, body)
+                received.append({
+                    "MessageId": handle,
+                    "ReceiptHandle": handle,
+                    "Body": body,
+                    "Attributes": {"ApproximateReceiveCount": "1"},
+                })
+            return received
+
+    def delete_batch(self, queue_url: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            for entry in entries:
+                self.in_flight.pop(entry["ReceiptHandle"], None)
+        return []
+
+
+class Backends:
+    def __init__(self, tasks: TaskTable, objects: ObjectStore, queue: MessageQueue):
+        self.tasks = tasks
+        self.objects = objects
+        self.queue = queue
+
+
+def create_backends() -> Backends:
+    if WorkerConfig.STORAGE_BACKEND == "memory":
+        return Backends(InMemoryTaskTable(), InMemoryObjectStore(), InMemoryMessageQueue())
+    return Backends(DynamoTaskTable(aws_clients), S3ObjectStore(aws_clients), SQSMessageQueue(aws_clients))
+
 
 aws_clients = AWSClients()
+backends = create_backends()
 
 class Logger:
     @staticmethod
@@ -37,17 +583,247 @@ class Logger:
         print(f"[worker] ERROR: {message}", flush=True)
 
 
+class MetricsSink:
+    def emit(self, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class EmfMetricsSink(MetricsSink):
+    """One CloudWatch Embedded Metric Format line per record; CloudWatch Logs extracts the metrics."""
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        print(json.dumps(record, separators=(",", ":")), flush=True)
+
+
+class MemoryMetricsSink(MetricsSink):
+    def __init__(self, max_records: int = 10000):
+        self.records: deque = deque(maxlen=max_records)
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+
+
+class NullMetricsSink(MetricsSink):
+    def emit(self, record: Dict[str, Any]) -> None:
+        pass
+
+
+def create_metrics_sink() -> MetricsSink:
+    if WorkerConfig.METRICS_SINK == "memory":
+        return MemoryMetricsSink()
+    if WorkerConfig.METRICS_SINK == "off":
+        return NullMetricsSink()
+    return EmfMetricsSink()
+
+
+class Metrics:
+    """Spans, counters and byte totals for one task, flushed as a single EMF record.
+
+    Repeated spans with the same name add up, so ``<name>_ms`` is the total time
+    the task spent in that stage.
+    """
+
+    def __init__(self, dimensions: Dict[str, str], sink: Optional[MetricsSink] = None):
+        self.dimensions = dimensions
+        self.sink = sink or metrics_sink
+        self.values: Dict[str, float] = {}
+        self.units: Dict[str, str] = {}
+        self.properties: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put(f"{name}_ms", (time.perf_counter() - started) * 1000, "Milliseconds")
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.put(name, value, "Count")
+
+    def add_bytes(self, name: str, value: int) -> None:
+        self.put(name, value, "Bytes")
+
+    def put(self, name: str, value: float, unit: str) -> None:
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+            self.units[name] = unit
+
+    def set_property(self, name: str, value: Any) -> None:
+        self.properties[name] = value
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self.values:
+                return
+            record = {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [{
+                        "Namespace": WorkerConfig.METRICS_NAMESPACE,
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": [{"Name": name, "Unit": unit} for name, unit in self.units.items()],
+                    }],
+                },
+                **self.properties,
+                **self.dimensions,
+                **{name: round(value, 3) for name, value in self.values.items()},
+            }
+            self.values, self.units = {}, {}
+        self.sink.emit(record)
+
+
+class Profiler:
+    """Optional cProfile hook. With PROFILE_SAMPLE_RATE > 0 about that share of containers
+    profile every task and log the top PROFILE_TOP_N functions by cumulative time.
+    Only the thread running the task is profiled, not its ranged-GET helpers."""
+
+    def __init__(self, sample_rate: float, top_n: int):
+        self.enabled = sample_rate > 0 and random.random() < sample_rate
+        self.top_n = top_n
+
+    def run(self, label: str, fn: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return fn()
+
+        import cProfile
+        import io
+        import pstats
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn)
+        finally:
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top_n)
+            Logger.info(f"Profile for {label}:\n{out.getvalue()}")
+
+
+metrics_sink = create_metrics_sink()
+profiler = Profiler(WorkerConfig.PROFILE_SAMPLE_RATE, WorkerConfig.PROFILE_TOP_N)
+
+
+class RetryableTaskError(Exception):
+    pass
+
+
+class PermanentTaskError(Exception):
+    pass
+
+
+class DeferredTaskError(RetryableTaskError):
+    pass
+
+
+class LeaseLostError(RetryableTaskError):
+    """The task's lease was taken over by another delivery while it was being processed."""
+
+
+class ErrorClassifier:
+    RETRYABLE_ERROR_CODES = {
+        "InternalError",
+        "InternalServerError",
+        "ProvisionedThroughputExceededException",
+        "RequestLimitExceeded",
+        "RequestTimeout",
+        "ServiceUnavailable",
+        "SlowDown",
+        "Throttling",
+        "ThrottlingException",
+        "TransactionConflictException",
+    }
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, RetryableTaskError):
+            return True
+        if isinstance(error, PermanentTaskError):
+            return False
+        if isinstance(error, ClientError):
+            code = error.response.get("Error", {}).get("Code", "")
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            return code in ErrorClassifier.RETRYABLE_ERROR_CODES or status >= 500
+        return isinstance(error, (BotocoreConnectionError, HTTPClientError, IncompleteReadError))
+
+
 class DateUtils:
     @staticmethod
     def now_iso() -> str:
         return datetime.now(timezone.utc).isoformat()
 
+
+class DynamoUtils:
+    @staticmethod
+    def to_dynamo(value: Any) -> Any:
+        # DynamoDB rejects Python floats; analyzer output (null rates, min/max) has plenty.
+        if isinstance(value, float):
+            return Decimal(str(value)) if math.isfinite(value) else None
+        if isinstance(value, dict):
+            return {k: DynamoUtils.to_dynamo(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [DynamoUtils.to_dynamo(v) for v in value]
+        return value
+
+    @staticmethod
+    def from_dynamo(value: Any) -> Any:
+        if isinstance(value, Decimal):
+            return int(value) if value % 1 == 0 else float(value)
+        if isinstance(value, dict):
+            return {k: DynamoUtils.from_dynamo(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [DynamoUtils.from_dynamo(v) for v in value]
+        return value
+
+
+class TimeBudget:
+    def __init__(self, context: Any = None):
+        self._get_remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+
+    def remaining_ms(self) -> Optional[int]:
+        if self._get_remaining_ms is None:
+            return None
+        return self._get_remaining_ms()
+
+    def can_afford(self, cost_ms: int) -> bool:
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return True
+        return remaining - WorkerConfig.TIME_SAFETY_MARGIN_MS >= cost_ms
+
+    def lease_seconds(self) -> int:
+        # A Lambda invocation cannot outlive its remaining time, so the lease doesn't need to either.
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return WorkerConfig.TASK_LEASE_SECONDS
+        return -(-remaining // 1000) + WorkerConfig.TASK_LEASE_GRACE_SECONDS
+
+
+class TaskCostEstimator:
+    @staticmethod
+    def estimate_ms(size_bytes: int, pipeline: Optional["AnalysisPipeline"] = None) -> int:
+        cost_ms = WorkerConfig.TASK_BASE_COST_MS + size_bytes // WorkerConfig.THROUGHPUT_BYTES_PER_MS
+        if pipeline is None or not pipeline.analyzers:
+            return cost_ms
+        # Analyzers see the decoded stream and are far slower than the base stats pass.
+        decoded_bytes = size_bytes * (WorkerConfig.COMPRESSED_EXPANSION_RATIO if pipeline.decoder else 1)
+        return cost_ms + int(len(pipeline.analyzers) * decoded_bytes // WorkerConfig.ANALYZER_THROUGHPUT_BYTES_PER_MS)
+
+    @staticmethod
+    def is_oversized(cost_ms: int) -> bool:
+        return cost_ms > WorkerConfig.OVERSIZED_TASK_COST_MS
+
+
 class TaskMessage:
     def __init__(self, raw_message: Dict[str, Any]):
+        self.raw_message = raw_message
         self.task_id = (raw_message.get("task_id") or "").strip()
         self.user_pk = (raw_message.get("user_pk") or "").strip()
         self.file_key = (raw_message.get("file_key") or "").strip()
         self.sub = self._extract_sub()
+        self.lease_owner: Optional[str] = None
+        # Set by whoever renews the lease (the poller) when the renewal is refused.
+        self.lease_lost = threading.Event()
 
     def _extract_sub(self) -> str:
         return self.user_pk.split("#", 1)[-1] if "#" in self.user_pk else "unknown"
@@ -61,31 +837,641 @@ class TaskMessage:
         )
 
 
-class FileProcessor:
+class LineCounter:
+    r"""Counts the line boundaries ``str.splitlines`` recognises, on UTF-8 bytes.
+
+    Boundaries are \n, \r, \r\n, \x0b, \x0c, \x1c-\x1e, U+0085, U+2028 and
+    U+2029. Their lead bytes can't be UTF-8 continuation bytes, so on valid UTF-8
+    matching the encoded sequences gives the same answer as decoding first.
+    Undecodable bytes count as content, whereas decoding with errors="ignore"
+    drops them (which can turn "\r<bad>\n" into one boundary). Patterns are only
+    counted when present; the presence check is a memchr and costs next to nothing.
+
+    Below SMALL_INPUT_BYTES the fixed cost of those checks outweighs the scan, so
+    small inputs are decoded with surrogateescape (undecodable bytes stay content)
+    and split instead. CRLF text needs the \r\n pair count on top of the \n and \r
+    counts (a bare \r can't be ruled out without it), so it runs at 0.6-1.2x of
+    decode + splitlines rather than the 2-4x of LF text.
+    """
+
+    SINGLE_BYTE = (b"\n", b"\r", b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e")
+    MULTI_BYTE = (b"\xc2\x85", b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+    TAIL_BYTES = 2
+    SMALL_INPUT_BYTES = 2048
+
+    @staticmethod
+    def count(data: bytes) -> int:
+        if len(data) < LineCounter.SMALL_INPUT_BYTES:
+            return LineCounter._count_small(data)
+        count = data.count(b"\n")
+        if b"\r" in data:
+            count += data.count(b"\r") - data.count(b"\r\n")
+        for boundary in LineCounter.SINGLE_BYTE[2:]:
+            if boundary in data:
+                count += data.count(boundary)
+        if b"\xc2" in data:
+            count += data.count(b"\xc2\x85")
+        if b"\xe2" in data:
+            count += data.count(b"\xe2\x80\xa8") + data.count(b"\xe2\x80\xa9")
+        return count
+
+    @staticmethod
+    def _count_small(data: bytes) -> int:
+        lines = len(data.decode("utf-8", errors="surrogateescape").splitlines())
+        return lines if not data or LineCounter.ends_with_boundary(data[-3:]) else lines - 1
+
+    @staticmethod
+    def junction(tail: bytes, head: bytes) -> int:
+        """Correction for two independently counted chunks, given the last and first TAIL_BYTES bytes."""
+        window = tail[-LineCounter.TAIL_BYTES:] + head[:LineCounter.TAIL_BYTES]
+        # A split \r\n was counted twice; a split multi-byte boundary was not counted at all.
+        adjustment = -1 if tail.endswith(b"\r") and head.startswith(b"\n") else 0
+        for boundary in LineCounter.MULTI_BYTE:
+            adjustment += LineCounter._count_straddling(window, len(tail[-LineCounter.TAIL_BYTES:]), boundary)
+        return adjustment
+
+    @staticmethod
+    def _count_straddling(window: bytes, split: int, boundary: bytes) -> int:
+        count = 0
+        start = window.find(boundary)
+        while start != -1:
+            if start < split < start + len(boundary):
+                count += 1
+            start = window.find(boundary, start + 1)
+        return count
+
+    @staticmethod
+    def ends_with_boundary(tail: bytes) -> bool:
+        return tail[-1:] in LineCounter.SINGLE_BYTE or tail[-2:] == b"\xc2\x85" or tail[-3:] in LineCounter.MULTI_BYTE[1:]
+
+
+class StatsAccumulator:
+    r"""Byte count, line count and sha256 computed in one pass over chunks.
+
+    Lines follow ``str.splitlines`` (see LineCounter): a non-empty
+    final fragment without a trailing boundary counts as one more line, so
+    b"a\nb" and b"a\r\nb\r\n" both have 2 lines and an empty object has 0.
+    Chunks may be counted elsewhere (e.g. in parallel); boundaries split across
+    chunks are corrected here.
+    """
+
     def __init__(self):
-        self.s3 = aws_clients.s3
+        self._sha256 = hashlib.sha256()
+        self._byte_count = 0
+        self._boundary_count = 0
+        self._tail = b""
 
-    def download_file(self, file_key: str) -> bytes:
-        Logger.info(f"Downloading s3://{WorkerConfig.BUCKET_NAME}/{file_key}")
-        obj = self.s3.get_object(Bucket=WorkerConfig.BUCKET_NAME, Key=file_key)
-        return obj["Body"].read()
+    def update(self, chunk: bytes, boundary_count: Optional[int] = None) -> None:
+        if not chunk:
+            return
+        self._sha256.update(chunk)
+        self._byte_count += len(chunk)
+        self._boundary_count += LineCounter.count(chunk) if boundary_count is None else boundary_count
+        if self._tail:
+            self._boundary_count += LineCounter.junction(self._tail, chunk)
+        self._tail = (self._tail + chunk[-3:])[-3:]
 
-    def calculate_stats(self, data: bytes) -> Dict[str, Any]:
-        byte_count = len(data)
-        line_count = self._count_lines(data)
-        sha256_hash = hashlib.sha256(data).hexdigest()
-        
+    def result(self) -> Dict[str, Any]:
+        trailing_line = 0 if not self._tail or LineCounter.ends_with_boundary(self._tail) else 1
         return {
-            "byte_count": byte_count,
-            "line_count": line_count,
-            "sha256": sha256_hash,
+            "byte_count": self._byte_count,
+            "line_count": self._boundary_count + trailing_line,
+            "sha256": self._sha256.hexdigest(),
         }
 
-    def _count_lines(self, data: bytes) -> Optional[int]:
+
+class StreamAnalyzer:
+    """Consumes the decoded chunk stream once and reports a JSON-serializable dict."""
+
+    name = ""
+
+    def update(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    def result(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def shrink(self, summary: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+        """Cuts a summary down to roughly ``max_bytes`` of JSON; by default only the error survives."""
+        return {"error": f"summary exceeds {max_bytes} bytes"}
+
+    @staticmethod
+    def json_size(value: Any) -> int:
+        return len(json.dumps(value, default=str))
+
+
+class RecordAnalyzer(StreamAnalyzer):
+    """Splits the stream into newline-terminated records, carrying partial records between chunks."""
+
+    def __init__(self):
+        self._pending = b""
+        self.oversized_records = 0
+
+    def update(self, chunk: bytes) -> None:
+        records = (self._pending + chunk).split(b"\n")
+        self._pending = records.pop()
+        if len(self._pending) > WorkerConfig.ANALYZER_MAX_RECORD_BYTES:
+            self.oversized_records += 1
+            self._pending = b""
+        if records:
+            self.process_records(records)
+
+    def result(self) -> Dict[str, Any]:
+        if self._pending:
+            self.process_records([self._pending])
+            self._pending = b""
+        return self.summary()
+
+    def process_records(self, records: List[bytes]) -> None:
+        raise NotImplementedError
+
+    def summary(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class CsvColumnStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.null_count = 0
+        self.numeric = True
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: str) -> None:
+        value = value.strip()
+        if not value:
+            self.null_count += 1
+            return
+        if not self.numeric:
+            return
+        try:
+            number = float(value)
+        except ValueError:
+            self.numeric = False
+            self.min = self.max = None
+            return
+        if not math.isfinite(number):
+            return
+        if self.min is None or number < self.min:
+            self.min = number
+        if self.max is None or number > self.max:
+            self.max = number
+
+    def summary(self, row_count: int) -> Dict[str, Any]:
+        result = {
+            "name": self.name,
+            "null_count": self.null_count,
+            "null_rate": round(self.null_count / row_count, 4) if row_count else 0,
+            "numeric": self.numeric,
+        }
+        if self.numeric and self.min is not None:
+            result["min"] = int(self.min) if self.min.is_integer() else self.min
+            result["max"] = int(self.max) if self.max.is_integer() else self.max
+        return result
+
+
+class CsvAnalyzer(RecordAnalyzer):
+    name = "csv"
+
+    def __init__(self):
+        super().__init__()
+        self._open_record: List[bytes] = []
+        self._open_quotes = 0
+        self._open_bytes = 0
+        self.columns: Optional[List[CsvColumnStats]] = None
+        self.column_count = 0
+        self.row_count = 0
+        self.ragged_rows = 0
+
+    def process_records(self, records: List[bytes]) -> None:
+        # A newline inside a quoted field does not end the record: keep joining
+        # lines until the quote count is even again.
+        complete: List[str] = []
+        for record in records:
+            self._open_record.append(record)
+            self._open_quotes += record.count(b'"')
+            self._open_bytes += len(record)
+            if self._open_quotes % 2:
+                if self._open_bytes > WorkerConfig.ANALYZER_MAX_RECORD_BYTES:
+                    # Most likely an unbalanced quote; resynchronise at the next line.
+                    self.oversized_records += 1
+                    self._open_record, self._open_quotes, self._open_bytes = [], 0, 0
+                continue
+            complete.append(b"\n".join(self._open_record).decode("utf-8", "replace"))
+            self._open_record, self._open_quotes, self._open_bytes = [], 0, 0
+
+        for row in csv.reader(complete):
+            if self.columns is None:
+                self._set_header(row)
+                continue
+            if not row:
+                continue
+            self.row_count += 1
+            if len(row) != self.column_count:
+                self.ragged_rows += 1
+            for column, value in zip(self.columns, row):
+                column.add(value)
+
+    def _set_header(self, row: List[str]) -> None:
+        if row and row[0].startswith("\ufeff"):
+            row[0] = row[0][1:]
+        self.column_count = len(row)
+        self.columns = [
+            CsvColumnStats(name[:WorkerConfig.ANALYZER_MAX_NAME_CHARS])
+            for name in row[:WorkerConfig.ANALYZER_MAX_COLUMNS]
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        if self._open_record:
+            self._open_record, records = [], self._open_record
+            self._open_quotes, self._open_bytes = 0, 0
+            self.process_records([b"\n".join(records) + b'"'])
+        columns = self.columns or []
+        return {
+            "row_count": self.row_count,
+            "column_count": self.column_count,
+            "columns": [column.summary(self.row_count) for column in columns],
+            "columns_truncated": self.column_count > len(columns),
+            "ragged_rows": self.ragged_rows,
+            "oversized_records": self.oversized_records,
+        }
+
+    def shrink(self, summary: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+        columns = summary["columns"]
+        while columns and self.json_size({**summary, "columns": columns}) > max_bytes:
+            columns = columns[:len(columns) // 2]
+        return {**summary, "columns": columns, "columns_truncated": True}
+
+
+class JsonLinesAnalyzer(RecordAnalyzer):
+    name = "jsonl"
+
+    def __init__(self):
+        super().__init__()
+        self.record_count = 0
+        self.invalid_count = 0
+        self.non_object_count = 0
+        self.key_counts: Dict[str, int] = {}
+        self.keys_truncated = False
+
+    def process_records(self, records: List[bytes]) -> None:
+        key_counts = self.key_counts
+        for record in records:
+            if not record.strip():
+                continue
+            self.record_count += 1
+            try:
+                value = json.loads(record)
+            except ValueError:
+                self.invalid_count += 1
+                continue
+            if not isinstance(value, dict):
+                self.non_object_count += 1
+                continue
+            for key in value:
+                key = key[:WorkerConfig.ANALYZER_MAX_NAME_CHARS]
+                if key in key_counts:
+                    key_counts[key] += 1
+                elif len(key_counts) < WorkerConfig.ANALYZER_MAX_KEYS:
+                    key_counts[key] = 1
+                else:
+                    self.keys_truncated = True
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "record_count": self.record_count,
+            "invalid_count": self.invalid_count,
+            "non_object_count": self.non_object_count,
+            "key_counts": self.key_counts,
+            "keys_truncated": self.keys_truncated,
+            "oversized_records": self.oversized_records,
+        }
+
+    def shrink(self, summary: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+        # Keep the most frequent keys.
+        keys = sorted(summary["key_counts"].items(), key=lambda item: item[1], reverse=True)
+        while keys and self.json_size({**summary, "key_counts": dict(keys)}) > max_bytes:
+            keys = keys[:len(keys) // 2]
+        return {**summary, "key_counts": dict(keys), "keys_truncated": True}
+
+
+class StreamDecoder:
+    """Decodes pushed chunks, handing output to ``emit`` in blocks of at most STREAM_CHUNK_SIZE bytes."""
+
+    name = ""
+
+    def decode(self, chunk: bytes, emit: Callable[[bytes], None]) -> None:
+        raise NotImplementedError
+
+    def finish(self, emit: Callable[[bytes], None]) -> None:
+        """Called at the end of the stream to emit any output still buffered."""
+
+
+class GzipDecoder(StreamDecoder):
+    name = "gzip"
+
+    def __init__(self):
+        # wbits=47 accepts both gzip and zlib headers.
+        self._decompressor = zlib.decompressobj(wbits=47)
+        self._in_member = False
+
+    def decode(self, chunk: bytes, emit: Callable[[bytes], None]) -> None:
+        data = chunk
+        self._in_member = self._in_member or bool(data)
+        while True:
+            # Output per step is capped so a high compression ratio can't blow up memory.
+            out = self._decompressor.decompress(data, WorkerConfig.STREAM_CHUNK_SIZE)
+            if out:
+                emit(out)
+            if self._decompressor.eof:
+                # Concatenated gzip members, as produced by `cat a.gz b.gz`.
+                data = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(wbits=47)
+                self._in_member = bool(data)
+                if not data:
+                    return
+            else:
+                data = self._decompressor.unconsumed_tail
+                # A full block may leave output pending for input zlib has already consumed.
+                if not data and len(out) < WorkerConfig.STREAM_CHUNK_SIZE:
+                    return
+
+    def finish(self, emit: Callable[[bytes], None]) -> None:
+        out = self._decompressor.flush()
+        if out:
+            emit(out)
+        if self._in_member and not self._decompressor.eof:
+            # zlib returns what it could decode without complaint; a cut-off upload must not look complete.
+            raise ValueError("truncated gzip stream")
+
+
+class CallbackWriter:
+    def __init__(self, emit: Callable[[bytes], None]):
+        self.emit = emit
+
+    def write(self, data: bytes) -> int:
+        self.emit(bytes(data))
+        return len(data)
+
+
+class ZstdDecoder(StreamDecoder):
+    """Decodes every frame of the stream; zstandard hands output to the writer write_size bytes at a time."""
+
+    name = "zstd"
+
+    def __init__(self):
+        if zstandard is None:
+            raise PermanentTaskError("zstd support requires the zstandard package")
+        self._writer = CallbackWriter(lambda data: None)
+        self._stream = zstandard.ZstdDecompressor().stream_writer(
+            self._writer, write_size=WorkerConfig.STREAM_CHUNK_SIZE, closefd=False
+        )
+
+    def decode(self, chunk: bytes, emit: Callable[[bytes], None]) -> None:
+        self._writer.emit = emit
+        self._stream.write(chunk)
+
+
+class AnalyzerRegistry:
+    """Maps content types and file extensions to analyzers and decoders."""
+
+    def __init__(self):
+        self._analyzers: List[Tuple[str, Callable[[], StreamAnalyzer], Tuple[str, ...], Tuple[str, ...]]] = []
+        self._decoders: List[Tuple[Callable[[], StreamDecoder], Tuple[str, ...], Tuple[str, ...]]] = []
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], StreamAnalyzer],
+        content_types: Iterable[str] = (),
+        extensions: Iterable[str] = (),
+    ) -> None:
+        self._analyzers.append((name, factory, tuple(content_types), tuple(extensions)))
+
+    def register_decoder(
+        self,
+        factory: Callable[[], StreamDecoder],
+        encodings: Iterable[str] = (),
+        extensions: Iterable[str] = (),
+    ) -> None:
+        self._decoders.append((factory, tuple(encodings), tuple(extensions)))
+
+    def select(self, file_key: str, head: Dict[str, Any]) -> Optional["AnalysisPipeline"]:
+        name = file_key.lower()
+        content_type = (head.get("ContentType") or "").split(";", 1)[0].strip().lower()
+        encoding = (head.get("ContentEncoding") or "").strip().lower()
+
+        decoder_factory = None
+        for factory, encodings, extensions in self._decoders:
+            if encoding in encodings or content_type in encodings or name.endswith(extensions):
+                decoder_factory = factory
+                name = next((name[:-len(ext)] for ext in extensions if name.endswith(ext)), name)
+                break
+
+        analyzers = [
+            factory()
+            for _, factory, content_types, extensions in self._analyzers
+            if content_type in content_types or name.endswith(extensions)
+        ]
+        if not analyzers:
+            return None
+        return AnalysisPipeline(analyzers, decoder_factory)
+
+
+class AnalysisPipeline:
+    """Feeds one chunk stream through an optional decoder into every analyzer.
+
+    A failing decoder or analyzer is reported in the output and dropped; it
+    never fails the task, since the base stats do not depend on it.
+    """
+
+    def __init__(self, analyzers: List[StreamAnalyzer], decoder_factory: Optional[Callable[[], StreamDecoder]] = None):
+        self.analyzers = analyzers
+        self.decoder: Optional[StreamDecoder] = None
+        self.errors: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {analyzer.name: 0.0 for analyzer in analyzers}
+        self._dispatch_seconds = 0.0
+        # Identifies what the analysis covers, so cached stats are only reused for the same selection.
+        self.profile = "+".join(sorted(analyzer.name for analyzer in analyzers))
+        if decoder_factory is not None:
+            self.profile = f"{getattr(decoder_factory, 'name', '')}:{self.profile}"
+            try:
+                self.decoder = decoder_factory()
+            except Exception as e:
+                self._fail_all(str(e))
+            else:
+                self.timings[self.decoder.name] = 0.0
+
+    def feed(self, chunk: bytes) -> None:
+        if not self.analyzers:
+            return
+        if self.decoder is None:
+            self._dispatch(chunk)
+            return
+
+        self._decode(self.decoder.decode, chunk)
+
+    def _decode(self, step: Callable[..., None], *args: Any) -> None:
+        # Analyzer time spent inside emit is booked to the analyzers, the rest to the decoder.
+        started = time.perf_counter()
+        dispatched_before = self._dispatch_seconds
         try:
-            return len(data.decode("utf-8", errors="ignore").splitlines())
-        except Exception:
+            step(*args, self._dispatch)
+        except Exception as e:
+            self._fail_all(f"{self.decoder.name} decode failed: {e}")
+        finally:
+            elapsed = time.perf_counter() - started - (self._dispatch_seconds - dispatched_before)
+            self.timings[self.decoder.name] += elapsed
+
+    def result(self) -> Dict[str, Any]:
+        if self.decoder is not None and self.analyzers:
+            self._decode(self.decoder.finish)
+        results: Dict[str, Any] = {name: {"error": error} for name, error in self.errors.items()}
+        for analyzer in self.analyzers:
+            started = time.perf_counter()
+            try:
+                results[analyzer.name] = self._fit(analyzer, analyzer.result())
+            except Exception as e:
+                results[analyzer.name] = {"error": str(e)[:500]}
+            self.timings[analyzer.name] += time.perf_counter() - started
+        return {
+            "analyzers": results,
+            "analyzer_timings_ms": {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()},
+        }
+
+    def _fit(self, analyzer: StreamAnalyzer, summary: Dict[str, Any]) -> Dict[str, Any]:
+        max_bytes = WorkerConfig.ANALYZER_MAX_SUMMARY_BYTES // max(1, len(self.analyzers))
+        if analyzer.json_size(summary) <= max_bytes:
+            return summary
+        return analyzer.shrink(summary, max_bytes)
+
+    def _dispatch(self, block: bytes) -> None:
+        for analyzer in list(self.analyzers):
+            started = time.perf_counter()
+            try:
+                analyzer.update(block)
+            except Exception as e:
+                self.errors[analyzer.name] = str(e)[:500]
+                self.analyzers.remove(analyzer)
+            elapsed = time.perf_counter() - started
+            self.timings[analyzer.name] += elapsed
+            self._dispatch_seconds += elapsed
+
+    def _fail_all(self, error: str) -> None:
+        for analyzer in self.analyzers:
+            self.errors[analyzer.name] = error[:500]
+        self.analyzers = []
+
+
+analyzer_registry = AnalyzerRegistry()
+analyzer_registry.register_decoder(GzipDecoder, ("gzip", "application/gzip", "application/x-gzip"), (".gz", ".gzip"))
+analyzer_registry.register_decoder(ZstdDecoder, ("zstd", "application/zstd"), (".zst", ".zstd"))
+analyzer_registry.register("csv", CsvAnalyzer, ("text/csv", "application/csv"), (".csv",))
+analyzer_registry.register(
+    "jsonl", JsonLinesAnalyzer, ("application/x-ndjson", "application/jsonl", "application/x-jsonlines"), (".jsonl", ".ndjson")
+)
+
+
+class FileProcessor:
+    @property
+    def objects(self) -> ObjectStore:
+        return backends.objects
+
+    def head_file(self, file_key: str) -> Dict[str, Any]:
+        return self.objects.head(file_key)
+
+    def stream_file(self, file_key: str) -> Iterator[bytes]:
+        Logger.info(f"Streaming s3://{WorkerConfig.BUCKET_NAME}/{file_key}")
+        return self.objects.iter_chunks(file_key, WorkerConfig.STREAM_CHUNK_SIZE)
+
+    def select_pipeline(self, file_key: str, head: Dict[str, Any]) -> Optional[AnalysisPipeline]:
+        if not WorkerConfig.ANALYZERS_ENABLED:
             return None
+        return analyzer_registry.select(file_key, head)
+
+    def calculate_file_stats(
+        self,
+        file_key: str,
+        head: Dict[str, Any],
+        pipeline: Optional[AnalysisPipeline] = None,
+        lease_lost: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        size = head.get("ContentLength", 0)
+        if size >= WorkerConfig.RANGED_GET_THRESHOLD_BYTES:
+            return self._calculate_ranged_stats(file_key, size, head.get("ETag"), pipeline, lease_lost)
+        return self.calculate_stats(self.stream_file(file_key), pipeline, lease_lost)
+
+    def calculate_stats(
+        self,
+        chunks: Iterable[bytes],
+        pipeline: Optional[AnalysisPipeline] = None,
+        lease_lost: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        accumulator = StatsAccumulator()
+        for chunk in chunks:
+            self._check_lease(lease_lost)
+            accumulator.update(chunk)
+            if pipeline:
+                pipeline.feed(chunk)
+        return self._merge_stats(accumulator, pipeline)
+
+    @staticmethod
+    def _merge_stats(accumulator: StatsAccumulator, pipeline: Optional[AnalysisPipeline]) -> Dict[str, Any]:
+        stats = accumulator.result()
+        if pipeline:
+            stats.update(pipeline.result())
+        return stats
+
+    @staticmethod
+    def _check_lease(lease_lost: Optional[threading.Event]) -> None:
+        if lease_lost is not None and lease_lost.is_set():
+            raise LeaseLostError("Task lease was lost - stopping")
+
+    def _calculate_ranged_stats(
+        self,
+        file_key: str,
+        size: int,
+        etag: Optional[str],
+        pipeline: Optional[AnalysisPipeline] = None,
+        lease_lost: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        part_size = WorkerConfig.RANGED_GET_PART_SIZE
+        concurrency = WorkerConfig.RANGED_GET_CONCURRENCY
+        Logger.info(
+            f"Fetching s3://{WorkerConfig.BUCKET_NAME}/{file_key} in {part_size}-byte ranges "
+            f"with concurrency {concurrency}"
+        )
+
+        # Parts are fetched and line-counted in parallel, but sha256 and the analyzers
+        # are fed strictly in offset order. At most 2 * concurrency parts are held in memory.
+        accumulator = StatsAccumulator()
+        in_flight: deque = deque()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="range") as pool:
+            for start in range(0, size, part_size):
+                end = min(start + part_size, size) - 1
+                in_flight.append(pool.submit(self._fetch_range, file_key, start, end, etag))
+                if len(in_flight) >= 2 * concurrency:
+                    self._check_lease(lease_lost)
+                    self._consume_part(accumulator, in_flight.popleft(), pipeline)
+            while in_flight:
+                self._check_lease(lease_lost)
+                self._consume_part(accumulator, in_flight.popleft(), pipeline)
+
+        stats = self._merge_stats(accumulator, pipeline)
+        if stats["byte_count"] != size:
+            raise RetryableTaskError(f"Ranged read returned {stats['byte_count']} of {size} bytes")
+        return stats
+
+    def _fetch_range(self, file_key: str, start: int, end: int, etag: Optional[str]) -> Tuple[bytes, int]:
+        data = self.objects.get_range(file_key, start, end, etag)
+        return data, LineCounter.count(data)
+
+    @staticmethod
+    def _consume_part(accumulator: StatsAccumulator, future: Future, pipeline: Optional[AnalysisPipeline]) -> None:
+        data, boundary_count = future.result()
+        accumulator.update(data, boundary_count)
+        if pipeline:
+            pipeline.feed(data)
 
     def save_result(self, task_message: TaskMessage, stats: Dict[str, Any]) -> str:
         result_key = f"results/{task_message.sub}/{task_message.task_id}.json"
@@ -96,112 +1482,443 @@ class FileProcessor:
             "generated_at": DateUtils.now_iso(),
         }
         
-        self.s3.put_object(
-            Bucket=WorkerConfig.BUCKET_NAME,
-            Key=result_key,
-            Body=json.dumps(result_payload, ensure_ascii=False).encode("utf-8"),
-            ContentType="application/json",
+        self.objects.put(
+            result_key,
+            json.dumps(result_payload, ensure_ascii=False).encode("utf-8"),
+            "application/json",
         )
         
         return result_key
 
 
+class ClaimResult:
+    CLAIMED = "CLAIMED"
+    MISSING = "MISSING"
+    FINISHED = "FINISHED"
+    LEASED = "LEASED"
+
+
+class UsageCounters:
+    """Per-user running totals in ``usage#<pk>`` items: one ``total`` item and one
+    ``day#YYYY-MM-DD`` item per UTC day.
+
+    Counters are bumped with ADD only after the conditional write of the transition
+    they count succeeded, so redeliveries never count twice. An increment lost to a
+    crash in between is repaired by tools/rebuild_usage.py.
+    """
+
+    @property
+    def tasks(self) -> TaskTable:
+        return backends.tasks
+
+    def add(self, user_pk: str, timestamp: str, counters: Dict[str, int]) -> None:
+        pk = f"usage#{user_pk}"
+        for sk in ("total", f"day#{timestamp[:10]}"):
+            try:
+                self.tasks.add_counters({"pk": pk, "sk": sk}, counters)
+            except Exception as e:
+                Logger.error(f"Failed to update usage {pk}/{sk}: {e}")
+
+
 class TaskRepository:
+    """Task state transitions as single conditional writes.
+
+    PENDING -> PROCESSING is claimed with a lease; an expired lease may be taken
+    over by another delivery. PROCESSING -> DONE/FAILED/PENDING is only applied by
+    the current lease owner. Every transition also maintains ``user_status``, the
+    key of the sparse by_user_status index, which DONE tasks drop out of.
+    """
+
+    INDEXED_STATUSES = ("PENDING", "PROCESSING", "FAILED")
+
     def __init__(self):
-        self.table = aws_clients.table
+        self.usage = UsageCounters()
 
-    def get_task(self, task_message: TaskMessage) -> Optional[Dict[str, Any]]:
-        return self.table.get_item(
-            Key={"pk": task_message.user_pk, "sk": task_message.task_id}
-        ).get("Item")
+    @property
+    def tasks(self) -> TaskTable:
+        return backends.tasks
 
-    def is_task_already_processed(self, task: Dict[str, Any]) -> bool:
-        return (
-            task.get("result_key") is not None or 
-            task.get("status") in ("DONE", "FAILED")
-        )
+    def claim_task(self, task_message: TaskMessage, lease_seconds: int) -> str:
+        now = int(time.time())
+        lease_owner = str(uuid.uuid4())
+        try:
+            self.tasks.claim(self._key(task_message), lease_owner, now + lease_seconds, now, {
+                **self._status_values(task_message, "PROCESSING"),
+                "started_at": DateUtils.now_iso(),
+            })
+        except ConditionFailedError as e:
+            if not e.item:
+                return ClaimResult.MISSING
+            if e.item.get("status") == "PROCESSING":
+                return ClaimResult.LEASED
+            return ClaimResult.FINISHED
+
+        task_message.lease_owner = lease_owner
+        return ClaimResult.CLAIMED
+
+    def renew_lease(self, task_message: TaskMessage, lease_seconds: int) -> bool:
+        """Pushes back the lease expiry; returns False if the lease is no longer ours."""
+        try:
+            self.tasks.renew_lease(self._key(task_message), task_message.lease_owner or "", int(time.time()) + lease_seconds)
+        except ConditionFailedError:
+            return False
+        return True
+
+    def release_task(self, task_message: TaskMessage) -> None:
+        self._update_owned(task_message, self._status_values(task_message, "PENDING"))
 
     def mark_task_completed(self, task_message: TaskMessage, result_key: str, stats: Dict[str, Any]) -> None:
-        self.table.update_item(
-            Key={"pk": task_message.user_pk, "sk": task_message.task_id},
-            UpdateExpression="SET #s=:s, processed_at=:ts, result_key=:rk, stats=:st",
-            ExpressionAttributeNames={"#s": "status"},
-            ExpressionAttributeValues={
-                ":s": "DONE",
-                ":ts": DateUtils.now_iso(),
-                ":rk": result_key,
-                ":st": stats,
-            },
-        )
+        processed_at = DateUtils.now_iso()
+        completed = self._update_owned(task_message, {
+            **self._status_values(task_message, "DONE"),
+            "processed_at": processed_at,
+            "result_key": result_key,
+            "stats": DynamoUtils.to_dynamo(stats),
+        }, remove=("user_status",))
+        if completed:
+            self.usage.add(task_message.user_pk, processed_at, {
+                "tasks_done": 1,
+                "bytes_processed": int(stats.get("byte_count", 0)),
+                "lines_processed": int(stats.get("line_count", 0)),
+            })
 
     def mark_task_failed(self, task_message: TaskMessage, error: str) -> None:
+        processed_at = DateUtils.now_iso()
         try:
-            self.table.update_item(
-                Key={"pk": task_message.user_pk, "sk": task_message.task_id},
-                UpdateExpression="SET #s=:s, processed_at=:ts, error=:err",
-                ExpressionAttributeNames={"#s": "status"},
-                ExpressionAttributeValues={
-                    ":s": "FAILED",
-                    ":ts": DateUtils.now_iso(),
-                    ":err": error[:2000],
-                },
-            )
+            self.tasks.fail(self._key(task_message), task_message.lease_owner or "", int(time.time()), {
+                **self._status_values(task_message, "FAILED"),
+                "processed_at": processed_at,
+                "error": error[:2000],
+            })
         except Exception as e:
             Logger.error(f"Failed to mark task as failed: {e}")
+            return
+        self.usage.add(task_message.user_pk, processed_at, {"tasks_failed": 1})
+
+    def _update_owned(self, task_message: TaskMessage, values: Dict[str, Any], remove: Iterable[str] = ()) -> bool:
+        try:
+            self.tasks.update_owned(self._key(task_message), task_message.lease_owner or "", values, remove)
+        except ConditionFailedError:
+            Logger.info(f"Task {task_message.task_id} lease lost - another delivery took it over")
+            return False
+        return True
+
+    @classmethod
+    def _status_values(cls, task_message: TaskMessage, status: str) -> Dict[str, Any]:
+        values = {"status": status}
+        if status in cls.INDEXED_STATUSES:
+            values["user_status"] = f"{task_message.user_pk}#{status}"
+        return values
+
+    @staticmethod
+    def _key(task_message: TaskMessage) -> Dict[str, str]:
+        return {"pk": task_message.user_pk, "sk": task_message.task_id}
+
+
+class StatsCache:
+    """Content-addressed stats keyed by S3 ETag + size, and by sha256 when known.
+
+    Entries live in the tasks table under ``stats_cache#...`` partition keys and
+    expire through the table's ``ttl`` attribute.
+    """
+
+    SORT_KEY = "stats"
+
+    @property
+    def tasks(self) -> TaskTable:
+        return backends.tasks
+
+    def get(self, head: Dict[str, Any], profile: str = "") -> Optional[Dict[str, Any]]:
+        for pk in self._lookup_keys(head, profile):
+            item = self.tasks.get_item({"pk": pk, "sk": self.SORT_KEY})
+            if item and int(item.get("ttl", 0)) > time.time():
+                return DynamoUtils.from_dynamo(item["stats"])
+        return None
+
+    def put(self, head: Dict[str, Any], stats: Dict[str, Any], profile: str = "") -> None:
+        ttl = int(time.time()) + WorkerConfig.STATS_CACHE_TTL_DAYS * 86400
+        keys = self._lookup_keys(head, profile) + [self._sha256_key(stats["sha256"], profile)]
+        for pk in dict.fromkeys(keys):
+            self.tasks.put_item({"pk": pk, "sk": self.SORT_KEY, "stats": DynamoUtils.to_dynamo(stats), "ttl": ttl})
+
+    def _lookup_keys(self, head: Dict[str, Any], profile: str) -> List[str]:
+        keys = []
+        etag = (head.get("ETag") or "").strip('"')
+        suffix = f"#{profile}" if profile else ""
+        if etag:
+            keys.append(f"stats_cache#etag#{etag}#{head.get('ContentLength', 0)}{suffix}")
+
+        # Composite (multipart) checksums end in "-<parts>" and are not a sha256 of the object.
+        checksum = head.get("ChecksumSHA256") or ""
+        if checksum and "-" not in checksum:
+            keys.append(self._sha256_key(base64.b64decode(checksum).hex(), profile))
+        return keys
+
+    @staticmethod
+    def _sha256_key(sha256_hex: str, profile: str = "") -> str:
+        return f"stats_cache#sha256#{sha256_hex}" + (f"#{profile}" if profile else "")
+
+
+class TaskQueue:
+    @property
+    def queue(self) -> MessageQueue:
+        return backends.queue
+
+    def forward_to_large_queue(self, task_message: TaskMessage) -> None:
+        self.queue.send(WorkerConfig.LARGE_TASK_QUEUE_URL, json.dumps(task_message.raw_message))
+
+    def release_messages(self, records: List[Dict[str, Any]]) -> None:
+        by_queue: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            queue_url = self._queue_url_from_arn(record.get("eventSourceARN", ""))
+            if queue_url and record.get("receiptHandle"):
+                by_queue.setdefault(queue_url, []).append(record)
+
+        for queue_url, queue_records in by_queue.items():
+            for start in range(0, len(queue_records), 10):
+                entries = [
+                    {"Id": str(i), "ReceiptHandle": record["receiptHandle"], "VisibilityTimeout": 0}
+                    for i, record in enumerate(queue_records[start:start + 10])
+                ]
+                try:
+                    for failure in self.queue.change_visibility_batch(queue_url, entries):
+                        Logger.error(f"Failed to release message: {failure.get('Message')}")
+                except Exception as e:
+                    Logger.error(f"Failed to release messages: {e}")
+
+    @staticmethod
+    def _queue_url_from_arn(arn: str) -> Optional[str]:
+        parts = arn.split(":")
+        if len(parts) != 6 or parts[2] != "sqs":
+            return None
+        _, partition, _, region, account_id, queue_name = parts
+        suffix = "amazonaws.com.cn" if partition == "aws-cn" else "amazonaws.com"
+        return f"https://sqs.{region}.{suffix}/{account_id}/{queue_name}"
 
 
 class TaskProcessor:
     def __init__(self):
         self.file_processor = FileProcessor()
         self.task_repository = TaskRepository()
+        self.task_queue = TaskQueue()
+        self.stats_cache = StatsCache()
 
-    def process_task(self, task_message: TaskMessage) -> None:
+    def process_task(
+        self, task_message: TaskMessage, budget: Optional[TimeBudget] = None, metrics: Optional[Metrics] = None
+    ) -> None:
+        metrics = metrics or Metrics({"Service": "worker"})
         if not task_message.is_valid():
-            raise ValueError("Invalid task message: missing required fields")
+            raise PermanentTaskError("Invalid task message: missing required fields")
 
-        task = self.task_repository.get_task(task_message)
-        if not task:
+        if budget and not budget.can_afford(WorkerConfig.TASK_BASE_COST_MS):
+            raise DeferredTaskError("Not enough time left in this invocation")
+
+        lease_seconds = budget.lease_seconds() if budget else WorkerConfig.TASK_LEASE_SECONDS
+        with metrics.span("claim"):
+            claim = self.task_repository.claim_task(task_message, lease_seconds)
+        if claim == ClaimResult.MISSING:
             Logger.info(f"Task not found: {task_message.user_pk}#{task_message.task_id} - skipping")
             return
+        if claim == ClaimResult.FINISHED:
+            Logger.info(f"Task {task_message.task_id} already processed - skipping")
+            return
+        if claim == ClaimResult.LEASED:
+            raise RetryableTaskError(f"Task {task_message.task_id} is leased by another delivery")
+
+        try:
+            self._process_claimed_task(task_message, budget, metrics)
+        except Exception as e:
+            # Hand the task back so a redelivery doesn't have to wait for the lease to expire.
+            if ErrorClassifier.is_retryable(e) and not isinstance(e, LeaseLostError):
+                self._release_claim(task_message)
+            raise
+
+    def _release_claim(self, task_message: TaskMessage) -> None:
+        try:
+            self.task_repository.release_task(task_message)
+        except Exception as e:
+            Logger.error(f"Failed to release task {task_message.task_id}: {e}")
+
+    def _process_claimed_task(self, task_message: TaskMessage, budget: Optional[TimeBudget], metrics: Metrics) -> None:
+        with metrics.span("head"):
+            head = self.file_processor.head_file(task_message.file_key)
+        pipeline = self.file_processor.select_pipeline(task_message.file_key, head)
+        profile = pipeline.profile if pipeline else ""
+        with metrics.span("stats_cache_get"):
+            cached_stats = self._get_cached_stats(head, profile)
+        if cached_stats is not None:
+            metrics.count("stats_cache_hits")
+            result_key = self._complete(task_message, cached_stats, metrics)
+            Logger.info(f"Task {task_message.task_id} completed from stats cache -> {result_key}")
+            return
 
-        if self.task_repository.is_task_already_processed(task):
-            Logger.info(f"Task {task_message.task_id} already processed (status={task.get('status')}) - skipping")
+        cost_ms = TaskCostEstimator.estimate_ms(head.get("ContentLength", 0), pipeline)
+        if TaskCostEstimator.is_oversized(cost_ms) and WorkerConfig.LARGE_TASK_QUEUE_URL:
+            self.task_repository.release_task(task_message)
+            self.task_queue.forward_to_large_queue(task_message)
+            metrics.count("tasks_forwarded")
+            Logger.info(f"Task {task_message.task_id} forwarded to large task queue (estimated {cost_ms} ms)")
             return
 
-        data = self.file_processor.download_file(task_message.file_key)
-        stats = self.file_processor.calculate_stats(data)
-        result_key = self.file_processor.save_result(task_message, stats)
-        
-        self.task_repository.mark_task_completed(task_message, result_key, stats)
+        if budget and not budget.can_afford(min(cost_ms, WorkerConfig.OVERSIZED_TASK_COST_MS)):
+            raise DeferredTaskError(f"Estimated {cost_ms} ms exceeds remaining time budget")
+
+        with metrics.span("calculate_stats"):
+            stats = self.file_processor.calculate_file_stats(
+                task_message.file_key, head, pipeline, task_message.lease_lost
+            )
+        metrics.add_bytes("bytes_processed", head.get("ContentLength", 0))
+        result_key = self._complete(task_message, stats, metrics)
         Logger.info(f"Task {task_message.task_id} completed -> {result_key}")
+        self._put_cached_stats(head, stats, profile)
+
+    def _complete(self, task_message: TaskMessage, stats: Dict[str, Any], metrics: Metrics) -> str:
+        with metrics.span("save_result"):
+            result_key = self.file_processor.save_result(task_message, stats)
+        with metrics.span("mark_completed"):
+            self.task_repository.mark_task_completed(task_message, result_key, stats)
+        return result_key
+
+    def _get_cached_stats(self, head: Dict[str, Any], profile: str) -> Optional[Dict[str, Any]]:
+        if not WorkerConfig.STATS_CACHE_ENABLED:
+            return None
+        try:
+            return self.stats_cache.get(head, profile)
+        except Exception as e:
+            Logger.error(f"Stats cache lookup failed: {e}")
+            return None
+
+    def _put_cached_stats(self, head: Dict[str, Any], stats: Dict[str, Any], profile: str) -> None:
+        if not WorkerConfig.STATS_CACHE_ENABLED:
+            return
+        try:
+            self.stats_cache.put(head, stats, profile)
+        except Exception as e:
+            Logger.error(f"Stats cache write failed: {e}")
 
 
 class WorkerHandler:
-    def __init__(self):
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(self, context: Any = None):
         self.task_processor = TaskProcessor()
+        self.budget = TimeBudget(context)
+        self.deferred_records: List[Dict[str, Any]] = []
 
-    def handle_records(self, records: List[Dict[str, Any]]) -> None:
-        for record in records:
-            self._process_record(record)
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        # Kept for the container lifetime so per-thread clients are reused across invocations.
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=WorkerConfig.MAX_CONCURRENCY,
+                thread_name_prefix="worker",
+            )
+        return cls._executor
+
+    def handle_records(self, records: List[Dict[str, Any]]) -> List[str]:
+        if WorkerConfig.MAX_CONCURRENCY > 1 and len(records) > 1:
+            results = list(self._get_executor().map(self.process_record, records))
+        else:
+            results = [self.process_record(record) for record in records]
+
+        if self.deferred_records:
+            Logger.info(f"Handing back {len(self.deferred_records)} deferred record(s)")
+            self.task_processor.task_queue.release_messages(self.deferred_records)
+
+        return [
+            record.get("messageId", "")
+            for record, succeeded in zip(records, results)
+            if not succeeded
+        ]
+
+    def process_record(self, record: Dict[str, Any]) -> bool:
+        """Processes one Lambda-shaped SQS record; returns False if the message should be redelivered."""
+        task_message = self.parse_record(record)
+        if task_message is None:
+            return True
+        return self.process_task_message(record, task_message)
 
-    def _process_record(self, record: Dict[str, Any]) -> None:
-        body = record.get("body", "{}")
+    @staticmethod
+    def parse_record(record: Dict[str, Any]) -> Optional[TaskMessage]:
+        """Returns None for a malformed body, which is dropped rather than redelivered."""
+        try:
+            message_data = json.loads(record.get("body") or "{}")
+        except (TypeError, ValueError) as e:
+            Logger.error(f"Dropping malformed message {record.get('messageId')}: {e}")
+            return None
+        if not isinstance(message_data, dict):
+            Logger.error(f"Dropping malformed message {record.get('messageId')}: body is not a JSON object")
+            return None
+        return TaskMessage(message_data)
+
+    def process_task_message(self, record: Dict[str, Any], task_message: TaskMessage) -> bool:
+        metrics = Metrics({"Service": "worker"})
+        metrics.set_property("task_id", task_message.task_id)
         try:
-            message_data = json.loads(body)
-            task_message = TaskMessage(message_data)
-            self.task_processor.process_task(task_message)
+            with metrics.span("task"):
+                profiler.run(
+                    f"task {task_message.task_id}",
+                    lambda: self.task_processor.process_task(task_message, self.budget, metrics),
+                )
+            metrics.count("tasks_processed")
+            return True
+        except DeferredTaskError as e:
+            if self._receive_count(record) >= WorkerConfig.MAX_RECEIVE_COUNT:
+                # Another release would send the message to the DLQ and leave the task PENDING.
+                self._hand_off_deferred(task_message, str(e), metrics)
+                return True
+            Logger.info(f"Task {task_message.task_id} deferred: {e}")
+            metrics.count("tasks_deferred")
+            self.deferred_records.append(record)
+            return False
+        except LeaseLostError as e:
+            # The delivery that took the lease over finishes the task. Returning False leaves this
+            # message to be redelivered after its visibility timeout: it retries while the task is
+            # still leased and is dropped once the task has finished.
+            Logger.info(f"Task {task_message.task_id} abandoned: {e}")
+            metrics.count("tasks_lease_lost")
+            return False
         except Exception as e:
-            Logger.error(f"Processing failed: {e}")
+            retryable = ErrorClassifier.is_retryable(e)
+            last_attempt = self._receive_count(record) >= WorkerConfig.MAX_RECEIVE_COUNT
+            Logger.error(f"Processing failed (retryable={retryable}, last_attempt={last_attempt}): {e}")
+            if not retryable or last_attempt:
+                metrics.count("tasks_failed")
+                self._mark_failed(task_message, str(e))
+            else:
+                metrics.count("tasks_retried")
+            return not retryable
+        finally:
+            metrics.flush()
+
+    def _hand_off_deferred(self, task_message: TaskMessage, reason: str, metrics: Metrics) -> None:
+        if WorkerConfig.LARGE_TASK_QUEUE_URL:
             try:
-                message_data = json.loads(body)
-                task_message = TaskMessage(message_data)
-                if task_message.task_id and task_message.user_pk:
-                    TaskRepository().mark_task_failed(task_message, str(e))
-            except Exception:
-                Logger.error("Failed to mark task as failed")
-
-
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, bool]:
-    worker_handler = WorkerHandler()
-    worker_handler.handle_records(event.get("Records", []))
-    return {"ok": True}
+                self.task_processor.task_queue.forward_to_large_queue(task_message)
+                metrics.count("tasks_forwarded")
+                Logger.info(f"Task {task_message.task_id} deferred on its last attempt - forwarded to large task queue")
+                return
+            except Exception as e:
+                Logger.error(f"Failed to forward deferred task {task_message.task_id}: {e}")
+
+        Logger.error(f"Task {task_message.task_id} deferred on its last attempt: {reason}")
+        metrics.count("tasks_failed")
+        self._mark_failed(task_message, f"Deferred on the last delivery attempt: {reason}")
+
+    def _receive_count(self, record: Dict[str, Any]) -> int:
+        try:
+            return int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+        except ValueError:
+            return 1
+
+    def _mark_failed(self, task_message: TaskMessage, error: str) -> None:
+        if task_message.task_id and task_message.user_pk:
+            self.task_processor.task_repository.mark_task_failed(task_message, error)
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    worker_handler = WorkerHandler(context)
+    failed_message_ids = worker_handler.handle_records(event.get("Records", []))
+    return {
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_message_ids]
+    }
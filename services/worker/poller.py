@@ -0,0 +1,271 @@
+"""Long-running SQS poller for running the worker outside Lambda.
+
+Files that take longer than the Lambda timeout can be processed on a container
+fleet instead. Records go through the same WorkerHandler / TaskProcessor code
+as the Lambda handler; this module only replaces the event source mapping:
+long polling, visibility and task lease extension, batched deletes and
+graceful shutdown.
+
+    POLLER_QUEUE_URL=https://sqs.eu-central-1.amazonaws.com/123456789012/taskflow-dev-tasks-large \\
+    TABLE_NAME=taskflow-dev-tasks BUCKET_NAME=taskflow-dev-files python services/worker/poller.py
+
+Concurrency comes from WORKER_CONCURRENCY, as in the Lambda handler.
+"""
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from handler import Logger, TaskMessage, TaskRepository, WorkerConfig, WorkerHandler, backends
+
+
+class PollerConfig:
+    QUEUE_URL = os.getenv("POLLER_QUEUE_URL")
+    WAIT_SECONDS = min(20, int(os.getenv("POLLER_WAIT_SECONDS", "20")))
+    VISIBILITY_TIMEOUT = int(os.getenv("POLLER_VISIBILITY_TIMEOUT", "120"))
+    TICK_SECONDS = float(os.getenv("POLLER_TICK_SECONDS", "1"))
+    ERROR_BACKOFF_SECONDS = float(os.getenv("POLLER_ERROR_BACKOFF_SECONDS", "5"))
+    SHUTDOWN_TIMEOUT = float(os.getenv("POLLER_SHUTDOWN_TIMEOUT", "25"))
+    # SQS limit for receive, delete and change-visibility batches.
+    BATCH_SIZE = 10
+
+
+class InFlightMessage:
+    def __init__(self, message: Dict[str, Any], task_message: Optional[TaskMessage], visible_at: float):
+        self.message = message
+        self.task_message = task_message
+        self.visible_at = visible_at
+
+
+class SqsPoller:
+    """Keeps up to ``concurrency`` messages in flight.
+
+    The main thread long-polls for as many messages as there are free worker
+    slots. A maintenance thread wakes every tick to delete finished messages in
+    batches and to push back the visibility timeout of messages whose tasks are
+    still running, so long tasks are never redelivered mid-processing. On the same
+    tick the task's DynamoDB lease is renewed, conditional on still owning it; if
+    another delivery has taken the task over, processing of ours is stopped.
+    Messages of failed, retryable tasks are left alone and reappear once their
+    current visibility timeout runs out.
+    """
+
+    def __init__(self, queue_url: str, concurrency: int = WorkerConfig.MAX_CONCURRENCY):
+        self.queue_url = queue_url
+        self.concurrency = concurrency
+        self.worker_handler = WorkerHandler()
+        self.task_repository = TaskRepository()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="poller")
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.stopping = threading.Event()
+        self.stop_requested_at: Optional[float] = None
+        self.in_flight: Dict[str, InFlightMessage] = {}
+        self.pending_deletes: List[str] = []
+        self._lock = threading.Lock()
+        self._maintenance_done = threading.Event()
+        self._maintenance: Optional[threading.Thread] = None
+
+    @property
+    def queue(self):
+        return backends.queue
+
+    def stop(self, *_: Any) -> None:
+        if not self.stopping.is_set():
+            Logger.info("Shutdown requested - finishing in-flight tasks")
+            self.stop_requested_at = time.monotonic()
+        self.stopping.set()
+
+    def run(self) -> bool:
+        """Polls until stop() is called; returns False if tasks were still running at exit."""
+        Logger.info(f"Polling {self.queue_url} with concurrency {self.concurrency}")
+        self._maintenance = threading.Thread(target=self._maintain, name="poller-maintenance", daemon=True)
+        self._maintenance.start()
+
+        while not self.stopping.is_set():
+            slots = self._acquire_slots()
+            if not slots:
+                continue
+            messages = self._receive(slots)
+            if messages and self.stopping.is_set():
+                self._release(messages)
+                messages = []
+            for message in messages:
+                self._submit(message)
+            for _ in range(slots - len(messages)):
+                self.slots.release()
+
+        return self._drain()
+
+    def _acquire_slots(self) -> int:
+        if not self.slots.acquire(timeout=PollerConfig.TICK_SECONDS):
+            return 0
+        slots = 1
+        while slots < PollerConfig.BATCH_SIZE and self.slots.acquire(blocking=False):
+            slots += 1
+        return slots
+
+    def _receive(self, max_messages: int) -> List[Dict[str, Any]]:
+        try:
+            return self.queue.receive(
+                self.queue_url, max_messages, PollerConfig.WAIT_SECONDS, PollerConfig.VISIBILITY_TIMEOUT
+            )
+        except Exception as e:
+            Logger.error(f"Failed to receive messages: {e}")
+            self.stopping.wait(PollerConfig.ERROR_BACKOFF_SECONDS)
+            return []
+
+    def _submit(self, message: Dict[str, Any]) -> None:
+        record = {
+            "messageId": message.get("MessageId", ""),
+            "receiptHandle": message["ReceiptHandle"],
+            "body": message.get("Body", "{}"),
+            "attributes": message.get("Attributes", {}),
+        }
+        task_message = self.worker_handler.parse_record(record)
+        with self._lock:
+            self.in_flight[message["ReceiptHandle"]] = InFlightMessage(
+                message, task_message, time.monotonic() + PollerConfig.VISIBILITY_TIMEOUT
+            )
+        self.executor.submit(self._process, record, task_message)
+
+    def _process(self, record: Dict[str, Any], task_message: Optional[TaskMessage]) -> None:
+        handle = record["receiptHandle"]
+        succeeded = task_message is None
+        try:
+            if task_message is not None:
+                succeeded = self.worker_handler.process_task_message(record, task_message)
+        except Exception as e:
+            Logger.error(f"Unhandled error for message {record['messageId']}: {e}")
+        finally:
+            with self._lock:
+                self.in_flight.pop(handle, None)
+                if succeeded:
+                    self.pending_deletes.append(handle)
+            self.slots.release()
+
+    def _maintain(self) -> None:
+        while not self._maintenance_done.wait(PollerConfig.TICK_SECONDS):
+            self._flush_deletes()
+            self._extend_visibility()
+
+    def _flush_deletes(self) -> None:
+        with self._lock:
+            handles, self.pending_deletes = self.pending_deletes, []
+        for start in range(0, len(handles), PollerConfig.BATCH_SIZE):
+            entries = [
+                {"Id": str(i), "ReceiptHandle": handle}
+                for i, handle in enumerate(handles[start:start + PollerConfig.BATCH_SIZE])
+            ]
+            try:
+                # A message that fails to delete is redelivered and skipped as already processed.
+                for failure in self.queue.delete_batch(self.queue_url, entries):
+                    Logger.error(f"Failed to delete message: {failure.get('Message')}")
+            except Exception as e:
+                Logger.error(f"Failed to delete messages: {e}")
+
+    def _extend_visibility(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                handle for handle, in_flight in self.in_flight.items()
+                if in_flight.visible_at - now <= PollerConfig.VISIBILITY_TIMEOUT / 2
+            ]
+            for handle in due:
+                self.in_flight[handle].visible_at = now + PollerConfig.VISIBILITY_TIMEOUT
+            leases = [(handle, self.in_flight[handle].task_message) for handle in due]
+
+        for handle, task_message in leases:
+            self._renew_lease(handle, task_message)
+
+        for start in range(0, len(due), PollerConfig.BATCH_SIZE):
+            batch = due[start:start + PollerConfig.BATCH_SIZE]
+            entries = [
+                {"Id": str(i), "ReceiptHandle": handle, "VisibilityTimeout": PollerConfig.VISIBILITY_TIMEOUT}
+                for i, handle in enumerate(batch)
+            ]
+            try:
+                failures = self.queue.change_visibility_batch(self.queue_url, entries)
+            except Exception as e:
+                Logger.error(f"Failed to extend message visibility: {e}")
+                continue
+            for failure in failures:
+                # Messages finished since the snapshot have been deleted; only report live ones.
+                with self._lock:
+                    still_running = batch[int(failure["Id"])] in self.in_flight
+                if still_running:
+                    Logger.error(f"Failed to extend message visibility: {failure.get('Message')}")
+
+    def _renew_lease(self, handle: str, task_message: Optional[TaskMessage]) -> None:
+        # Not claimed yet (or malformed): there is no lease to renew.
+        if task_message is None or not task_message.lease_owner:
+            return
+        try:
+            if self.task_repository.renew_lease(task_message, WorkerConfig.TASK_LEASE_SECONDS):
+                return
+        except Exception as e:
+            # Transient errors are retried on the next tick; the lease has time left until then.
+            Logger.error(f"Failed to renew lease of task {task_message.task_id}: {e}")
+            return
+
+        # Tasks finished since the snapshot no longer hold a lease either; only stop live ones.
+        with self._lock:
+            still_running = handle in self.in_flight
+        if still_running:
+            Logger.error(f"Task {task_message.task_id} lease taken over by another delivery - stopping")
+            task_message.lease_lost.set()
+
+    def _release(self, messages: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(messages), PollerConfig.BATCH_SIZE):
+            entries = [
+                {"Id": str(i), "ReceiptHandle": message["ReceiptHandle"], "VisibilityTimeout": 0}
+                for i, message in enumerate(messages[start:start + PollerConfig.BATCH_SIZE])
+            ]
+            try:
+                self.queue.change_visibility_batch(self.queue_url, entries)
+            except Exception as e:
+                Logger.error(f"Failed to release messages: {e}")
+
+    def _drain(self) -> bool:
+        # Counted from the stop request: a long poll still waiting when it came (up to
+        # WAIT_SECONDS) can't be cancelled, and must not push the exit past the
+        # orchestrator's kill timeout.
+        deadline = (self.stop_requested_at or time.monotonic()) + PollerConfig.SHUTDOWN_TIMEOUT
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self.in_flight:
+                    break
+            time.sleep(0.1)
+
+        self._maintenance_done.set()
+        self._maintenance.join()
+        self._flush_deletes()
+        with self._lock:
+            remaining = len(self.in_flight)
+        if remaining:
+            Logger.error(f"Shutdown timeout reached with {remaining} task(s) still running")
+            return False
+        self.executor.shutdown()
+        Logger.info("Poller stopped")
+        return True
+
+
+def main() -> None:
+    if not PollerConfig.QUEUE_URL or not WorkerConfig.BUCKET_NAME:
+        raise SystemExit("POLLER_QUEUE_URL and BUCKET_NAME must be set")
+
+    # Without an invocation timeout there is no reason to forward large tasks anywhere else.
+    WorkerConfig.LARGE_TASK_QUEUE_URL = None
+
+    poller = SqsPoller(PollerConfig.QUEUE_URL)
+    signal.signal(signal.SIGTERM, poller.stop)
+    signal.signal(signal.SIGINT, poller.stop)
+    if not poller.run():
+        # Worker threads cannot be interrupted. Exit now rather than be killed mid-write; the
+        # messages reappear after their visibility timeout and the task lease guards the retry.
+        os._exit(1)
+
+
+if __name__ == "__main__":
+    main()
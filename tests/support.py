@@ -0,0 +1,42 @@
+"""Loads the service handlers against in-memory backends for the unit tests."""
+import importlib.util
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_handler(name: str, service: str, **env: str):
+    """Imports services/<service>/handler.py as a fresh module; config is read from env at import time."""
+    os.environ.update({
+        "STORAGE_BACKEND": "memory",
+        "BUCKET_NAME": "test-bucket",
+        "METRICS_SINK": "memory",
+        "ADMISSION_ENABLED": "false",
+        "STATS_CACHE_ENABLED": "false",
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "eu-central-1"),
+        **env,
+    })
+    try:
+        spec = importlib.util.spec_from_file_location(name, ROOT / "services" / service / "handler.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        for key in env:
+            os.environ.pop(key, None)
+    return module
+
+
+def api_event(method: str, path: str, sub: str = "test-user", body: Any = None, query: str = "") -> Dict[str, Any]:
+    return {
+        "rawPath": path,
+        "rawQueryString": query,
+        "requestContext": {"http": {"method": method}, "authorizer": {"jwt": {"claims": {"sub": sub}}}},
+        "body": json.dumps(body) if body is not None else None,
+    }
+
+
+def sqs_record(message_id: str, body: str, receive_count: int = 1) -> Dict[str, Any]:
+    return {"messageId": message_id, "body": body, "attributes": {"ApproximateReceiveCount": str(receive_count)}}
@@ -0,0 +1,71 @@
+"""Task-creation admission: bursts, idempotent retries and partially admitted batches."""
+import json
+import unittest
+
+from support import api_event, load_handler
+
+BURST = 3
+
+
+class AdmissionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # One shard, no leased tokens and a bucket that refills about once per 15 minutes:
+        # every admission is counted exactly against BURST.
+        cls.api = load_handler(
+            "api_admission", "api",
+            ADMISSION_ENABLED="true",
+            ADMISSION_BURST=str(BURST),
+            ADMISSION_RATE_PER_SECOND="0.001",
+            ADMISSION_SHARDS="1",
+            ADMISSION_LEASE_TOKENS="0",
+        )
+
+    def setUp(self):
+        self.sub = f"admission-{self.id().rsplit('.', 1)[-1]}"
+
+    def create(self, **body):
+        return self.api.handler(api_event("POST", "/tasks", self.sub, {"file_key": f"uploads/{self.sub}/a.txt", **body}), None)
+
+    def create_batch(self, names):
+        tasks = [{"file_key": f"uploads/{self.sub}/{name}.txt", "client_token": name} for name in names]
+        response = self.api.handler(api_event("POST", "/tasks/batch", self.sub, {"tasks": tasks}), None)
+        self.assertEqual(response["statusCode"], 200, response["body"])
+        return json.loads(response["body"])
+
+    def test_burst_is_throttled(self):
+        for _ in range(BURST):
+            self.assertEqual(self.create()["statusCode"], 201)
+        response = self.create()
+        self.assertEqual(response["statusCode"], 429)
+        self.assertGreaterEqual(int(response["headers"]["Retry-After"]), 1)
+
+    def test_client_token_retry_is_not_charged(self):
+        self.assertEqual(self.create(client_token="retry-me")["statusCode"], 201)
+        for _ in range(BURST):
+            response = self.create(client_token="retry-me")
+            self.assertEqual(response["statusCode"], 200)
+            self.assertTrue(json.loads(response["body"])["idem"])
+
+        for _ in range(BURST - 1):
+            self.assertEqual(self.create()["statusCode"], 201)
+        self.assertEqual(self.create()["statusCode"], 429)
+        # Once the bucket is empty, retries are still answered with the existing task.
+        self.assertEqual(self.create(client_token="retry-me")["statusCode"], 200)
+
+    def test_batch_is_charged_for_admitted_items_only(self):
+        first = self.create_batch(["a", "b"])
+        self.assertEqual((first["created"], first["throttled"]), (2, 0))
+
+        second = self.create_batch(["a", "b", "c", "d"])
+        statuses = {item["file_key"].rsplit("/", 1)[-1]: item["status"] for item in second["items"]}
+        self.assertEqual(statuses, {"a.txt": "existing", "b.txt": "existing", "c.txt": "created", "d.txt": "throttled"})
+        self.assertGreaterEqual(second["retry_after"], 1)
+
+        third = self.create_batch(["a", "b", "c", "d"])
+        self.assertEqual((third["existing"], third["created"], third["throttled"]), (3, 0, 1))
+        self.assertEqual(self.create()["statusCode"], 429)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""POST /tasks/export against the in-memory backends.
+
+    python -m pytest tests
+"""
+import gzip
+import importlib.util
+import json
+import os
+import unittest
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_api():
+    os.environ.update({
+        "STORAGE_BACKEND": "memory",
+        "BUCKET_NAME": "test-bucket",
+        "METRICS_SINK": "memory",
+        "ADMISSION_ENABLED": "false",
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "eu-central-1"),
+    })
+    spec = importlib.util.spec_from_file_location("api_handler", ROOT / "services" / "api" / "handler.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def api_event(method: str, path: str, body: Any = None) -> Dict[str, Any]:
+    return {
+        "rawPath": path,
+        "rawQueryString": "",
+        "requestContext": {"http": {"method": method}, "authorizer": {"jwt": {"claims": {"sub": "export-user"}}}},
+        "body": json.dumps(body) if body is not None else None,
+    }
+
+
+class ExportFieldsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.api = load_api()
+        for i in range(3):
+            resp = cls.api.handler(api_event("POST", "/tasks", {"file_key": f"uploads/export-user/{i}.txt"}), None)
+            assert resp["statusCode"] == 201, resp
+
+    def export(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self.api.handler(api_event("POST", "/tasks/export", body), None)
+
+    def exported_rows(self, resp: Dict[str, Any]):
+        key = json.loads(resp["body"])["export_key"]
+        data = gzip.decompress(self.api.backends.objects.objects[key])
+        return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+    def test_fields_as_list(self):
+        resp = self.export({"fields": ["status"]})
+        self.assertEqual(resp["statusCode"], 201, resp["body"])
+        rows = self.exported_rows(resp)
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(set(row) == {"sk", "task_id", "created_at", "status"} for row in rows))
+
+    def test_fields_as_string(self):
+        resp = self.export({"fields": "status,file_key"})
+        self.assertEqual(resp["statusCode"], 201, resp["body"])
+        self.assertIn("file_key", self.exported_rows(resp)[0])
+
+    def test_invalid_fields(self):
+        for fields in ({"status": True}, 5, ["status", 1], ["nope"]):
+            with self.subTest(fields=fields):
+                self.assertEqual(self.export({"fields": fields})["statusCode"], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Route matching for the API handler's route table."""
+import unittest
+
+from support import api_event, load_handler
+
+CASES = [
+    # method, rawPath, stage, route name, path params, Allow header
+    ("GET", "/tasks", None, "GET /tasks", {}, None),
+    ("POST", "/tasks", None, "POST /tasks", {}, None),
+    ("GET", "/tasks/", None, "GET /tasks", {}, None),
+    ("GET", "/tasks/AbC-123", None, "GET /tasks/{id}", {"id": "AbC-123"}, None),
+    ("POST", "/tasks/batch", None, "POST /tasks/batch", {}, None),
+    ("GET", "/tasks/batch", None, "GET /tasks/{id}", {"id": "batch"}, None),
+    ("get", "/me/usage", None, "GET /me/usage", {}, None),
+    ("DELETE", "/tasks", None, "method_not_allowed", {}, "GET, POST"),
+    ("DELETE", "/tasks/AbC-123", None, "method_not_allowed", {}, "GET"),
+    ("GET", "/files/presign", None, "method_not_allowed", {}, "POST"),
+    ("GET", "/tasks/a/b", None, "unmatched", {}, None),
+    ("GET", "/nope", None, "unmatched", {}, None),
+    ("GET", "/prod/tasks/t1", "prod", "GET /tasks/{id}", {"id": "t1"}, None),
+    ("GET", "/prod", "prod", "unmatched", {}, None),
+    ("GET", "/production/tasks", "prod", "unmatched", {}, None),
+    ("GET", "/tasks", "$default", "GET /tasks", {}, None),
+    ("PUT", "/prod/me", "prod", "method_not_allowed", {}, "GET"),
+]
+
+
+class RouterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.api = load_handler("api_router", "api")
+
+    def event(self, method: str, path: str, stage=None):
+        event = api_event(method, path)
+        if stage:
+            event["requestContext"]["stage"] = stage
+        return event
+
+    def test_match(self):
+        for method, path, stage, name, params, allow in CASES:
+            with self.subTest(method=method, path=path, stage=stage):
+                match = self.api.router.match(self.event(method, path, stage))
+                self.assertEqual(match.name, name)
+                self.assertEqual(match.params, params)
+                self.assertEqual(", ".join(match.allowed) or None, allow)
+
+    def test_status_codes(self):
+        for method, path, stage, name, params, allow in CASES:
+            if name not in ("method_not_allowed", "unmatched"):
+                continue
+            with self.subTest(method=method, path=path, stage=stage):
+                response = self.api.handler(self.event(method, path, stage), None)
+                self.assertEqual(response["statusCode"], 405 if allow else 404)
+                self.assertEqual(response["headers"].get("Allow"), allow)
+
+    def test_route_key_wins(self):
+        event = {**self.event("GET", "/ignored"), "routeKey": "GET /tasks/{id}", "pathParameters": {"id": "t9"}}
+        match = self.api.router.match(event)
+        self.assertEqual((match.name, match.params), ("GET /tasks/{id}", {"id": "t9"}))
+
+    def test_duplicate_route_is_rejected(self):
+        Route, Router = self.api.Route, self.api.Router
+        with self.assertRaises(ValueError):
+            Router([Route("GET", "/a/{x}", lambda e, p: {}), Route("GET", "/a/{x}", lambda e, p: {})])
+
+
+if __name__ == "__main__":
+    unittest.main()
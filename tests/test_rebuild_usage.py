@@ -0,0 +1,106 @@
+"""Planning and retrying of tools/rebuild_usage.py, without DynamoDB."""
+import contextlib
+import importlib.util
+import io
+import unittest
+
+from support import ROOT
+
+spec = importlib.util.spec_from_file_location("rebuild_usage", ROOT / "tools" / "rebuild_usage.py")
+rebuild_usage = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rebuild_usage)
+
+USER_PK = "tenant_default#u"
+
+
+def counters(**values):
+    return {name: values.get(name, 0) for name in rebuild_usage.COUNTERS}
+
+
+class PlanUserTest(unittest.TestCase):
+    def test_days_before_since_are_kept(self):
+        existing = {"day#2024-01-01": counters(tasks_created=5), "day#2024-01-09": counters(tasks_created=1)}
+        recounted = {"2024-01-01": counters(tasks_created=2), "2024-01-09": counters(tasks_created=3)}
+        puts, deletes, total = rebuild_usage.plan_user(recounted, existing, "2024-01-05")
+        self.assertEqual(puts, {"day#2024-01-09": counters(tasks_created=3)})
+        self.assertEqual(deletes, [])
+        self.assertEqual(total, counters(tasks_created=8))
+
+    def test_recounted_days_are_replaced_and_vanished_days_deleted(self):
+        existing = {
+            "day#2024-01-06": counters(tasks_created=9, tasks_done=9),
+            "day#2024-01-07": counters(tasks_failed=1),
+        }
+        recounted = {"2024-01-06": counters(tasks_created=2, tasks_done=1, bytes_processed=10), "2024-01-08": counters(tasks_created=1)}
+        puts, deletes, total = rebuild_usage.plan_user(recounted, existing, "2024-01-05")
+        self.assertEqual(set(puts), {"day#2024-01-06", "day#2024-01-08"})
+        self.assertEqual(deletes, ["day#2024-01-07"])
+        self.assertEqual(total, counters(tasks_created=3, tasks_done=1, bytes_processed=10))
+
+    def test_partial_existing_counters_count_as_zero(self):
+        _, _, total = rebuild_usage.plan_user({}, {"day#2024-01-01": {"tasks_done": 2}}, "2024-01-05")
+        self.assertEqual(total, counters(tasks_done=2))
+        self.assertTrue(rebuild_usage.same({"tasks_done": 2}, total))
+        self.assertFalse(rebuild_usage.same(None, counters()))
+
+    def test_aggregate_counts_task_transitions(self):
+        tasks = [
+            {"pk": USER_PK, "task_id": "a", "status": "DONE", "created_at": "2024-01-06T23:59:00",
+             "processed_at": "2024-01-07T00:01:00", "stats": {"byte_count": 10, "line_count": 2}},
+            {"pk": USER_PK, "task_id": "b", "status": "FAILED", "created_at": "2024-01-07T10:00:00", "processed_at": "2024-01-07T10:01:00"},
+            {"pk": f"usage#{USER_PK}", "sk": "total"},
+        ]
+        self.assertEqual(rebuild_usage.aggregate(tasks), {USER_PK: {
+            "2024-01-06": counters(tasks_created=1),
+            "2024-01-07": counters(tasks_created=1, tasks_done=1, tasks_failed=1, bytes_processed=10, lines_processed=2),
+        }})
+
+
+class FakeUsageTable(rebuild_usage.UsageTable):
+    """Serves fixed tasks; the first ``conflicts`` writes fail as if an increment landed meanwhile."""
+
+    def __init__(self, tasks, usage, conflicts=0):
+        super().__init__(None)
+        self.tasks, self.usage, self.conflicts = tasks, usage, conflicts
+        self.reads = 0
+
+    def query_tasks(self, user_pk):
+        return iter(self.tasks)
+
+    def usage_items(self, user_pk):
+        self.reads += 1
+        return {sk: dict(values) for sk, values in self.usage.items()}
+
+    def write(self, user_pk, puts, deletes, total, read):
+        if self.conflicts:
+            self.conflicts -= 1
+            return False
+        self.usage.update(puts)
+        for sk in deletes:
+            self.usage.pop(sk)
+        self.usage["total"] = total
+        return True
+
+
+class RebuildTest(unittest.TestCase):
+    tasks = [{"pk": USER_PK, "task_id": "a", "status": "PENDING", "created_at": "2024-01-06T10:00:00"}]
+
+    def rebuild(self, table, attempts=3):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            rebuild_usage.rebuild(table, [USER_PK], "2024-01-05", dry_run=False, attempts=attempts)
+
+    def test_conflicting_write_is_recounted(self):
+        table = FakeUsageTable(self.tasks, {"total": counters(tasks_created=7)}, conflicts=1)
+        self.rebuild(table)
+        self.assertEqual(table.reads, 2)
+        self.assertEqual(table.usage["total"], counters(tasks_created=1))
+
+    def test_gives_up_after_attempts(self):
+        table = FakeUsageTable(self.tasks, {"total": counters(tasks_created=7)}, conflicts=5)
+        self.rebuild(table, attempts=2)
+        self.assertEqual(table.reads, 2)
+        self.assertEqual(table.usage["total"], counters(tasks_created=7))
+
+
+if __name__ == "__main__":
+    unittest.main()
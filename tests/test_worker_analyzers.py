@@ -0,0 +1,68 @@
+"""Analysis pipelines fed chunk by chunk: decoders, record splitting and the summary cap."""
+import gzip
+import json
+import unittest
+
+from support import load_handler
+
+CSV = b"id,name,score\n" + b"".join(b'%d,"name\n%d",%d\n' % (i, i, i % 7) for i in range(2000))
+
+
+def chunks(data: bytes, size: int):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class AnalysisPipelineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.worker = load_handler("worker_analyzers", "worker", STREAM_CHUNK_SIZE="4096", ANALYZER_MAX_SUMMARY_BYTES="4096")
+
+    def analyze(self, file_key: str, parts):
+        pipeline = self.worker.analyzer_registry.select(file_key, {})
+        for part in parts:
+            pipeline.feed(part)
+        return pipeline.result()["analyzers"]
+
+    def test_csv_rows_straddling_chunks(self):
+        expected = self.analyze("a.csv", [CSV])["csv"]
+        self.assertEqual((expected["row_count"], expected["ragged_rows"]), (2000, 0))
+        for size in (1, 5, 13, 4096):
+            with self.subTest(size=size):
+                self.assertEqual(self.analyze("a.csv", chunks(CSV, size))["csv"], expected)
+
+    def test_gzip_members_split_across_chunks(self):
+        half = len(CSV) // 2
+        data = gzip.compress(CSV[:half]) + gzip.compress(CSV[half:])
+        expected = self.analyze("a.csv", [CSV])["csv"]
+        for size in (7, 1000, len(data)):
+            with self.subTest(size=size):
+                self.assertEqual(self.analyze("a.csv.gz", chunks(data, size))["csv"], expected)
+
+    def test_truncated_gzip_is_reported(self):
+        data = gzip.compress(CSV)
+        for cut in (10, len(data) // 2, len(data) - 4):
+            with self.subTest(cut=cut):
+                result = self.analyze("a.csv.gz", chunks(data[:cut], 1000))["csv"]
+                self.assertIn("truncated", result["error"])
+
+    def test_summary_over_cap_is_shrunk(self):
+        header = ",".join(f"column_with_a_long_name_{i}" for i in range(200)).encode()
+        row = ",".join(str(i) for i in range(200)).encode()
+        result = self.analyze("wide.csv", [header + b"\n" + row + b"\n"])["csv"]
+        self.assertLessEqual(len(json.dumps(result)), 4096)
+        self.assertTrue(result["columns_truncated"])
+        self.assertEqual((result["row_count"], result["column_count"]), (1, 200))
+
+    def test_zstd_frames_split_across_chunks(self):
+        zstandard = self.worker.zstandard
+        if zstandard is None:
+            self.skipTest("zstandard is not installed")
+        compressor = zstandard.ZstdCompressor()
+        half = len(CSV) // 2
+        data = compressor.compress(CSV[:half]) + compressor.compress(CSV[half:])
+        expected = self.analyze("a.csv", [CSV])["csv"]
+        self.assertEqual(self.analyze("a.csv.zst", chunks(data, 7))["csv"], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Task leases: claims, takeovers of expired leases and writes by stale owners."""
+import itertools
+import unittest
+
+from support import load_handler
+
+USER_PK = "tenant_default#lease-user"
+
+
+class TaskLeaseTest(unittest.TestCase):
+    task_ids = itertools.count()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.worker = load_handler("worker_leases", "worker")
+        cls.repository = cls.worker.TaskRepository()
+
+    def setUp(self):
+        self.task_id = f"task-{next(self.task_ids)}"
+        self.worker.backends.tasks.put_item({"pk": USER_PK, "sk": self.task_id, "status": "PENDING"})
+
+    def message(self):
+        return self.worker.TaskMessage({"task_id": self.task_id, "user_pk": USER_PK, "file_key": "uploads/lease-user/a.txt"})
+
+    def item(self):
+        return self.worker.backends.tasks.get_item({"pk": USER_PK, "sk": self.task_id})
+
+    def test_double_claim_is_rejected(self):
+        first, second = self.message(), self.message()
+        self.assertEqual(self.repository.claim_task(first, 60), self.worker.ClaimResult.CLAIMED)
+        self.assertEqual(self.repository.claim_task(second, 60), self.worker.ClaimResult.LEASED)
+        self.assertIsNone(second.lease_owner)
+        self.assertEqual(self.item()["lease_owner"], first.lease_owner)
+
+    def test_expired_lease_is_taken_over(self):
+        stale, fresh = self.message(), self.message()
+        self.assertEqual(self.repository.claim_task(stale, -1), self.worker.ClaimResult.CLAIMED)
+        self.assertEqual(self.repository.claim_task(fresh, 60), self.worker.ClaimResult.CLAIMED)
+        self.assertNotEqual(fresh.lease_owner, stale.lease_owner)
+        self.assertEqual(self.item()["lease_owner"], fresh.lease_owner)
+
+    def test_stale_owner_cannot_renew_or_finish(self):
+        stale, fresh = self.message(), self.message()
+        self.repository.claim_task(stale, -1)
+        self.repository.claim_task(fresh, 60)
+
+        self.assertFalse(self.repository.renew_lease(stale, 60))
+        self.repository.mark_task_completed(stale, "results/stale.json", {"byte_count": 1, "line_count": 1})
+        self.repository.mark_task_failed(stale, "stale failure")
+        item = self.item()
+        self.assertEqual((item["status"], item["lease_owner"]), ("PROCESSING", fresh.lease_owner))
+
+        self.assertTrue(self.repository.renew_lease(fresh, 60))
+        self.repository.mark_task_completed(fresh, "results/fresh.json", {"byte_count": 1, "line_count": 1})
+        item = self.item()
+        self.assertEqual((item["status"], item["result_key"]), ("DONE", "results/fresh.json"))
+        self.assertNotIn("lease_owner", item)
+
+    def test_finished_task_cannot_be_claimed(self):
+        owner = self.message()
+        self.repository.claim_task(owner, 60)
+        self.repository.mark_task_completed(owner, "results/a.json", {"byte_count": 1, "line_count": 1})
+        self.assertEqual(self.repository.claim_task(self.message(), 60), self.worker.ClaimResult.FINISHED)
+        self.assertFalse(self.repository.renew_lease(owner, 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""LineCounter agrees with str.splitlines on both its small-input and scanning paths."""
+import random
+import unittest
+
+from support import load_handler
+
+SAMPLES = [b"a", b"\n", b"\r", b"\r\n", b"\x0b", b"\x1e", "\u0085".encode(), " ".encode(), b"\xe2\x80", b"\xff", "й".encode()]
+
+
+class LineCounterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.counter = load_handler("worker_line_count", "worker").LineCounter
+
+    def test_small_path_matches_scan(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            data = b"".join(rng.choice(SAMPLES) for _ in range(rng.randint(0, 30)))
+            with self.subTest(data=data):
+                self.assertEqual(self.counter._count_small(data), self.scan(data))
+
+    def test_valid_utf8_matches_splitlines(self):
+        text = "a\r\nb\rc\nd e\u0085f\x0cg"
+        for data in (text.encode(), (text * 1000).encode()):
+            boundaries = len(data.decode().splitlines()) - 1
+            self.assertEqual(self.counter.count(data), boundaries)
+
+    def scan(self, data: bytes) -> int:
+        threshold, self.counter.SMALL_INPUT_BYTES = self.counter.SMALL_INPUT_BYTES, 0
+        try:
+            return self.counter.count(data)
+        finally:
+            self.counter.SMALL_INPUT_BYTES = threshold
+
+
+if __name__ == "__main__":
+    unittest.main()
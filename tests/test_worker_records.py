@@ -0,0 +1,35 @@
+"""Per-record outcomes of the worker's SQS handler."""
+import json
+import unittest
+
+from support import load_handler, sqs_record
+
+
+class MalformedRecordTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.worker = load_handler("worker_records", "worker")
+        cls.worker.backends.objects.put("uploads/u/a.txt", b"one\ntwo\n", "text/plain")
+        cls.worker.backends.tasks.put_item({"pk": "tenant_default#u", "sk": "t1", "status": "PENDING"})
+
+    def test_non_object_bodies_are_dropped(self):
+        for body in ("not json", "null", "[]", "123", '"text"', ""):
+            with self.subTest(body=body):
+                result = self.worker.handler({"Records": [sqs_record("m1", body)]}, None)
+                self.assertEqual(result["batchItemFailures"], [])
+
+    def test_malformed_record_does_not_fail_the_batch(self):
+        good = json.dumps({"task_id": "t1", "user_pk": "tenant_default#u", "file_key": "uploads/u/a.txt"})
+        records = [sqs_record("bad", "[]"), sqs_record("good", good), sqs_record("null", "null")]
+        result = self.worker.handler({"Records": records}, None)
+        self.assertEqual(result["batchItemFailures"], [])
+        self.assertEqual(self.worker.backends.tasks.get_item({"pk": "tenant_default#u", "sk": "t1"})["status"], "DONE")
+
+    def test_parse_record(self):
+        self.assertIsNone(self.worker.WorkerHandler.parse_record(sqs_record("m", "[1, 2]")))
+        message = self.worker.WorkerHandler.parse_record(sqs_record("m", '{"task_id": "t9"}'))
+        self.assertEqual(message.task_id, "t9")
+
+
+if __name__ == "__main__":
+    unittest.main()
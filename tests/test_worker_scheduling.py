@@ -0,0 +1,43 @@
+"""Cost estimates and the large-queue / defer decisions they drive."""
+import json
+import unittest
+
+from support import load_handler, sqs_record
+
+MB = 1024 * 1024
+
+
+class CostEstimateTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.worker = load_handler(
+            "worker_scheduling", "worker", LARGE_TASK_QUEUE_URL="large", OVERSIZED_TASK_COST_MS="1000"
+        )
+
+    def estimate(self, file_key: str, size: int) -> int:
+        pipeline = self.worker.analyzer_registry.select(file_key, {})
+        return self.worker.TaskCostEstimator.estimate_ms(size, pipeline)
+
+    def test_analyzed_and_compressed_files_cost_more(self):
+        plain, csv, gzipped = self.estimate("a.txt", 64 * MB), self.estimate("a.csv", 64 * MB), self.estimate("a.csv.gz", 64 * MB)
+        self.assertEqual(plain, self.worker.WorkerConfig.TASK_BASE_COST_MS + 64 * MB // (20 * 1024))
+        self.assertGreater(csv, 2 * plain)
+        self.assertGreater(gzipped, csv)
+
+    def test_analyzed_task_is_forwarded_when_plain_is_not(self):
+        worker = self.worker
+        data = b"a,b\n" + b"1,2\n" * (MB - 1)
+        for task_id, file_key in (("plain", "uploads/u/f.txt"), ("csv", "uploads/u/f.csv")):
+            worker.backends.objects.put(file_key, data, "text/plain")
+            worker.backends.tasks.put_item({"pk": "tenant_default#u", "sk": task_id, "status": "PENDING"})
+            body = json.dumps({"task_id": task_id, "user_pk": "tenant_default#u", "file_key": file_key})
+            self.assertEqual(worker.handler({"Records": [sqs_record(task_id, body)]}, None)["batchItemFailures"], [])
+
+        status = {sk: worker.backends.tasks.get_item({"pk": "tenant_default#u", "sk": sk})["status"] for sk in ("plain", "csv")}
+        self.assertEqual(status, {"plain": "DONE", "csv": "PENDING"})
+        forwarded = [json.loads(body)["task_id"] for body in worker.backends.queue.messages.get("large", [])]
+        self.assertEqual(forwarded, ["csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""Recompute the per-user usage aggregates from the tasks table.
+
+The API and the worker keep ``usage#<pk>`` items (sk ``total`` and one
+``day#YYYY-MM-DD`` per UTC day) current with atomic ADD updates. An increment
+can be lost if a process dies right after the task write it counts; this tool
+repairs such drift.
+
+Tasks expire after --ttl-days, so only recent days can be recounted: day items
+from --since onwards are rewritten from the tasks, older day items are kept as
+they are, and ``total`` is set to the sum of all day items. Each usage item is
+only rewritten if its counters still hold the values read before the recount,
+so an increment that lands meanwhile is not overwritten: the user is recounted
+and written again (up to --attempts times). A transition whose task write the
+recount already sees but whose increment lands after the rebuild's write is
+still counted twice; that window is the few milliseconds between the two writes.
+
+    python tools/rebuild_usage.py --user-pk tenant_default#<sub> --dry-run
+    python tools/rebuild_usage.py --all
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import boto3
+from boto3.dynamodb.conditions import Attr, ConditionBase
+
+COUNTERS = ["tasks_created", "tasks_done", "tasks_failed", "bytes_processed", "lines_processed"]
+TASK_ATTRIBUTES = ["pk", "task_id", "status", "created_at", "processed_at", "stats"]
+
+Counters = Dict[str, int]
+
+
+def task_counters(task: Dict[str, Any]) -> List[Tuple[str, Counters]]:
+    """The (day, counters) contributions of one task, as the API and worker count them."""
+    contributions = []
+    if task.get("created_at"):
+        contributions.append((task["created_at"][:10], {"tasks_created": 1}))
+
+    processed_at = task.get("processed_at")
+    if processed_at and task.get("status") == "DONE":
+        stats = task.get("stats") or {}
+        contributions.append((processed_at[:10], {
+            "tasks_done": 1,
+            "bytes_processed": int(stats.get("byte_count", 0)),
+            "lines_processed": int(stats.get("line_count", 0)),
+        }))
+    elif processed_at and task.get("status") == "FAILED":
+        contributions.append((processed_at[:10], {"tasks_failed": 1}))
+    return contributions
+
+
+def aggregate(tasks: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Counters]]:
+    """Per user pk, per day counters over task items; other items are skipped."""
+    usage: Dict[str, Dict[str, Counters]] = {}
+    for task in tasks:
+        if not task.get("task_id") or not str(task.get("pk", "")).startswith("tenant_"):
+            continue
+        days = usage.setdefault(task["pk"], {})
+        for day, counters in task_counters(task):
+            totals = days.setdefault(day, dict.fromkeys(COUNTERS, 0))
+            for name, value in counters.items():
+                totals[name] += value
+    return usage
+
+
+def plan_user(
+    recounted: Dict[str, Counters], existing: Dict[str, Counters], since: str
+) -> Tuple[Dict[str, Counters], List[str], Counters]:
+    """Returns the day items to write, the day sort keys to delete and the new total."""
+    puts: Dict[str, Counters] = {}
+    deletes: List[str] = []
+    days: Dict[str, Counters] = {}
+    for sk, counters in existing.items():
+        if sk[len("day#"):] < since:
+            days[sk] = counters
+        elif sk[len("day#"):] not in recounted:
+            deletes.append(sk)
+    for day, counters in recounted.items():
+        if day >= since:
+            days[f"day#{day}"] = puts[f"day#{day}"] = counters
+
+    total = dict.fromkeys(COUNTERS, 0)
+    for counters in days.values():
+        for name in COUNTERS:
+            total[name] += int(counters.get(name, 0))
+    return puts, deletes, total
+
+
+def same(read: Optional[Counters], counters: Counters) -> bool:
+    """Whether an item read with ``read`` (None if absent) already holds ``counters``; missing counters are 0."""
+    return read is not None and all(read.get(name, 0) == counters.get(name, 0) for name in COUNTERS)
+
+
+def unchanged(counters: Optional[Counters]) -> ConditionBase:
+    """Condition that an item still holds exactly ``counters``, or still doesn't exist."""
+    if counters is None:
+        return Attr("pk").not_exists()
+    condition = Attr("pk").exists()
+    for name in COUNTERS:
+        condition &= Attr(name).eq(counters[name]) if name in counters else Attr(name).not_exists()
+    return condition
+
+
+class UsageTable:
+    def __init__(self, table: Any):
+        self.table = table
+
+    def scan_tasks(self) -> Iterator[Dict[str, Any]]:
+        names = {f"#a{i}": name for i, name in enumerate(TASK_ATTRIBUTES)}
+        params: Dict[str, Any] = {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+        yield from self._paginate(self.table.scan, params)
+
+    def query_tasks(self, user_pk: str) -> Iterator[Dict[str, Any]]:
+        names = {f"#a{i}": name for i, name in enumerate(TASK_ATTRIBUTES)}
+        yield from self._paginate(self.table.query, {
+            "KeyConditionExpression": "#a0 = :pk",
+            "ProjectionExpression": ", ".join(names),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": {":pk": user_pk},
+        })
+
+    def usage_items(self, user_pk: str) -> Dict[str, Counters]:
+        """The ``total`` and day items of a user, with only the counters they actually hold."""
+        items = self._paginate(self.table.query, {
+            "KeyConditionExpression": "pk = :pk",
+            "ExpressionAttributeValues": {":pk": f"usage#{user_pk}"},
+        })
+        return {item["sk"]: {name: int(item[name]) for name in COUNTERS if name in item} for item in items}
+
+    def write(
+        self, user_pk: str, puts: Dict[str, Counters], deletes: List[str], total: Counters, read: Dict[str, Counters]
+    ) -> bool:
+        """Writes the plan item by item, each on condition that it is unchanged since ``read``.
+
+        Returns False at the first item that changed; the caller recounts and writes again.
+        """
+        pk = f"usage#{user_pk}"
+        try:
+            for sk, counters in puts.items():
+                if not same(read.get(sk), counters):
+                    self.table.put_item(Item={"pk": pk, "sk": sk, **counters}, ConditionExpression=unchanged(read.get(sk)))
+            for sk in deletes:
+                self.table.delete_item(Key={"pk": pk, "sk": sk}, ConditionExpression=unchanged(read.get(sk)))
+            if not same(read.get("total"), total):
+                self.table.put_item(Item={"pk": pk, "sk": "total", **total}, ConditionExpression=unchanged(read.get("total")))
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    @staticmethod
+    def _paginate(operation: Any, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        start_key: Optional[Dict[str, Any]] = None
+        while True:
+            resp = operation(**params, **({"ExclusiveStartKey": start_key} if start_key else {}))
+            yield from resp.get("Items", [])
+            start_key = resp.get("LastEvaluatedKey")
+            if not start_key:
+                return
+
+
+def rebuild(table: UsageTable, user_pks: Optional[List[str]], since: str, dry_run: bool, attempts: int = 3) -> int:
+    # The scan only finds the users: each is recounted after its usage items are read, so
+    # an increment for a task the recount misses lands after the read and fails its condition.
+    user_pks = user_pks or sorted(aggregate(table.scan_tasks()))
+
+    failed = 0
+    for user_pk in user_pks:
+        for attempt in range(1, attempts + 1):
+            read = table.usage_items(user_pk)
+            recounted = aggregate(table.query_tasks(user_pk)).get(user_pk, {})
+            existing = {sk: counters for sk, counters in read.items() if sk.startswith("day#")}
+            puts, deletes, total = plan_user(recounted, existing, since)
+            changed = sum(1 for sk, counters in puts.items() if not same(existing.get(sk), counters)) + len(deletes)
+            print(f"{user_pk}: {changed} day item(s) changed, total {total}")
+            if dry_run or table.write(user_pk, puts, deletes, total, read):
+                break
+            print(f"{user_pk}: usage changed during the rebuild (attempt {attempt}/{attempts})", file=sys.stderr)
+        else:
+            failed += 1
+    if failed:
+        print(f"{failed} user(s) kept changing; run the tool again for them", file=sys.stderr)
+    return len(user_pks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-pk", action="append", help="tenant_default#<sub>; may be repeated")
+    target.add_argument("--all", action="store_true", help="scan the whole table")
+    parser.add_argument("--table", default=os.getenv("TABLE_NAME", "taskflow-dev-tasks"))
+    parser.add_argument("--region", default=os.getenv("AWS_REGION", "eu-central-1"))
+    parser.add_argument("--ttl-days", type=int, default=7, help="task retention; bounds the days that can be recounted")
+    parser.add_argument("--since", help="first day to recount (YYYY-MM-DD); defaults to the oldest fully retained day")
+    parser.add_argument("--attempts", type=int, default=3, help="recounts per user while its usage keeps changing")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    since = args.since or (datetime.now(timezone.utc).date() - timedelta(days=args.ttl_days - 1)).isoformat()
+    table = UsageTable(boto3.resource("dynamodb", region_name=args.region).Table(args.table))
+    users = rebuild(table, args.user_pk, since, args.dry_run, args.attempts)
+    print(f"{'Checked' if args.dry_run else 'Rebuilt'} usage of {users} user(s) from {since}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -94,42 +94,156 @@ $("btnList").onclick = async () => {
   } catch (e) { log(String(e)); }
 };
 
+const MULTIPART_THRESHOLD = 16 * 1024 * 1024;
+const PART_CONCURRENCY = 4;
+const PART_ATTEMPTS = 3;
+const PRESIGN_BATCH = 100;
+
+async function apiPost(path, body) {
+  const r = await fetch(`${$("base").value}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", ...authHeaders() },
+    body: JSON.stringify(body)
+  });
+  const data = await r.json();
+  if (!r.ok) throw new Error(data.error || `${path} failed: ${r.status}`);
+  return data;
+}
+
+async function uploadSingle(file) {
+  const pres = await apiPost("/files/presign", {
+    filename: file.name, content_type: file.type || "application/octet-stream"
+  });
+  const putResp = await fetch(pres.upload_url, {
+    method: "PUT",
+    headers: { "Content-Type": pres.content_type || file.type || "application/octet-stream" },
+    body: file
+  });
+  if (!putResp.ok) throw new Error(`S3 PUT failed: ${putResp.status} ${await putResp.text()}`);
+  return pres;
+}
+
+// Uploads parts in parallel straight to S3. The upload is remembered in localStorage, so
+// picking the same file again after a failure or reload only sends the missing parts.
+async function uploadMultipart(file, onProgress) {
+  const resumeKey = `multipart:${file.name}:${file.size}:${file.lastModified}`;
+  let upload = JSON.parse(localStorage.getItem(resumeKey) || "null");
+  const done = new Map();
+  if (upload) {
+    try {
+      const listed = await apiPost("/files/multipart/list", { object_key: upload.object_key, upload_id: upload.upload_id });
+      listed.parts.forEach(p => done.set(p.part_number, p.etag));
+    } catch (e) {
+      upload = null; // completed, aborted or expired: start over
+    }
+  }
+  if (!upload) {
+    upload = await apiPost("/files/multipart/start", {
+      filename: file.name, content_type: file.type || "application/octet-stream", size: file.size
+    });
+    localStorage.setItem(resumeKey, JSON.stringify(upload));
+  }
+  const { object_key, upload_id, part_size, part_count } = upload;
+
+  const pending = [];
+  for (let n = 1; n <= part_count; n++) if (!done.has(n)) pending.push(n);
+
+  // Part URLs are presigned lazily, one batch at a time, so they don't expire mid-upload.
+  const batches = new Map();
+  const urlFor = (i) => {
+    const b = Math.floor(i / PRESIGN_BATCH);
+    if (!batches.has(b)) {
+      const part_numbers = pending.slice(b * PRESIGN_BATCH, (b + 1) * PRESIGN_BATCH);
+      batches.set(b, apiPost("/files/multipart/parts", { object_key, upload_id, part_numbers })
+        .then(res => new Map(res.parts.map(p => [p.part_number, p.url]))));
+    }
+    return batches.get(b).then(urls => urls.get(pending[i]));
+  };
+
+  let next = 0;
+  const worker = async () => {
+    while (next < pending.length) {
+      const i = next++;
+      const n = pending[i];
+      const blob = file.slice((n - 1) * part_size, Math.min(n * part_size, file.size));
+      for (let attempt = 1; ; attempt++) {
+        try {
+          const r = await fetch(await urlFor(i), { method: "PUT", body: blob });
+          if (!r.ok) throw new Error(`Part ${n} failed: ${r.status}`);
+          done.set(n, r.headers.get("ETag"));
+          break;
+        } catch (e) {
+          if (attempt >= PART_ATTEMPTS) throw e;
+          await sleep(1000 * attempt);
+        }
+      }
+      onProgress(done.size, part_count);
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(PART_CONCURRENCY, pending.length) }, worker));
+
+  // Without ETags (e.g. not exposed by CORS) the API completes from S3's own part list.
+  const parts = [...done.values()].every(Boolean)
+    ? [...done].map(([part_number, etag]) => ({ part_number, etag }))
+    : undefined;
+  await apiPost("/files/multipart/complete", { object_key, upload_id, parts });
+  localStorage.removeItem(resumeKey);
+  return upload;
+}
+
 $("btnUpload").onclick = async () => {
   const file = $("file").files[0];
   if (!file) return alert("Pick a file");
 
-  const base = $("base").value;
   try {
-    const pres = await fetch(`${base}/files/presign`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json", ...authHeaders() },
-      body: JSON.stringify({ filename: file.name, content_type: file.type || "application/octet-stream" })
-    }).then(r => r.json());
-
-    const putResp = await fetch(pres.upload_url, {
-      method: "PUT",
-      headers: { "Content-Type": pres.content_type || file.type || "application/octet-stream" },
-      body: file
-    });
-    if (!putResp.ok) throw new Error(`S3 PUT failed: ${putResp.status} ${await putResp.text()}`);
+    const pres = file.size > MULTIPART_THRESHOLD
+      ? await uploadMultipart(file, (done, total) => log({ note: `Uploaded ${done}/${total} parts` }))
+      : await uploadSingle(file);
 
-    const created = await fetch(`${base}/tasks`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json", ...authHeaders() },
-      body: JSON.stringify({ client_token: crypto.randomUUID(), file_key: pres.object_key })
-    }).then(r => r.json());
+    const created = await apiPost("/tasks", { client_token: crypto.randomUUID(), file_key: pres.object_key });
 
     // Автоматически заполняем task ID для удобства
     if (created.task && created.task.task_id) {
       $("taskId").value = created.task.task_id;
     }
 
-    log({ presign: pres, created });
+    log({ presign: pres, created, note: "Waiting for the task to finish..." });
+
+    if (created.task && created.task.task_id) {
+      const task = await waitForTask(created.task.task_id);
+      log({ presign: pres, created, task });
+    }
   } catch (e) {
     log(String(e));
   }
 };
 
+const TERMINAL_STATUSES = new Set(["DONE", "FAILED"]);
+const LONG_POLL_SECONDS = 20;
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Long-polls a single task; the API holds each request until the task is DONE/FAILED or the wait expires.
+async function waitForTask(taskId, attempts = 6) {
+  let task = null;
+  for (let i = 0; i < attempts; i++) {
+    const r = await fetch(`${$("base").value}/tasks/${taskId}?wait=${LONG_POLL_SECONDS}`, { headers: authHeaders() });
+    task = (await r.json()).task;
+    if (!task || TERMINAL_STATUSES.has(task.status)) break;
+  }
+  return task;
+}
+
+// Returns as soon as any of the given tasks reaches a terminal state, or when the wait expires.
+async function waitForAnyTask(taskIds) {
+  const r = await fetch(`${$("base").value}/tasks/status`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", ...authHeaders() },
+    body: JSON.stringify({ task_ids: taskIds.slice(0, 100), wait: LONG_POLL_SECONDS })
+  });
+  if (!r.ok) throw new Error(`Status request failed: ${r.status}`);
+  return r.json();
+}
+
 $("btnGetTask").onclick = async () => {
   const taskId = $("taskId").value.trim();
   if (!taskId) return alert("Enter Task ID");
@@ -317,7 +431,8 @@ $("btnViewResult").onclick = async () => {
 };
 
 // --- Tasks Table ---
-let autoRefreshInterval = null;
+let autoRefreshOn = false;
+let autoRefreshGeneration = 0;
 
 function formatDate(isoString) {
   if (!isoString) return '-';
@@ -395,6 +510,7 @@ async function refreshTasks() {
     if (data.items) {
       renderTasksTable(data.items);
       log({ message: `Loaded ${data.items.length} tasks`, timestamp: new Date().toISOString() });
+      return data.items;
     } else {
       log({ error: "Failed to load tasks", response: data });
     }
@@ -406,19 +522,41 @@ async function refreshTasks() {
   }
 }
 
+// Instead of reloading the list on a timer, wait on the unfinished tasks and reload only
+// when one of them finishes. With nothing in flight, fall back to a slow refresh.
+async function autoRefreshLoop() {
+  // A loop left over from an earlier ON/OFF toggle notices the new generation and exits.
+  const generation = ++autoRefreshGeneration;
+  const active = () => autoRefreshOn && generation === autoRefreshGeneration;
+  while (active()) {
+    const tasks = await refreshTasks();
+    const pending = (tasks || [])
+      .filter(task => !TERMINAL_STATUSES.has(task.status))
+      .map(task => task.task_id || task.sk);
+    if (!active()) break;
+
+    try {
+      if (pending.length) await waitForAnyTask(pending);
+      else await sleep(15000);
+    } catch (e) {
+      log({ error: String(e) });
+      await sleep(3000);
+    }
+  }
+}
+
 function toggleAutoRefresh() {
   const btn = $("btnAutoRefresh");
   
-  if (autoRefreshInterval) {
-    clearInterval(autoRefreshInterval);
-    autoRefreshInterval = null;
+  if (autoRefreshOn) {
+    autoRefreshOn = false;
     btn.textContent = "Auto-refresh: OFF";
     btn.classList.remove("auto-refresh-on");
   } else {
-    autoRefreshInterval = setInterval(refreshTasks, 3000);
+    autoRefreshOn = true;
     btn.textContent = "Auto-refresh: ON";
     btn.classList.add("auto-refresh-on");
-    refreshTasks();
+    autoRefreshLoop();
   }
 }
 
@@ -437,5 +575,29 @@ window.downloadResult = (taskId) => {
   $("btnDownloadResult").click();
 };
 
+// The API writes the export to S3 in one call; a very long history comes back in
+// several files, each continuing from the previous next_cursor.
+$("btnExport").onclick = async () => {
+  const exports = [];
+  try {
+    let cursor = null;
+    do {
+      const r = await fetch(`${$("base").value}/tasks/export`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", ...authHeaders() },
+        body: JSON.stringify({ cursor })
+      });
+      const data = await r.json();
+      if (!r.ok) throw new Error(data.error || `Export failed: ${r.status}`);
+      exports.push(data);
+      cursor = data.next_cursor;
+    } while (cursor);
+    log({ exports });
+    exports.forEach(e => window.open(e.download_url, "_blank"));
+  } catch (e) {
+    log({ error: String(e), exports });
+  }
+};
+
 $("btnRefreshTasks").onclick = refreshTasks;
 $("btnAutoRefresh").onclick = toggleAutoRefresh;